@@ -0,0 +1,809 @@
+import contextlib
+import csv
+import io
+import json
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+from datetime import date, datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import numpy as np
+from datamanager import DataManager, ReferenceCache, get_data_manager, close_shared_data_managers
+from employee_portal import EmployeePortal
+from forecasting import forecast_revenue
+from historical import read_historical_data
+from hr import HR
+from insights import HTTPChatClient
+from overtime import OvertimeRule, OvertimeRuleBook
+from paystubs import write_pay_stubs
+from profiling import PayrollProfiler
+from payroll import PayrollSimulator, ReferenceData, compute_net_pay, compute_net_pay_arrays
+
+
+class ConnectPerCall:
+    """Stand-in pool that reproduces the old sqlite3.connect-on-every-call behaviour."""
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+
+    def connection(self):
+        return sqlite3.connect(self.db_path)
+
+    def close(self):
+        pass
+
+
+class UncachedReferences(ReferenceCache):
+    """Reference lookups that go to the database every time, as they did before the cache."""
+
+    def table(self, name):
+        self.misses += 1
+        with self.pool.connection() as conn:
+            return getattr(self, f"_load_{name}")(conn)
+
+
+def _ops_per_second(operation, iterations):
+    """Run an operation repeatedly and return the achieved rate."""
+    start = time.perf_counter()
+    for i in range(iterations):
+        operation(i)
+    elapsed = time.perf_counter() - start
+    return iterations / elapsed if elapsed else float("inf")
+
+
+def _seeded_data_manager(db_path, employees=100, **options):
+    """Create a fresh database populated with products, employees and reference data."""
+    with contextlib.redirect_stdout(io.StringIO()):
+        data_manager = DataManager(db_path, **options)
+        for product, price in (("Laptop", 1200.00), ("Keyboard", 75.00), ("Monitor", 300.00)):
+            data_manager.add_inventory_item(product, 10**9, 5, price)
+        for i in range(employees):
+            data_manager.add_employee({
+                "full_name": f"Employee {i}", "address": "1 Main St", "ssn": f"000-00-{i:04d}",
+                "phone": "555-0100", "email": f"e{i}@example.com", "employment_type": "hourly",
+                "job_title": "Clerk", "department": "Sales", "start_date": "2024-01-01",
+            })
+            data_manager.set_deductions(i + 1, 0.1, 0.0765, 0.05, 50.0, 25.0, 0.0)
+        data_manager.set_state_tax("TX", 0.0, 0.027)
+        data_manager.set_country_tax("US", 0.0, 0.0)
+        data_manager.add_or_update_minimum_wage("TX", 7.25)
+    return data_manager
+
+
+def _order_path(data_manager, i):
+    """The lookups and writes behind Sales.create_order."""
+    product = ("Laptop", "Keyboard", "Monitor")[i % 3]
+    order_data = {"customer": "returning", "product": product, "quantity": 1,
+                  "payment_type": "credit", "product_price": data_manager.get_product_price(product)}
+    data_manager.apply_discounts(order_data)
+    if data_manager.check_stock(product) >= 1:
+        data_manager.save_order(order_data)
+
+
+def _payroll_path(data_manager, i):
+    """The reference and employee lookups behind HR.calculate_net_pay."""
+    employee_id = i % 100 + 1
+    data_manager.get_employee_by_id(employee_id)
+    data_manager.get_minimum_wage("TX")
+    data_manager.get_employee_by_id(employee_id)  # apply_overtime reloads the employee
+    data_manager.get_overtime_rules("TX")
+    data_manager.get_country_tax_rates("US")
+    data_manager.is_reciprocal_state("TX", "TX")
+    data_manager.get_state_tax_rates("TX")
+    data_manager.get_state_tax_rates("TX")
+    data_manager.get_employee_deductions(employee_id)
+
+
+def bench_connection_pool(iterations=2000):
+    """Compare connect-per-call, the per-thread pool and pool plus reference cache on the order and payroll paths."""
+    workdir = tempfile.mkdtemp()
+    results = {}
+    try:
+        for label in ("connect-per-call", "pooled", "pooled+cache"):
+            db_path = os.path.join(workdir, f"{label}.db")
+            data_manager = _seeded_data_manager(db_path)
+            if label == "connect-per-call":
+                data_manager.pool.close()
+                data_manager.pool = ConnectPerCall(db_path)
+            if label != "pooled+cache":
+                data_manager.reference_cache = UncachedReferences(data_manager.pool)
+            with contextlib.redirect_stdout(io.StringIO()):
+                order_rate = _ops_per_second(lambda i: _order_path(data_manager, i), iterations)
+            payroll_rate = _ops_per_second(lambda i: _payroll_path(data_manager, i), iterations)
+            data_manager.close()
+            results[label] = {"order_ops_per_sec": order_rate, "payroll_ops_per_sec": payroll_rate}
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print("Connection pool benchmark:")
+    for label, rates in results.items():
+        print(f"  {label:<17} orders: {rates['order_ops_per_sec']:>9.0f} ops/s   "
+              f"payroll: {rates['payroll_ops_per_sec']:>9.0f} ops/s")
+    baseline = results["connect-per-call"]
+    for label in ("pooled", "pooled+cache"):
+        rates = results[label]
+        print(f"  speedup {label:<12} orders: {rates['order_ops_per_sec'] / baseline['order_ops_per_sec']:>8.1f}x   "
+              f"payroll: {rates['payroll_ops_per_sec'] / baseline['payroll_ops_per_sec']:>8.1f}x")
+    return results
+
+
+def _check_then_save(data_manager, order_data):
+    """The pre-place_order path: separate price lookup and stock check, then an unconditional insert and decrement."""
+    order_data["product_price"] = data_manager.get_product_price(order_data["product"])
+    amount = data_manager.apply_discounts(order_data)
+    if data_manager.check_stock(order_data["product"]) >= order_data["quantity"]:
+        with data_manager.pool.connection() as conn:
+            conn.execute(
+                "INSERT INTO orders (customer, product, quantity, payment_type, discounted_amount, date) "
+                "VALUES (?, ?, ?, ?, ?, date('now'))",
+                (order_data["customer"], order_data["product"], order_data["quantity"],
+                 order_data["payment_type"], amount))
+            conn.execute("UPDATE inventory SET stock = stock - ? WHERE product = ?",
+                         (order_data["quantity"], order_data["product"]))
+        return True
+    return False
+
+
+def _place(data_manager, order_data):
+    return data_manager.place_order(order_data).accepted
+
+
+def bench_place_order(threads=8, orders_per_thread=500, initial_stock=2000):
+    """Hammer one product from several threads and compare throughput and overselling of both order paths."""
+    workdir = tempfile.mkdtemp()
+    results = {}
+    try:
+        for label, submit in (("check-then-save", _check_then_save), ("place_order", _place)):
+            data_manager = _seeded_data_manager(os.path.join(workdir, f"{label}.db"))
+            with contextlib.redirect_stdout(io.StringIO()):
+                data_manager.add_inventory_item("Limited", initial_stock, 0, 10.00)
+            accepted = [0] * threads
+
+            def worker(index):
+                for _ in range(orders_per_thread):
+                    order_data = {"customer": "new", "product": "Limited", "quantity": 1, "payment_type": "cash"}
+                    if submit(data_manager, order_data):
+                        accepted[index] += 1
+
+            workers = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+            start = time.perf_counter()
+            for thread in workers:
+                thread.start()
+            for thread in workers:
+                thread.join()
+            elapsed = time.perf_counter() - start
+            final_stock = data_manager.check_stock("Limited")
+            data_manager.close()
+            results[label] = {
+                "orders_per_sec": threads * orders_per_thread / elapsed,
+                "accepted": sum(accepted),
+                "oversold_units": max(0, -final_stock),
+            }
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print(f"Concurrent order benchmark ({threads} threads, {threads * orders_per_thread} orders, stock {initial_stock}):")
+    for label, result in results.items():
+        print(f"  {label:<16} {result['orders_per_sec']:>9.0f} orders/s   accepted: {result['accepted']:>6}   "
+              f"oversold units: {result['oversold_units']}")
+    return results
+
+
+def _write_orders_csv(file_path, rows, bad_every=10000):
+    """Write a synthetic orders CSV with an occasional malformed row."""
+    products = ("Laptop", "Keyboard", "Monitor")
+    with open(file_path, mode='w', newline='') as file:
+        writer = csv.writer(file)
+        writer.writerow(['customer', 'product', 'quantity', 'payment_type', 'discounted_amount', 'date'])
+        for i in range(rows):
+            quantity = "many" if bad_every and i % bad_every == 0 else i % 9 + 1
+            writer.writerow(["returning" if i % 4 == 0 else "new", products[i % 3], quantity,
+                             "credit", "0", f"2024-{i % 12 + 1:02d}-{i % 28 + 1:02d}"])
+
+
+def bench_import_orders(rows=1000000, chunk_size=5000):
+    """Time the streaming order importer on a large synthetic CSV."""
+    workdir = tempfile.mkdtemp()
+    try:
+        csv_path = os.path.join(workdir, "orders.csv")
+        _write_orders_csv(csv_path, rows)
+        data_manager = _seeded_data_manager(os.path.join(workdir, "import.db"))
+        report = data_manager.import_orders_csv(csv_path, chunk_size=chunk_size)
+        data_manager.close()
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print(f"Order import benchmark ({rows} rows, chunks of {chunk_size}):")
+    print(f"  imported {report.rows_imported} rows in {report.elapsed:.2f}s "
+          f"({report.rows_per_second:.0f} rows/s), {report.error_count} bad rows reported")
+    return report
+
+
+def _unshared_data_manager(db_path):
+    """What every department and portal did before the registry: a new DataManager that reruns the full schema setup."""
+    data_manager = DataManager(db_path)
+    data_manager.setup_database()
+    return data_manager
+
+
+def bench_startup(portal_opens=200, departments=5):
+    """Measure department startup and Employee Portal open latency with per-object and shared DataManagers."""
+    workdir = tempfile.mkdtemp()
+    db_path = os.path.join(workdir, "startup.db")
+    results = {}
+    try:
+        _seeded_data_manager(db_path).close()
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            managers = [_unshared_data_manager(db_path) for _ in range(departments)]
+            startup = time.perf_counter() - start
+            start = time.perf_counter()
+            for i in range(portal_opens):
+                portal = EmployeePortal(i % 100 + 1, _unshared_data_manager(db_path))
+                portal.data_manager.close()
+            portal_open = (time.perf_counter() - start) / portal_opens
+            for data_manager in managers:
+                data_manager.close()
+        results["per-object"] = {"startup_ms": startup * 1000, "portal_open_ms": portal_open * 1000}
+
+        start = time.perf_counter()
+        managers = [get_data_manager(db_path) for _ in range(departments)]
+        startup = time.perf_counter() - start
+        start = time.perf_counter()
+        for i in range(portal_opens):
+            EmployeePortal(i % 100 + 1, get_data_manager(db_path))
+        portal_open = (time.perf_counter() - start) / portal_opens
+        close_shared_data_managers()
+        results["shared"] = {"startup_ms": startup * 1000, "portal_open_ms": portal_open * 1000}
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print(f"Startup benchmark ({departments} departments, {portal_opens} portal opens):")
+    for label, result in results.items():
+        print(f"  {label:<11} startup: {result['startup_ms']:>8.2f} ms   portal open: {result['portal_open_ms']:>8.3f} ms")
+    return results
+
+
+def _seed_payroll(data_manager, employees, pay_date, days=7):
+    """Give every employee an hourly rate, a weekly schedule due on pay_date and a week of time logs."""
+    with data_manager.pool.connection() as conn:
+        conn.execute("UPDATE employees SET hourly_rate = 20.0 + id % 10, pay_frequency = 'weekly', "
+                     "home_state = 'TX', work_state = 'TX', country_code = 'US'")
+        conn.executemany(
+            "INSERT INTO payroll_schedule (employee_id, pay_frequency, next_pay_date) VALUES (?, 'weekly', ?)",
+            [(i + 1, pay_date.isoformat()) for i in range(employees)])
+        conn.executemany(
+            "INSERT INTO time_logs (employee_id, date, hours_worked, overtime_hours) VALUES (?, ?, ?, 0)",
+            [(i + 1, (pay_date - timedelta(days=day)).isoformat(), 7.5 + (i + day) % 4)
+             for i in range(employees) for day in range(days)])
+    data_manager.rebuild_hours_rollup()
+
+
+def _pay_one_by_one(hr, employee_ids, pay_date):
+    """The HR.log_payroll path, one employee at a time."""
+    for employee_id in employee_ids:
+        hr.process_payroll(employee_id, pay_date.isoformat())
+
+
+def bench_run_payroll(employees=2000, processes=4):
+    """Compare per-employee payroll with the batch HR.run_payroll engine, serial and with worker processes."""
+    workdir = tempfile.mkdtemp()
+    pay_date = date(2024, 6, 14)
+    results = {}
+    try:
+        for label in ("one-by-one", "run_payroll", f"run_payroll x{processes}"):
+            data_manager = _seeded_data_manager(os.path.join(workdir, f"payroll-{len(results)}.db"), employees)
+            _seed_payroll(data_manager, employees, pay_date)
+            hr = HR(data_manager)
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                if label == "one-by-one":
+                    _pay_one_by_one(hr, range(1, employees + 1), pay_date)
+                else:
+                    hr.run_payroll(pay_date.isoformat(), processes=processes if "x" in label else None)
+            elapsed = time.perf_counter() - start
+            with data_manager.pool.connection() as conn:
+                total_net = conn.execute("SELECT SUM(net_pay) FROM payroll_history").fetchone()[0]
+            data_manager.close()
+            results[label] = {"employees_per_sec": employees / elapsed, "total_net": total_net}
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print(f"Payroll run benchmark ({employees} employees):")
+    for label, result in results.items():
+        print(f"  {label:<15} {result['employees_per_sec']:>9.0f} employees/s   total net: ${result['total_net']:.2f}")
+    return results
+
+
+def bench_net_pay(employees=100000, scalar_sample=10000):
+    """Compare the per-employee net-pay calculation with the vectorized one on synthetic columns."""
+    references = ReferenceData(
+        state_tax={"TX": {"income_tax_rate": 0.0, "sui_rate": 0.027, "local_tax_rate": 0.0},
+                   "CA": {"income_tax_rate": 0.093, "sui_rate": 0.034, "local_tax_rate": 0.01}},
+        country_tax={"US": {"income_tax_rate": 0.0, "social_contribution_rate": 0.0, "expatriate_tax_rate": 0.0}},
+        minimum_wages={"TX": 7.25, "CA": 16.0},
+    )
+    states = [("TX", "CA")[i % 2] for i in range(employees)]
+    days = [(date(2024, 6, 3) + timedelta(days=day)).isoformat() for day in range(12)]
+    time_logs = [[(days[day], 7.5 + (i + day) % 5) for day in range(5 + i % 6)] for i in range(employees)]
+    total_hours = [sum(hours for _, hours in logs) for logs in time_logs]
+    gross_pay = [hours * (15.0 + i % 20) for i, hours in enumerate(total_hours)]
+    voluntary = [25.0 + i % 50 for i in range(employees)]
+
+    start = time.perf_counter()
+    scalar = [compute_net_pay(gross_pay[i], total_hours[i], time_logs[i],
+                              {"home_state": states[i], "work_state": states[i], "country_code": "US"},
+                              references, voluntary[i])["net_pay"] for i in range(scalar_sample)]
+    scalar_rate = scalar_sample / (time.perf_counter() - start)
+
+    start = time.perf_counter()
+    splits = [references.overtime_rule(state).split(logs) for state, logs in zip(states, time_logs)]
+    vectorized = compute_net_pay_arrays(
+        gross_pay, total_hours, [split["regular_hours"] for split in splits],
+        [split["overtime_hours"] for split in splits], [split["doubletime_hours"] for split in splits],
+        states, states, ["US"] * employees, [False] * employees, voluntary, references,
+        overtime_states=states)["net_pay"]
+    vectorized_elapsed = time.perf_counter() - start
+    mismatches = sum(round(a, 2) != round(b, 2) for a, b in zip(scalar, vectorized.tolist()))
+
+    print(f"Net pay benchmark ({employees} employees):")
+    print(f"  scalar      {scalar_rate:>11.0f} employees/s (sampled {scalar_sample})")
+    print(f"  vectorized  {employees / vectorized_elapsed:>11.0f} employees/s ({vectorized_elapsed * 1000:.1f} ms total), "
+          f"{mismatches} cent mismatches")
+    return {"scalar_per_sec": scalar_rate, "vectorized_seconds": vectorized_elapsed, "mismatches": mismatches}
+
+
+def bench_what_if(employees=20000, scenarios=50):
+    """Time loading the workforce once and running many what-if scenarios against it."""
+    workdir = tempfile.mkdtemp()
+    pay_date = date(2024, 6, 14)
+    try:
+        data_manager = _seeded_data_manager(os.path.join(workdir, "what-if.db"), employees)
+        _seed_payroll(data_manager, employees, pay_date)
+        start = time.perf_counter()
+        simulator = PayrollSimulator.from_data_manager(data_manager, pay_date)
+        load_elapsed = time.perf_counter() - start
+        data_manager.close()
+        start = time.perf_counter()
+        simulator.simulate({f"TX SUI {i / 1000:.3f}": {"state_tax": {"TX": {"sui_rate": i / 1000}}}
+                            for i in range(scenarios)})
+        scenario_elapsed = time.perf_counter() - start
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print(f"What-if benchmark ({employees} employees, {scenarios} scenarios):")
+    print(f"  load {load_elapsed * 1000:.1f} ms, scenarios {scenario_elapsed * 1000:.1f} ms "
+          f"({scenario_elapsed / scenarios * 1000:.2f} ms each)")
+    return {"load_seconds": load_elapsed, "scenario_seconds": scenario_elapsed}
+
+
+def _flat_eight_hour_split(time_logs):
+    """The old HR.calculate_hours_worked rule: over 8 hours in a logged row is overtime, nothing else."""
+    regular_hours = overtime_hours = 0.0
+    for _, hours_worked in time_logs:
+        if hours_worked > 8:
+            overtime_hours += hours_worked - 8
+            regular_hours += 8
+        else:
+            regular_hours += hours_worked
+    return regular_hours, overtime_hours
+
+
+def bench_overtime_engine(employees=20000, days=100, per_employee_sample=500):
+    """Classify a multi-million-row time-log history with the compiled overtime rules.
+
+    Times the in-memory single pass, the same pass fed from the daily rollup stream, and the
+    per-employee query path that HR.calculate_hours_worked takes.
+    """
+    workdir = tempfile.mkdtemp()
+    first_day = date(2024, 1, 1)
+    day_texts = [(first_day + timedelta(days=day)).isoformat() for day in range(days)]
+    rows = [(employee_id, day_texts[day], 6.0 + (employee_id * 7 + day * 3) % 9)
+            for employee_id in range(1, employees + 1) for day in range(days)]
+    rule_book = OvertimeRuleBook({"CA": {**OvertimeRule().to_dict(), "seventh_day_overtime": True}})
+    states = {employee_id: ("CA", "TX")[employee_id % 2] for employee_id in range(1, employees + 1)}
+    results = {}
+    try:
+        start = time.perf_counter()
+        regular_total = sum(split["regular_hours"] for _, split in rule_book.split_stream(rows, states))
+        results["in-memory pass"] = len(rows) / (time.perf_counter() - start)
+        start = time.perf_counter()
+        for employee_id in range(1, employees + 1):
+            _flat_eight_hour_split([(row[1], row[2]) for row in rows[(employee_id - 1) * days:employee_id * days]])
+        results["old flat 8-hour loop"] = len(rows) / (time.perf_counter() - start)
+
+        data_manager = _seeded_data_manager(os.path.join(workdir, "overtime.db"), 0)
+        with data_manager.pool.connection() as conn:
+            conn.executemany("INSERT INTO employees (id, full_name, employment_type, work_state) "
+                             "VALUES (?, ?, 'hourly', ?)",
+                             [(employee_id, f"Employee {employee_id}", state) for employee_id, state in states.items()])
+            conn.executemany("INSERT INTO time_logs (employee_id, date, hours_worked) VALUES (?, ?, ?)", rows)
+        rebuild = data_manager.rebuild_hours_rollup()
+        start = time.perf_counter()
+        streamed = sum(1 for _ in rule_book.split_stream(
+            data_manager.iter_daily_hours(day_texts[0], day_texts[-1]), states))
+        results["rollup stream pass"] = len(rows) / (time.perf_counter() - start)
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            hr = HR(data_manager)
+            start = time.perf_counter()
+            for employee_id in range(1, per_employee_sample + 1):
+                hr.calculate_hours_worked(employee_id, day_texts[0], day_texts[-1])
+        results["per-employee queries"] = per_employee_sample * days / (time.perf_counter() - start)
+        data_manager.close()
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print(f"Overtime engine benchmark ({len(rows)} time-log rows, {employees} employees, "
+          f"rollup rebuilt in {rebuild['elapsed']:.2f}s, {streamed} employees streamed):")
+    for label, rate in results.items():
+        print(f"  {label:<22} {rate:>12.0f} rows/s")
+    print(f"  regular hours classified: {regular_total:.1f}")
+    return results
+
+
+def bench_leave_accrual(employees=100000, days=14, per_employee_sample=2000):
+    """Time the set-based period-close leave accrual against per-employee accrue_leave calls."""
+    workdir = tempfile.mkdtemp()
+    period = (date(2024, 6, 1), date(2024, 6, 1) + timedelta(days=days - 1))
+    try:
+        data_manager = _seeded_data_manager(os.path.join(workdir, "leave.db"), 0)
+        with data_manager.pool.connection() as conn:
+            conn.execute("INSERT INTO state_leave_policies (state, sick_leave_rate, family_leave_rate) "
+                         "VALUES ('CA', 0.0333, 0.01), ('TX', 0.025, 0.0)")
+            conn.executemany("INSERT INTO employees (id, full_name, employment_type, work_state) "
+                             "VALUES (?, ?, 'hourly', ?)",
+                             [(i, f"Employee {i}", ("CA", "TX")[i % 2]) for i in range(1, employees + 1)])
+            conn.executemany("INSERT INTO time_logs (employee_id, date, hours_worked) VALUES (?, ?, ?)",
+                             [(i, (period[0] + timedelta(days=day)).isoformat(), 6.0 + (i + day) % 5)
+                              for i in range(1, employees + 1) for day in range(days)])
+        data_manager.rebuild_hours_rollup()
+
+        start = time.perf_counter()
+        for employee_id in range(1, per_employee_sample + 1):
+            data_manager.accrue_leave(employee_id, 80.0)
+        per_employee_rate = per_employee_sample / (time.perf_counter() - start)
+        first = data_manager.accrue_leave_for_period(*period)
+        rerun = data_manager.accrue_leave_for_period(*period)
+        data_manager.close()
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print(f"Leave accrual benchmark ({employees} employees, {employees * days} time-log rows):")
+    print(f"  per-employee accrue_leave  {per_employee_rate:>10.0f} employees/s (sampled {per_employee_sample})")
+    print(f"  period close               {first['employees_accrued'] / first['elapsed']:>10.0f} employees/s "
+          f"({first['elapsed']:.2f}s total)")
+    print(f"  rerun of the same period   accrued {rerun['employees_accrued']}, skipped {rerun['already_accrued']} "
+          f"in {rerun['elapsed']:.2f}s")
+    return {"per_employee_per_sec": per_employee_rate, "close": first, "rerun": rerun}
+
+
+class StubChatHandler(BaseHTTPRequestHandler):
+    """OpenAI-compatible /chat/completions endpoint that sleeps for server.latency and echoes the prompt."""
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        time.sleep(self.server.latency)
+        with self.server.lock:
+            self.server.calls += 1
+        prompt = body["messages"][-1]["content"]
+        payload = json.dumps({"choices": [{"message": {"role": "assistant",
+                                                       "content": f"Stub insight for: {prompt}"}}]}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@contextlib.contextmanager
+def stub_chat_server(latency=0.05):
+    """Run a StubChatHandler server on a free local port and yield its base URL and server object."""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubChatHandler)
+    server.daemon_threads = True
+    server.latency, server.calls, server.lock = latency, 0, threading.Lock()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f"http://127.0.0.1:{server.server_address[1]}/v1", server
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def bench_bonus_insights(employees=200, latency=0.05, max_workers=16, requests_per_second=200):
+    """Time bonus insights sequentially, concurrently and from a warm cache against a stub chat server."""
+    workdir = tempfile.mkdtemp()
+    try:
+        data_manager = _seeded_data_manager(os.path.join(workdir, "insights.db"), employees)
+        hr = HR(data_manager)
+        with stub_chat_server(latency) as (base_url, server):
+            client = HTTPChatClient(base_url)
+            _, sequential = hr.generate_bonus_insight(client, max_workers=1, requests_per_second=None,
+                                                      cache_dir=None)
+            cache_dir = os.path.join(workdir, "cache")
+            _, concurrent = hr.generate_bonus_insight(client, max_workers=max_workers,
+                                                      requests_per_second=requests_per_second, cache_dir=cache_dir)
+            results, cached = hr.generate_bonus_insight(client, max_workers=max_workers,
+                                                        requests_per_second=requests_per_second, cache_dir=cache_dir)
+            server_calls = server.calls
+        data_manager.close()
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print(f"Bonus insight benchmark ({employees} employees, {latency * 1000:.0f} ms stub latency):")
+    print(f"  sequential           {sequential['elapsed']:>8.2f}s")
+    print(f"  {max_workers} workers, {requests_per_second}/s   {concurrent['elapsed']:>8.2f}s "
+          f"(workers waited {concurrent['rate_limit_wait']:.2f}s on the rate limit)")
+    print(f"  warm cache           {cached['elapsed']:>8.2f}s ({cached['cached']} cached, {server_calls} server calls total)")
+    return {"sequential": sequential, "concurrent": concurrent, "cached": cached,
+            "all_ok": all(result.ok for result in results)}
+
+
+def bench_profiler(employees=2000, stage_calls=1000000):
+    """Measure the payroll path with profiling off and on, and the cost of a disabled stage."""
+    workdir = tempfile.mkdtemp()
+    pay_date = date(2024, 6, 14)
+    try:
+        data_manager = _seeded_data_manager(os.path.join(workdir, "profile.db"), employees)
+        _seed_payroll(data_manager, employees, pay_date)
+        hr = HR(data_manager)
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            for employee_id in range(1, employees + 1):
+                hr.process_payroll(employee_id, pay_date.isoformat(), record=False)
+        disabled_rate = employees / (time.perf_counter() - start)
+        start = time.perf_counter()
+        report = hr.profile_payroll(pay_date.isoformat(), range(1, employees + 1), slowest=3)
+        enabled_rate = employees / (time.perf_counter() - start)
+        data_manager.close()
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    stage = PayrollProfiler().stage
+    start = time.perf_counter()
+    for _ in range(stage_calls):
+        with stage("noop", 1):
+            pass
+    disabled_stage_ns = (time.perf_counter() - start) / stage_calls * 1e9
+
+    print(f"Profiler benchmark ({employees} employees):")
+    print(f"  profiling off        {disabled_rate:>9.0f} employees/s ({disabled_stage_ns:.0f} ns per disabled stage)")
+    print(f"  profiling on         {enabled_rate:>9.0f} employees/s")
+    for name, stats in sorted(report["stages"].items(), key=lambda item: item[1]["total_seconds"], reverse=True):
+        print(f"  {name:<28} p50 {stats['p50_seconds'] * 1e6:>7.1f} us  p99 {stats['p99_seconds'] * 1e6:>7.1f} us  "
+              f"{stats['queries_per_call']:.1f} queries, {stats['rows_per_call']:.1f} rows per call")
+    return {"disabled_per_sec": disabled_rate, "enabled_per_sec": enabled_rate,
+            "disabled_stage_ns": disabled_stage_ns, "report": report}
+
+
+def bench_pay_stubs(employees=20000, processes=4):
+    """Time bulk pay-stub writing for one pay date, in-process and across worker processes."""
+    import tracemalloc
+    workdir = tempfile.mkdtemp()
+    pay_date = date(2024, 6, 14)
+    results = {}
+    try:
+        data_manager = _seeded_data_manager(os.path.join(workdir, "stubs.db"), employees)
+        _seed_payroll(data_manager, employees, pay_date)
+        hr = HR(data_manager)
+        with contextlib.redirect_stdout(io.StringIO()):
+            hr.run_payroll(pay_date.isoformat())
+        for label, fmt, workers in (("text", "text", None), ("html", "html", None),
+                                    (f"text x{processes}", "text", processes)):
+            tracemalloc.start()
+            summary = write_pay_stubs(data_manager, pay_date, os.path.join(workdir, label), fmt, workers)
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            results[label] = {**summary, "peak_mib": peak / 2**20}
+        data_manager.close()
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print(f"Pay stub benchmark ({employees} stubs):")
+    for label, result in results.items():
+        print(f"  {label:<10} {result['stubs_per_second']:>9.0f} stubs/s   peak Python memory {result['peak_mib']:.1f} MiB")
+    return results
+
+
+def _python_revenue_report(data_manager, timeframe):
+    """The old Finance/Sales report: every order loaded and bucketed in Python."""
+    formats = {"weekly": "%Y-%U", "monthly": "%Y-%m", "yearly": "%Y"}
+    report_data = {}
+    for order in data_manager.load_orders():
+        key = order[6] if timeframe == "daily" else \
+            datetime.strptime(order[6], '%Y-%m-%d').strftime(formats[timeframe])
+        report_data[key] = report_data.get(key, 0) + float(order[5])
+    return report_data
+
+
+def _seed_orders(data_manager, orders, days=1500, first_day=date(2020, 1, 1)):
+    with data_manager.pool.connection() as conn:
+        conn.executemany(
+            "INSERT INTO orders (customer, product, quantity, payment_type, discounted_amount, date) "
+            "VALUES ('Customer', ?, 1, 'cash', ?, ?)",
+            [(("Laptop", "Keyboard", "Monitor")[i % 3], 10.0 + i % 997 * 0.37,
+              (first_day + timedelta(days=i * 7919 % days)).isoformat()) for i in range(orders)])
+
+
+def bench_revenue_reports(orders=500000):
+    """Compare Python-side report bucketing with the daily_revenue rollup report, and time order inserts
+    with and without the triggers that maintain the rollup."""
+    workdir = tempfile.mkdtemp()
+    results = {}
+    try:
+        data_manager = _seeded_data_manager(os.path.join(workdir, "reports.db"), 0)
+        start = time.perf_counter()
+        _seed_orders(data_manager, orders)
+        insert_rate = orders / (time.perf_counter() - start)
+        for timeframe in ("daily", "weekly", "monthly", "yearly"):
+            start = time.perf_counter()
+            old = _python_revenue_report(data_manager, timeframe)
+            python_seconds = time.perf_counter() - start
+            start = time.perf_counter()
+            new = data_manager.get_revenue_report(timeframe)
+            rollup_seconds = time.perf_counter() - start
+            matches = old.keys() == new.keys() and all(round(old[k], 2) == round(new[k], 2) for k in old)
+            results[timeframe] = {"python": python_seconds, "rollup": rollup_seconds, "buckets": len(new),
+                                  "matches": matches}
+        rebuild = data_manager.rebuild_daily_revenue()
+        data_manager.close()
+
+        # The same inserts into a database whose rollup triggers are dropped
+        data_manager = _seeded_data_manager(os.path.join(workdir, "no-triggers.db"), 0)
+        with data_manager.pool.connection() as conn:
+            for (name,) in conn.execute("SELECT name FROM sqlite_master WHERE type = 'trigger'").fetchall():
+                conn.execute(f"DROP TRIGGER {name}")
+        start = time.perf_counter()
+        _seed_orders(data_manager, orders)
+        untriggered_rate = orders / (time.perf_counter() - start)
+        data_manager.close()
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print(f"Revenue report benchmark ({orders} orders):")
+    for timeframe, result in results.items():
+        print(f"  {timeframe:<8} python {result['python']:>7.3f}s   rollup {result['rollup'] * 1000:>7.2f} ms   "
+              f"{result['buckets']:>5} buckets   totals match: {result['matches']}")
+    print(f"  inserts  {insert_rate:>9.0f} orders/s with rollup triggers, {untriggered_rate:.0f} without; "
+          f"full rebuild {rebuild['elapsed']:.2f}s")
+    return {"reports": results, "insert_per_sec": insert_rate, "untriggered_insert_per_sec": untriggered_rate,
+            "rebuild": rebuild}
+
+def bench_report_cache(orders=500000, repeats=200, new_orders=100):
+    """Time cached report hits and incremental refreshes against recomputing every report from the rollup."""
+    workdir = tempfile.mkdtemp()
+    results = {}
+    try:
+        data_manager = _seeded_data_manager(os.path.join(workdir, "report-cache.db"), 0)
+        _seed_orders(data_manager, orders)
+        cache = data_manager.report_cache
+        for timeframe in ("daily", "weekly", "monthly", "yearly"):
+            start = time.perf_counter()
+            for _ in range(repeats):
+                data_manager.get_revenue_report(timeframe)
+            uncached = (time.perf_counter() - start) / repeats
+            cache.report(timeframe)
+            start = time.perf_counter()
+            for _ in range(repeats):
+                cache.report(timeframe)
+            hit = (time.perf_counter() - start) / repeats
+            _seed_orders(data_manager, new_orders, days=30, first_day=date(2024, 3, 1))
+            start = time.perf_counter()
+            refreshed = cache.report(timeframe)
+            refresh = time.perf_counter() - start
+            expected = data_manager.get_revenue_report(timeframe)
+            matches = refreshed.keys() == expected.keys() and all(
+                abs(refreshed[k] - expected[k]) < 0.005 for k in expected)
+            results[timeframe] = {"uncached": uncached, "hit": hit, "refresh": refresh, "matches": matches}
+        stats = cache.stats()
+        data_manager.close()
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print(f"Report cache benchmark ({orders} orders, {new_orders} new orders before each refresh):")
+    for timeframe, result in results.items():
+        print(f"  {timeframe:<8} uncached {result['uncached'] * 1000:>7.3f} ms   hit {result['hit'] * 1000:>7.3f} ms   "
+              f"refresh {result['refresh'] * 1000:>7.3f} ms   matches: {result['matches']}")
+    print(f"  cache stats: {stats}")
+    return {"timeframes": results, "stats": stats}
+
+
+def _old_read_historical_data(file_path):
+    """The original Finance.read_historical_data loop: DictReader and one float per row."""
+    historical_data = {}
+    with open(file_path, mode='r') as file:
+        for row in csv.DictReader(file):
+            order_date = row.get('date')
+            amount = row.get('discounted_amount')
+            if order_date and amount:
+                try:
+                    historical_data[order_date] = historical_data.get(order_date, 0) + float(amount)
+                except ValueError:
+                    pass
+    return historical_data
+
+
+def bench_historical_reader(rows=2000000, processes=4, chunk_bytes=8 * 1024 * 1024, bad_every=50000):
+    """Compare the original DictReader loop with the chunked reader, in-process and across worker processes."""
+    workdir = tempfile.mkdtemp()
+    file_path = os.path.join(workdir, "history.csv")
+    first_day = date(2015, 1, 1)
+    with open(file_path, "w", newline="") as file:
+        writer = csv.writer(file)
+        writer.writerow(["id", "customer", "product", "quantity", "payment_type", "discounted_amount", "date"])
+        for i in range(rows):
+            amount = "n/a" if bad_every and i % bad_every == 0 else f"{10.0 + i % 997 * 0.37:.2f}"
+            writer.writerow([i, f"Customer {i % 500}", "Laptop", 1 + i % 3, "cash", amount,
+                             (first_day + timedelta(days=i * 7919 % 3650)).isoformat()])
+    size_mb = os.path.getsize(file_path) / 2**20
+    results = {}
+    try:
+        start = time.perf_counter()
+        expected = _old_read_historical_data(file_path)
+        results["DictReader"] = {"seconds": time.perf_counter() - start, "matches": True}
+        for label, workers in (("chunked", 1), (f"chunked x{processes}", processes)):
+            report = read_historical_data(file_path, workers, chunk_bytes)
+            matches = report.totals.keys() == expected.keys() and all(
+                abs(report.totals[k] - expected[k]) < 0.005 for k in expected)
+            results[label] = {"seconds": report.elapsed, "matches": matches, "bad_rows": report.bad_rows,
+                              "chunks": report.chunks}
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print(f"Historical CSV reader benchmark ({rows} rows, {size_mb:.0f} MB, {os.cpu_count()} CPUs):")
+    for label, result in results.items():
+        extra = f"   {result['chunks']} chunks, {result['bad_rows']} bad rows" if "chunks" in result else ""
+        print(f"  {label:<12} {rows / result['seconds']:>10.0f} rows/s   {size_mb / result['seconds']:>6.1f} MB/s   "
+              f"totals match: {result['matches']}{extra}")
+    return results
+
+
+def bench_forecasting(days=1500, horizon=30, repeats=20, seed=7):
+    """Time the local forecast on a synthetic daily revenue series with trend, weekly seasonality and noise."""
+    rng = np.random.default_rng(seed)
+    t = np.arange(days + horizon)
+    truth = 8000 + 3 * t + 1500 * np.sin(2 * np.pi * t / 7)
+    observed = truth + rng.normal(0, 600, len(t))
+    first_day = date(2020, 1, 1)
+    totals = {(first_day + timedelta(days=i)).isoformat(): float(observed[i]) for i in range(days)}
+
+    timings = []
+    for _ in range(repeats):
+        result = forecast_revenue(totals, horizon)
+        timings.append(result.elapsed)
+    actual = observed[days:]
+    inside = float(((actual >= result.lower) & (actual <= result.upper)).mean())
+
+    print(f"Forecasting benchmark ({days} days of history, {horizon}-day horizon):")
+    print(f"  median {np.median(timings) * 1000:.1f} ms per forecast, chose {result.model}")
+    for name, score in result.backtest.items():
+        print(f"  backtest {name:<22} MAE {score['mae']:>8.2f} over {score['folds']} folds")
+    print(f"  MAE vs held-out days {np.abs(actual - result.point).mean():.2f}, "
+          f"{inside:.0%} inside the {result.level:.0%} interval")
+    return {"seconds": float(np.median(timings)), "model": result.model, "coverage": inside}
+
+
+if __name__ == "__main__":
+    bench_connection_pool()
+    bench_place_order()
+    bench_import_orders()
+    bench_startup()
+    bench_run_payroll()
+    bench_net_pay()
+    bench_what_if()
+    bench_overtime_engine()
+    bench_leave_accrual()
+    bench_bonus_insights()
+    bench_profiler()
+    bench_pay_stubs()
+    bench_revenue_reports()
+    bench_report_cache()
+    bench_historical_reader()
+    bench_forecasting()
@@ -1,17 +1,893 @@
 import sqlite3
 import csv
 import threading
-from datetime import datetime
+import time
+import itertools
+import gzip
+import math
+import os
+from datetime import date, datetime, timedelta
 import requests
+from employee import EmployeeRecord, EMPLOYEE_COLUMNS
+from overtime import DEFAULT_OVERTIME_RULES, OvertimeRuleBook
+
+class ConnectionPool:
+    """Hand out one long-lived SQLite connection per thread."""
+
+    SYNCHRONOUS_LEVELS = ("OFF", "NORMAL", "FULL", "EXTRA")
+
+    def __init__(self, db_path, busy_timeout=5000, synchronous="NORMAL", journal_mode="WAL"):
+        synchronous = synchronous.upper()
+        if synchronous not in self.SYNCHRONOUS_LEVELS:
+            raise ValueError(f"Unknown synchronous level: {synchronous}")
+        self.db_path = db_path
+        self.busy_timeout = int(busy_timeout)
+        self.synchronous = synchronous
+        self.journal_mode = journal_mode
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._connections = {}  # thread -> connection, so close() can reach every thread's connection
+        self._closed = False
+        self._trace_callback = None
+        self._row_factory = None
+
+    def _open(self):
+        """Open and configure a new connection for the calling thread."""
+        # Connections never cross threads while open; check_same_thread is off only so close() can run anywhere
+        conn = sqlite3.connect(self.db_path, timeout=self.busy_timeout / 1000, check_same_thread=False)
+        conn.execute(f"PRAGMA busy_timeout = {self.busy_timeout}")
+        if self.journal_mode:
+            conn.execute(f"PRAGMA journal_mode = {self.journal_mode}")
+        conn.execute(f"PRAGMA synchronous = {self.synchronous}")
+        conn.set_trace_callback(self._trace_callback)
+        conn.row_factory = self._row_factory
+        return conn
+
+    def set_instrumentation(self, trace_callback=None, row_factory=None):
+        """Install a statement trace callback and row factory on every connection, open or future.
+
+        Used by the profiler to count queries and fetched rows; call with no arguments to remove them.
+        """
+        with self._lock:
+            self._trace_callback = trace_callback
+            self._row_factory = row_factory
+            for conn in self._connections.values():
+                conn.set_trace_callback(trace_callback)
+                conn.row_factory = row_factory
+
+    def connection(self):
+        """Return the calling thread's connection, opening it on first use."""
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            return conn
+        with self._lock:
+            if self._closed:
+                raise sqlite3.ProgrammingError("Connection pool is closed.")
+            self._prune_dead_threads()
+            conn = self._open()
+            self._connections[threading.current_thread()] = conn
+        self._local.conn = conn
+        return conn
+
+    def _prune_dead_threads(self):
+        """Close connections owned by threads that have exited."""
+        for thread in [t for t in self._connections if not t.is_alive()]:
+            self._connections.pop(thread).close()
+
+    def size(self):
+        """Return the number of open connections."""
+        with self._lock:
+            return len(self._connections)
+
+    def close(self):
+        """Close every pooled connection; further use raises ProgrammingError."""
+        with self._lock:
+            self._closed = True
+            for conn in self._connections.values():
+                conn.close()
+            self._connections.clear()
+        self._local = threading.local()
+
+
+class OrderResult:
+    """Outcome of DataManager.place_order."""
+
+    ACCEPTED = "accepted"
+    INSUFFICIENT_STOCK = "insufficient_stock"
+    UNKNOWN_PRODUCT = "unknown_product"
+
+    def __init__(self, status, order_id=None, discounted_amount=None, remaining_stock=None):
+        self.status = status
+        self.order_id = order_id
+        self.discounted_amount = discounted_amount
+        self.remaining_stock = remaining_stock  # Stock left after the order, or what was available when rejected
+
+    @property
+    def accepted(self):
+        return self.status == self.ACCEPTED
+
+    def __repr__(self):
+        return (f"OrderResult(status={self.status!r}, order_id={self.order_id!r}, "
+                f"discounted_amount={self.discounted_amount!r}, remaining_stock={self.remaining_stock!r})")
+
+
+class ImportReport:
+    """Row counts, timing and per-line errors from a CSV import."""
+
+    def __init__(self, file_path, max_error_details=1000):
+        self.file_path = file_path
+        self.rows_read = 0
+        self.rows_imported = 0
+        self.error_count = 0
+        self.errors = []  # (line_number, message), capped at max_error_details
+        self.max_error_details = max_error_details
+        self.started = time.perf_counter()
+        self.elapsed = 0.0
+
+    def add_error(self, line_number, message):
+        self.error_count += 1
+        if len(self.errors) < self.max_error_details:
+            self.errors.append((line_number, message))
+
+    def finish(self):
+        self.elapsed = time.perf_counter() - self.started
+
+    @property
+    def rows_per_second(self):
+        return self.rows_imported / self.elapsed if self.elapsed else 0.0
+
+    def print_summary(self):
+        """Print the import totals followed by each recorded bad row."""
+        print(f"Imported {self.rows_imported} of {self.rows_read} rows from {self.file_path} "
+              f"in {self.elapsed:.2f}s ({self.rows_per_second:.0f} rows/s), {self.error_count} bad rows.")
+        for line_number, message in self.errors:
+            print(f"  Line {line_number}: {message}")
+        if self.error_count > len(self.errors):
+            print(f"  ... {self.error_count - len(self.errors)} more bad rows not shown.")
+
+
+class ReferenceCache:
+    """In-process cache of the small reference tables read on every payroll calculation.
+
+    Each table is loaded whole on first use and dropped when DataManager writes to it, so a payroll run
+    costs one query per table instead of one per employee.
+    """
+
+    TABLES = ("state_tax", "country_tax", "state_overtime_rules", "state_minimum_wages",
+              "state_leave_policies", "tax_reciprocity")
+
+    def __init__(self, pool):
+        self.pool = pool
+        self._tables = {}
+        self._generations = {}  # Bumped on invalidation so a load racing a write cannot store stale rows
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.loads = 0
+
+    def _load_state_tax(self, conn):
+        return {state: {"income_tax_rate": income, "sui_rate": sui, "local_tax_rate": local}
+                for state, income, sui, local in conn.execute(
+                    "SELECT state, income_tax_rate, sui_rate, local_tax_rate FROM state_tax")}
+
+    def _load_country_tax(self, conn):
+        return {code: {"income_tax_rate": income, "social_contribution_rate": social, "expatriate_tax_rate": expatriate}
+                for code, income, social, expatriate in conn.execute(
+                    "SELECT country_code, income_tax_rate, social_contribution_rate, expatriate_tax_rate FROM country_tax")}
+
+    def _load_state_overtime_rules(self, conn):
+        return {row[0]: {"daily_overtime_threshold": row[1], "doubletime_threshold": row[2],
+                         "weekly_overtime_threshold": row[3], "overtime_rate": row[4], "doubletime_rate": row[5],
+                         "seventh_day_overtime": bool(row[6])}
+                for row in conn.execute('''
+                    SELECT state, daily_overtime_threshold, doubletime_threshold, weekly_overtime_threshold,
+                           overtime_rate, doubletime_rate, seventh_day_overtime
+                    FROM state_overtime_rules
+                ''')}
+
+    def _load_state_minimum_wages(self, conn):
+        return dict(conn.execute("SELECT state, minimum_wage FROM state_minimum_wages"))
+
+    def _load_state_leave_policies(self, conn):
+        return {state: {"sick_leave_rate": sick, "family_leave_rate": family}
+                for state, sick, family in conn.execute(
+                    "SELECT state, sick_leave_rate, family_leave_rate FROM state_leave_policies")}
+
+    def _load_tax_reciprocity(self, conn):
+        return set(conn.execute("SELECT home_state, work_state FROM tax_reciprocity"))
+
+    def table(self, name):
+        """Return the cached contents of a reference table, loading it on a miss."""
+        with self._lock:
+            data = self._tables.get(name)
+            if data is not None:
+                self.hits += 1
+                return data
+            self.misses += 1
+            generation = self._generations.get(name, 0)
+        with self.pool.connection() as conn:
+            data = getattr(self, f"_load_{name}")(conn)
+        with self._lock:
+            self.loads += 1
+            if self._generations.get(name, 0) == generation:
+                self._tables[name] = data
+        return data
+
+    def preload(self):
+        """Load every reference table up front, e.g. before a payroll run."""
+        for name in self.TABLES:
+            self.table(name)
+
+    def invalidate(self, *names):
+        """Drop the named tables (all of them if none are given) so the next read reloads them."""
+        with self._lock:
+            for name in names or self.TABLES:
+                self._tables.pop(name, None)
+                self._generations[name] = self._generations.get(name, 0) + 1
+
+    def stats(self):
+        """Return hit/miss counters and which tables are currently cached."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "loads": self.loads,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "cached_tables": sorted(self._tables),
+            }
+
+
+class RevenueReportCache:
+    """Revenue reports cached per (timeframe, date range, product) and stamped with an orders watermark.
+
+    The watermark is the highest order id plus the revenue_revision counter, which the order triggers bump on
+    every insert, delete and revenue-relevant update. While it is unchanged a report is served from memory.
+    When the revision moved by exactly the number of new orders, only inserts happened, so just the buckets
+    containing their dates are re-read from the rollup; anything else (edited or deleted orders, unparseable
+    dates, an explicit invalidate) forces a full recompute.
+    """
+
+    def __init__(self, pool, max_entries=128):
+        self.pool = pool
+        self.max_entries = max_entries
+        self._entries = {}  # (timeframe, start, end, product) -> (watermark, {bucket: total})
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.refreshes = 0
+        self.misses = 0
+        self.buckets_recomputed = 0
+
+    @staticmethod
+    def _watermark(conn):
+        max_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM orders").fetchone()[0]
+        revision = conn.execute("SELECT revision FROM revenue_revision WHERE id = 1").fetchone()[0]
+        return max_id, revision
+
+    def report(self, timeframe="daily", start_date=None, end_date=None, product=None):
+        """Return {bucket: total} like DataManager.get_revenue_report, from cache when it is still current."""
+        if timeframe not in REVENUE_REPORT_KEYS:
+            raise ValueError(f"Invalid timeframe: {timeframe}. Please select daily, weekly, monthly, or yearly.")
+        start = _as_date(start_date).isoformat() if start_date is not None else None
+        end = _as_date(end_date).isoformat() if end_date is not None else None
+        key = (timeframe, start, end, product)
+        with self.pool.connection() as conn:
+            watermark = self._watermark(conn)
+            with self._lock:
+                cached = self._entries.get(key)
+            if cached is not None and cached[0] == watermark:
+                with self._lock:
+                    self.hits += 1
+                return dict(cached[1])
+
+            data = None
+            if cached is not None:
+                data = self._refresh(conn, key, cached, watermark)
+            if data is None:
+                data = _revenue_report(conn, timeframe, start, end, product)
+                with self._lock:
+                    self.misses += 1
+
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = (watermark, data)
+            while len(self._entries) > self.max_entries:
+                self._entries.pop(next(iter(self._entries)))
+        return dict(data)
+
+    def _refresh(self, conn, key, cached, watermark):
+        """Re-read only the buckets touched by orders newer than the cached watermark, or return None."""
+        timeframe, start, end, product = key
+        (old_max_id, old_revision), data = cached
+        new_max_id, new_revision = watermark
+        new_orders_rows = conn.execute(
+            "SELECT date, product FROM orders WHERE id > ?", (old_max_id,)).fetchall()
+        if new_max_id < old_max_id or new_revision - old_revision != len(new_orders_rows):
+            return None  # Orders were deleted or changed in place, so the increments cannot be trusted
+        touched = {day for day, order_product in new_orders_rows
+                   if day is not None and (product is None or order_product == product)
+                   and (start is None or day >= start) and (end is None or day <= end)}
+
+        data = dict(data)
+        try:
+            bounds = {_revenue_bucket_bounds(timeframe, day) for day in touched}
+        except ValueError:
+            return None  # A date that is not YYYY-MM-DD has no bucket bounds; the full query skips it
+        for first, last in bounds:
+            first = max(first, start) if start else first
+            last = min(last, end) if end else last
+            data.update(_revenue_report(conn, timeframe, first, last, product))
+        with self._lock:
+            self.refreshes += 1
+            self.buckets_recomputed += len(bounds)
+        return dict(sorted(data.items()))
+
+    def invalidate(self):
+        """Drop every cached report, e.g. after the rollup is rebuilt."""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """Return hit, incremental-refresh and miss counters."""
+        requests = self.hits + self.refreshes + self.misses
+        return {
+            "hits": self.hits,
+            "refreshes": self.refreshes,
+            "misses": self.misses,
+            "buckets_recomputed": self.buckets_recomputed,
+            "hit_rate": self.hits / requests if requests else 0.0,
+            "entries": len(self._entries),
+        }
+
+
+def _revenue_conditions(start_date, end_date, product):
+    """WHERE conditions and parameters bounding a revenue query by ISO date strings and product."""
+    conditions = ["date IS NOT NULL"]
+    params = []
+    if start_date is not None:
+        conditions.append("date >= ?")
+        params.append(start_date)
+    if end_date is not None:
+        conditions.append("date <= ?")
+        params.append(end_date)
+    if product is not None:
+        conditions.append("product = ?")
+        params.append(product)
+    return conditions, params
+
+
+def _revenue_report(conn, timeframe, start_date=None, end_date=None, product=None):
+    """{bucket: total revenue} from the daily_revenue rollup; dates are ISO strings or None."""
+    conditions, params = _revenue_conditions(start_date, end_date, product)
+    return dict(conn.execute(f'''
+        SELECT {REVENUE_REPORT_KEYS[timeframe]} AS bucket, SUM(revenue)
+        FROM daily_revenue
+        WHERE {" AND ".join(conditions)}
+        GROUP BY bucket
+        HAVING bucket IS NOT NULL
+        ORDER BY bucket
+    ''', params))
+
+
+def _revenue_bucket_bounds(timeframe, day):
+    """First and last ISO date of the report bucket containing day (weeks are Sunday-based within a year)."""
+    day = _as_date(day)
+    if timeframe == "daily":
+        first = last = day
+    elif timeframe == "weekly":
+        first = max(day - timedelta(days=day.isoweekday() % 7), day.replace(month=1, day=1))
+        last = min(first + timedelta(days=6 - first.isoweekday() % 7), day.replace(month=12, day=31))
+    elif timeframe == "monthly":
+        first = day.replace(day=1)
+        last = (first + timedelta(days=32)).replace(day=1) - timedelta(days=1)
+    else:
+        first, last = day.replace(month=1, day=1), day.replace(month=12, day=31)
+    return first.isoformat(), last.isoformat()
+
+
+# Daily totals per employee and date; the regular, overtime and doubletime split is added in Python from the
+# employee's state OvertimeRule, since weekly and seventh-day rules depend on the rest of the week
+_ROLLUP_DAILY_TOTALS = '''
+    SELECT employee_id, date, date(date, '-6 days', 'weekday 1'),
+           SUM(COALESCE(hours_worked, 0)),
+           SUM(CASE WHEN status = 'Approved' THEN COALESCE(time_off_approved, 0) ELSE 0 END),
+           COUNT(*)
+    FROM time_logs
+    WHERE date IS NOT NULL AND {where}
+    GROUP BY employee_id, date
+    ORDER BY employee_id, date
+'''
+
+_ROLLUP_DAILY_INSERT = '''
+    INSERT INTO hours_rollup_daily (employee_id, date, week_start, hours_worked, regular_hours, overtime_hours,
+                                    doubletime_hours, time_off_hours, log_count)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+'''
+
+# ISO year and week come from the Thursday of each Monday-based week
+_ROLLUP_WEEKLY_INSERT = '''
+    INSERT INTO hours_rollup_weekly (employee_id, week_start, iso_year, iso_week, days_worked, hours_worked,
+                                     regular_hours, overtime_hours, doubletime_hours, time_off_hours)
+    SELECT employee_id, week_start,
+           CAST(strftime('%Y', week_start, '+3 days') AS INTEGER),
+           (CAST(strftime('%j', week_start, '+3 days') AS INTEGER) - 1) / 7 + 1,
+           SUM(hours_worked > 0), SUM(hours_worked), SUM(regular_hours), SUM(overtime_hours),
+           SUM(doubletime_hours), SUM(time_off_hours)
+    FROM hours_rollup_daily
+    WHERE {where}
+    GROUP BY employee_id, week_start
+'''
+
+
+_PAYROLL_HISTORY_INSERT_COLUMNS = ("employee_id, pay_date, gross_pay, deductions, net_pay, tax_deductions, "
+                                   "health_insurance, retirement_contribution, other_deductions")
+
+
+def _payroll_history_row(employee_id, pay_date, gross_pay, deductions, net_pay, voluntary_deductions=None):
+    """Insert parameters for payroll_history; taxes are whatever part of deductions is not voluntary."""
+    if voluntary_deductions is None:
+        return employee_id, pay_date, gross_pay, deductions, net_pay, None, None, None, None
+    health = voluntary_deductions.get("health_insurance") or 0.0
+    retirement = voluntary_deductions.get("retirement_contribution") or 0.0
+    other = voluntary_deductions.get("other_deductions") or 0.0
+    return (employee_id, pay_date, gross_pay, deductions, net_pay, deductions - (health + retirement + other),
+            health, retirement, other)
+
+
+def _employee_cursor(conn):
+    """Cursor that returns EmployeeRecord rows, still passing each row through the connection's row factory."""
+    cursor = conn.cursor()
+    row_factory = conn.row_factory
+    if row_factory is None:
+        cursor.row_factory = EmployeeRecord.from_row
+    else:
+        cursor.row_factory = lambda cur, row: EmployeeRecord.from_row(cur, row_factory(cur, row))
+    return cursor
+
+
+def _week_start(value):
+    """Monday of the ISO week containing a date or YYYY-MM-DD string."""
+    day = _as_date(value)
+    return day - timedelta(days=day.weekday())
+
+
+def _as_date(value):
+    """Coerce a date, datetime or string starting with YYYY-MM-DD to a date."""
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return date.fromisoformat(str(value)[:10])
+
+
+def _overtime_rule_book(cursor):
+    """OvertimeRuleBook for every state in state_overtime_rules.
+
+    Reads SELECT * so it also works while migrating a schema that predates the seventh_day_overtime column.
+    """
+    cursor.execute("SELECT * FROM state_overtime_rules")
+    columns = [column[0] for column in cursor.description]
+    rules = {}
+    for row in cursor.fetchall():
+        record = dict(zip(columns, row))
+        rules[record["state"]] = {key: value for key, value in record.items() if key in DEFAULT_OVERTIME_RULES}
+        rules[record["state"]]["seventh_day_overtime"] = bool(record.get("seventh_day_overtime"))
+    return OvertimeRuleBook(rules)
+
+
+def _refresh_hours_rollup(cursor, employee_id=None, dates=()):
+    """Recompute rollup rows from time_logs: everything, one employee, or one employee's given dates.
+
+    Each day's hours are split into regular, overtime and doubletime by the employee's work-state
+    OvertimeRule. Weekly and seventh-day rules look at the whole week, so for given dates the ISO weeks
+    containing them are rewritten, which costs a few rows per update.
+    """
+    # Each scope is (where for the rollup tables, its params, where for time_logs, its params)
+    if employee_id is None:
+        scopes = [("1", (), "1", ())]
+        cursor.execute("DELETE FROM hours_rollup_daily")
+        cursor.execute("DELETE FROM hours_rollup_weekly")
+    elif not dates:
+        scopes = [("employee_id = ?", (employee_id,), "employee_id = ?", (employee_id,))]
+        cursor.execute("DELETE FROM hours_rollup_daily WHERE employee_id = ?", (employee_id,))
+        cursor.execute("DELETE FROM hours_rollup_weekly WHERE employee_id = ?", (employee_id,))
+    else:
+        scopes = []
+        for week_start in {_week_start(value) for value in dates}:
+            week = (employee_id, week_start.isoformat())
+            cursor.execute("DELETE FROM hours_rollup_daily WHERE employee_id = ? AND week_start = ?", week)
+            cursor.execute("DELETE FROM hours_rollup_weekly WHERE employee_id = ? AND week_start = ?", week)
+            scopes.append(("employee_id = ? AND week_start = ?", week, "employee_id = ? AND date BETWEEN ? AND ?",
+                           (*week, (week_start + timedelta(days=6)).isoformat())))
+
+    rule_book = _overtime_rule_book(cursor)
+    where, params = ("1", ()) if employee_id is None else ("id = ?", (employee_id,))
+    states = dict(cursor.execute(f"SELECT id, work_state FROM employees WHERE {where}", params).fetchall())
+    for rollup_where, rollup_params, log_where, log_params in scopes:
+        daily = cursor.execute(_ROLLUP_DAILY_TOTALS.format(where=log_where), log_params).fetchall()
+        rows = []
+        for emp_id, days in itertools.groupby(daily, key=lambda row: row[0]):
+            days = list(days)
+            rule = rule_book.rule_for(states.get(emp_id))
+            # Days whose date SQLite cannot parse have no week_start and are kept as totals only
+            split = {day: (regular, overtime, doubletime) for day, _, regular, overtime, doubletime
+                     in rule.split_days((row[1], row[3]) for row in days if row[2] is not None)}
+            for _, day, week_start, hours, time_off, log_count in days:
+                rows.append((emp_id, day, week_start, hours, *split.get(day, (0.0, 0.0, 0.0)), time_off, log_count))
+        cursor.executemany(_ROLLUP_DAILY_INSERT, rows)
+        cursor.execute(_ROLLUP_WEEKLY_INSERT.format(where=rollup_where), rollup_params)
+
+
+def _add_column_if_missing(cursor, table, column, definition):
+    """Add a column unless an older CREATE TABLE already defined it."""
+    existing = {row[1] for row in cursor.execute(f"PRAGMA table_info({table})")}
+    if column not in existing:
+        cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+
+
+def _migration_secondary_indexes(cursor):
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_time_logs_employee_date ON time_logs (employee_id, date)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_orders_date ON orders (date)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_orders_product_date ON orders (product, date)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_payroll_history_employee_date ON payroll_history (employee_id, pay_date)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_employees_ssn ON employees (ssn)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_deductions_employee ON deductions (employee_id)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_payroll_schedule_employee ON payroll_schedule (employee_id)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_payroll_schedule_next_pay_date ON payroll_schedule (next_pay_date)")
+
+
+def _migration_payroll_columns(cursor):
+    # add_employee and calculate_net_pay use these columns, but the original employees table never had them
+    for column, definition in (
+        ("local_id", "TEXT"),
+        ("work_permit_status", "TEXT"),
+        ("currency_preference", "TEXT"),
+        ("home_state", "TEXT"),
+        ("work_state", "TEXT"),
+        ("country_code", "TEXT"),
+        ("is_expatriate", "INTEGER DEFAULT 0"),
+    ):
+        _add_column_if_missing(cursor, "employees", column, definition)
+    # get_leave_policy reads this table, which was never created
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS state_leave_policies (
+            state TEXT PRIMARY KEY,
+            sick_leave_rate REAL DEFAULT 0.0,
+            family_leave_rate REAL DEFAULT 0.0
+        )
+    ''')
+
+
+def _migration_currency_rates(cursor):
+    # fetch_and_update_exchange_rates always wrote to this table, but nothing created it
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS currency_rates (
+            currency_code TEXT PRIMARY KEY,
+            exchange_rate REAL,
+            base_currency TEXT,
+            last_updated TEXT
+        )
+    ''')
+    _add_column_if_missing(cursor, "currency_rates", "base_currency", "TEXT")
+
+
+def _migration_hours_rollup(cursor):
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS hours_rollup_daily (
+            employee_id INTEGER,
+            date TEXT,
+            week_start TEXT,
+            hours_worked REAL,
+            regular_hours REAL,
+            overtime_hours REAL,
+            doubletime_hours REAL,
+            time_off_hours REAL,
+            log_count INTEGER,
+            PRIMARY KEY (employee_id, date)
+        )
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS hours_rollup_weekly (
+            employee_id INTEGER,
+            week_start TEXT,
+            iso_year INTEGER,
+            iso_week INTEGER,
+            days_worked INTEGER,
+            hours_worked REAL,
+            regular_hours REAL,
+            overtime_hours REAL,
+            doubletime_hours REAL,
+            time_off_hours REAL,
+            PRIMARY KEY (employee_id, week_start)
+        )
+    ''')
+    _refresh_hours_rollup(cursor)
+
+
+def _migration_hours_rollup_rule_split(cursor):
+    # The first rollup split every day at a fixed 8h/12h; rebuild it with each work state's OvertimeRule.
+    # Only ADD COLUMN is used, so this runs on SQLite releases without ALTER TABLE DROP COLUMN
+    for table in ("hours_rollup_daily", "hours_rollup_weekly"):
+        for column in ("regular_hours", "overtime_hours", "doubletime_hours"):
+            _add_column_if_missing(cursor, table, column, "REAL")
+    _refresh_hours_rollup(cursor)
+
+
+def _migration_seventh_day_overtime(cursor):
+    # California-style rule: the seventh consecutive day worked in a workweek is paid at overtime from the first hour
+    _add_column_if_missing(cursor, "state_overtime_rules", "seventh_day_overtime", "INTEGER DEFAULT 0")
+
+
+def _migration_leave_accruals(cursor):
+    # One row per closed accrual period and one ledger row per employee and period, so closes are idempotent
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS leave_accrual_runs (
+            id INTEGER PRIMARY KEY,
+            period_start TEXT,
+            period_end TEXT,
+            run_at TEXT,
+            employees INTEGER,
+            hours_worked REAL,
+            sick_leave REAL,
+            family_leave REAL
+        )
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS leave_accruals (
+            employee_id INTEGER,
+            period_start TEXT,
+            period_end TEXT,
+            run_id INTEGER,
+            hours_worked REAL,
+            sick_leave REAL,
+            family_leave REAL,
+            PRIMARY KEY (employee_id, period_start, period_end),
+            FOREIGN KEY(employee_id) REFERENCES employees(id),
+            FOREIGN KEY(run_id) REFERENCES leave_accrual_runs(id)
+        )
+    ''')
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_leave_accruals_run ON leave_accruals (run_id)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_leave_accrual_runs_period ON leave_accrual_runs (period_start, period_end)")
+
+
+def _migration_payroll_history_pay_date(cursor):
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_payroll_history_pay_date ON payroll_history (pay_date, employee_id)")
+
+
+def _migration_orders_revenue_index(cursor):
+    # Covers the revenue reports so they read only the index; it also serves every lookup idx_orders_date did
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_orders_date_amount ON orders (date, discounted_amount)")
+    cursor.execute("DROP INDEX IF EXISTS idx_orders_date")
+
+
+_DAILY_REVENUE_ADD = '''
+    INSERT INTO daily_revenue (date, product, order_count, units, revenue)
+    VALUES (NEW.date, COALESCE(NEW.product, ''), 1, COALESCE(NEW.quantity, 0), COALESCE(NEW.discounted_amount, 0))
+    ON CONFLICT (date, product) DO UPDATE SET
+        order_count = order_count + 1,
+        units = units + excluded.units,
+        revenue = revenue + excluded.revenue;
+'''
+
+_DAILY_REVENUE_SUBTRACT = '''
+    UPDATE daily_revenue SET
+        order_count = order_count - 1,
+        units = units - COALESCE(OLD.quantity, 0),
+        revenue = revenue - COALESCE(OLD.discounted_amount, 0)
+    WHERE date = OLD.date AND product = COALESCE(OLD.product, '');
+    DELETE FROM daily_revenue WHERE date = OLD.date AND product = COALESCE(OLD.product, '') AND order_count <= 0;
+'''
+
+
+def _rebuild_daily_revenue(cursor):
+    cursor.execute("DELETE FROM daily_revenue")
+    cursor.execute('''
+        INSERT INTO daily_revenue (date, product, order_count, units, revenue)
+        SELECT date, COALESCE(product, ''), COUNT(*), SUM(COALESCE(quantity, 0)), SUM(COALESCE(discounted_amount, 0))
+        FROM orders
+        WHERE date IS NOT NULL
+        GROUP BY date, COALESCE(product, '')
+    ''')
+
+
+def _migration_daily_revenue(cursor):
+    # Per-day, per-product revenue kept current by triggers, so reports read O(days) rows instead of every order
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS daily_revenue (
+            date TEXT,
+            product TEXT,
+            order_count INTEGER,
+            units INTEGER,
+            revenue REAL,
+            PRIMARY KEY (date, product)
+        ) WITHOUT ROWID
+    ''')
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_orders_daily_revenue_insert AFTER INSERT ON orders
+        WHEN NEW.date IS NOT NULL
+        BEGIN {_DAILY_REVENUE_ADD} END
+    ''')
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_orders_daily_revenue_delete AFTER DELETE ON orders
+        WHEN OLD.date IS NOT NULL
+        BEGIN {_DAILY_REVENUE_SUBTRACT} END
+    ''')
+    # An update moves the old row's amounts out of its bucket and the new row's amounts into its bucket
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_orders_daily_revenue_update_old
+        AFTER UPDATE OF date, product, quantity, discounted_amount ON orders
+        WHEN OLD.date IS NOT NULL
+        BEGIN {_DAILY_REVENUE_SUBTRACT} END
+    ''')
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_orders_daily_revenue_update_new
+        AFTER UPDATE OF date, product, quantity, discounted_amount ON orders
+        WHEN NEW.date IS NOT NULL
+        BEGIN {_DAILY_REVENUE_ADD} END
+    ''')
+    _rebuild_daily_revenue(cursor)
+
+
+def _migration_revenue_revision(cursor):
+    # One-row counter bumped by every order write that can change revenue; RevenueReportCache stamps reports with it
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS revenue_revision (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            revision INTEGER NOT NULL
+        )
+    ''')
+    cursor.execute("INSERT OR IGNORE INTO revenue_revision (id, revision) VALUES (1, 0)")
+    for name, event in (("insert", "INSERT"), ("delete", "DELETE"),
+                        ("update", "UPDATE OF date, product, quantity, discounted_amount")):
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS trg_orders_revenue_revision_{name} AFTER {event} ON orders
+            BEGIN UPDATE revenue_revision SET revision = revision + 1 WHERE id = 1; END
+        ''')
+
+
+def _migration_payroll_history_components(cursor):
+    # Pay stubs itemise taxes and voluntary deductions; store them with each payment so later edits to the
+    # deductions table do not rewrite old stubs. Rows written before this migration keep NULLs
+    for column in ("tax_deductions", "health_insurance", "retirement_contribution", "other_deductions"):
+        _add_column_if_missing(cursor, "payroll_history", column, "REAL")
+
+
+# Ordered schema migrations as (version, description, function); append new entries, never edit applied ones
+MIGRATIONS = [
+    (1, "secondary indexes for time logs, orders, payroll and employees", _migration_secondary_indexes),
+    (2, "payroll columns on employees and state leave policies", _migration_payroll_columns),
+    (3, "currency_rates table for exchange-rate refreshes", _migration_currency_rates),
+    (4, "daily and ISO-weekly hours rollup of time_logs", _migration_hours_rollup),
+    (5, "seventh consecutive day overtime flag on state overtime rules", _migration_seventh_day_overtime),
+    (6, "leave accrual runs and per-period accrual ledger", _migration_leave_accruals),
+    (7, "payroll history index by pay date for bulk pay stubs", _migration_payroll_history_pay_date),
+    (8, "covering orders index for revenue reports", _migration_orders_revenue_index),
+    (9, "daily revenue rollup maintained by order triggers", _migration_daily_revenue),
+    (10, "hours rollup overtime split follows each work state's overtime rule", _migration_hours_rollup_rule_split),
+    (11, "revenue revision counter bumped by order triggers", _migration_revenue_revision),
+    (12, "tax and voluntary deduction components on payroll history", _migration_payroll_history_components),
+]
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+EMPLOYEE_SELECT = ", ".join(EMPLOYEE_COLUMNS)
+EXCHANGE_RATE_API_URL = "https://api.exchangerate-api.com/v4/latest/{base}"
+SQLITE_MAX_PARAMS = 900  # Stay under the 999 bound-parameter limit of older SQLite builds
+
+# Bucket key per report timeframe; SQLite's strftime has no %U, so the Sunday-based week is computed from %j and %w
+REVENUE_REPORT_KEYS = {
+    "daily": "date(date)",
+    "weekly": "strftime('%Y', date) || '-' || printf('%02d', "
+              "(CAST(strftime('%j', date) AS INTEGER) + 6 - CAST(strftime('%w', date) AS INTEGER)) / 7)",
+    "monthly": "strftime('%Y-%m', date)",
+    "yearly": "strftime('%Y', date)",
+}
+
+# Queries on the payroll and reporting hot paths, checked by DataManager.explain_query_plans
+HOT_QUERIES = {
+    "time_logs by employee and date range": (
+        "SELECT * FROM time_logs WHERE employee_id = ? AND date BETWEEN ? AND ?", (1, "2024-01-01", "2024-01-14")),
+    "time_log by employee and date": (
+        "SELECT * FROM time_logs WHERE employee_id = ? AND date = ?", (1, "2024-01-01")),
+    "orders by date range": (
+        "SELECT * FROM orders WHERE date BETWEEN ? AND ?", ("2024-01-01", "2024-01-31")),
+    "revenue by month over a date range": (
+        f"SELECT {REVENUE_REPORT_KEYS['monthly']} AS bucket, SUM(revenue) FROM daily_revenue "
+        "WHERE date >= ? AND date <= ? GROUP BY bucket", ("2024-01-01", "2024-12-31")),
+    "orders newer than a report watermark": (
+        "SELECT date, product FROM orders WHERE id > ?", (1000,)),
+    "orders by product": (
+        "SELECT * FROM orders WHERE product = ? AND date >= ?", ("Laptop", "2024-01-01")),
+    "payroll_history by employee": (
+        "SELECT pay_date, gross_pay, deductions, net_pay FROM payroll_history WHERE employee_id = ? ORDER BY pay_date DESC", (1,)),
+    "payroll_history page after cursor": (
+        "SELECT id, pay_date, gross_pay, deductions, net_pay FROM payroll_history WHERE employee_id = ? "
+        "AND pay_date <= ? AND (pay_date < ? OR id < ?) ORDER BY pay_date DESC, id DESC LIMIT ?",
+        (1, "2024-06-01", "2024-06-01", 100, 21)),
+    "payroll_history year-to-date totals": (
+        "SELECT COUNT(*), SUM(gross_pay), SUM(deductions), SUM(net_pay) FROM payroll_history "
+        "WHERE employee_id = ? AND pay_date BETWEEN ? AND ?", (1, "2024-01-01", "2024-06-30")),
+    "payroll_history by pay date": (
+        "SELECT id, employee_id, gross_pay, deductions, net_pay FROM payroll_history WHERE pay_date = ? "
+        "ORDER BY employee_id, id", ("2024-06-14",)),
+    "employee by ssn": (
+        "SELECT id FROM employees WHERE ssn = ?", ("000-00-0000",)),
+    "deductions by employee": (
+        "SELECT health_insurance, retirement_contribution, other_deductions FROM deductions WHERE employee_id = ?", (1,)),
+    "hours rollup by employee and week": (
+        "SELECT hours_worked FROM hours_rollup_weekly WHERE employee_id = ? AND week_start BETWEEN ? AND ?",
+        (1, "2024-01-01", "2024-01-29")),
+    "hours rollup by employee and date range": (
+        "SELECT hours_worked FROM hours_rollup_daily WHERE employee_id = ? AND date BETWEEN ? AND ?",
+        (1, "2024-01-01", "2024-01-14")),
+    "payroll_schedule due on date": (
+        "SELECT employee_id FROM payroll_schedule WHERE next_pay_date = ?", ("2024-01-15",)),
+}
+
+
+_shared_data_managers = {}
+_shared_data_managers_lock = threading.Lock()
+
+
+def get_data_manager(db_path="database.db", **options):
+    """Return the process-wide DataManager for db_path, creating it on first use.
+
+    Departments share this instance so the schema check, connection pool, caches and order writer
+    exist once per database rather than once per object. options only apply when it is first created.
+    """
+    key = db_path if db_path == ":memory:" else os.path.abspath(db_path)
+    with _shared_data_managers_lock:
+        data_manager = _shared_data_managers.get(key)
+        if data_manager is None:
+            data_manager = DataManager(db_path, **options)
+            _shared_data_managers[key] = data_manager
+        return data_manager
+
+
+def close_shared_data_managers():
+    """Close and forget every shared DataManager."""
+    with _shared_data_managers_lock:
+        for data_manager in _shared_data_managers.values():
+            data_manager.close()
+        _shared_data_managers.clear()
+
 
 class DataManager:
-    def __init__(self, db_path="database.db"):
+    def __init__(self, db_path="database.db", busy_timeout=5000, synchronous="NORMAL"):
         self.db_path = db_path
-        self.setup_database()
+        self.pool = ConnectionPool(db_path, busy_timeout=busy_timeout, synchronous=synchronous)
+        self.reference_cache = ReferenceCache(self.pool)
+        self.report_cache = RevenueReportCache(self.pool)
+        self._exchange_rates = None  # {currency_code: rate against base}, loaded from currency_rates on first use
+        self._exchange_rate_validators = {}  # url -> (ETag, Last-Modified) for conditional refreshes
+        self._overtime_rule_book = None  # (rules table, compiled OvertimeRuleBook) for get_overtime_rule
+        self.ensure_schema()
+
+    def reference_cache_stats(self):
+        """Return hit/miss statistics for the reference-table cache."""
+        return self.reference_cache.stats()
+
+    def report_cache_stats(self):
+        """Return hit, refresh and miss statistics for the revenue report cache."""
+        return self.report_cache.stats()
+
+    def close(self):
+        """Close all pooled database connections."""
+        self.pool.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def ensure_schema(self):
+        """Run setup_database unless user_version shows the schema is already current."""
+        if self.get_schema_version() < SCHEMA_VERSION:
+            self.setup_database()
 
     def setup_database(self):
         """Set up the SQLite database and create required tables."""
-        with sqlite3.connect(self.db_path) as conn:
+        with self.pool.connection() as conn:
             cursor = conn.cursor()
             cursor.execute('''
                 CREATE TABLE IF NOT EXISTS employees (
@@ -32,7 +908,7 @@ class DataManager:
                     annual_salary REAL,
                     overtime_rate REAL,
                     commission REAL,
-                    pay_frequency TEXT
+                    pay_frequency TEXT,
                     local_id TEXT,  -- Local identification number for international employees
                     work_permit_status TEXT,  -- Visa or work permit information
                     currency_preference TEXT  -- Preferred currency for payroll
@@ -208,11 +1084,57 @@ class DataManager:
                 )
             ''')
             conn.commit()
+        self.apply_migrations()
+
+    def apply_migrations(self):
+        """Apply every schema migration newer than the database's user_version, each exactly once."""
+        conn = self.pool.connection()
+        for version, description, migrate in MIGRATIONS:
+            # BEGIN IMMEDIATE takes the write lock, so concurrent processes cannot apply the same migration twice
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                current = conn.execute("PRAGMA user_version").fetchone()[0]
+                if current >= version:
+                    conn.rollback()
+                    continue
+                migrate(conn.cursor())
+                conn.execute(f"PRAGMA user_version = {version}")
+                conn.commit()
+            except sqlite3.Error:
+                conn.rollback()
+                raise
+            print(f"Applied schema migration {version}: {description}")
+
+    def get_schema_version(self):
+        """Return the schema version recorded in PRAGMA user_version."""
+        with self.pool.connection() as conn:
+            return conn.execute("PRAGMA user_version").fetchone()[0]
+
+    def explain_query_plans(self):
+        """Run EXPLAIN QUERY PLAN over the hot queries and report whether each one uses an index."""
+        results = {}
+        with self.pool.connection() as conn:
+            for name, (query, params) in HOT_QUERIES.items():
+                plan = [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {query}", params)]
+                uses_index = any("USING INDEX" in step or "USING COVERING INDEX" in step
+                                 or "USING INTEGER PRIMARY KEY" in step or "USING PRIMARY KEY" in step
+                                 for step in plan)
+                results[name] = {"uses_index": uses_index, "plan": plan}
+        return results
+
+    def check_query_plans(self):
+        """Print the query plan of every hot query and return True if all of them use an index."""
+        all_indexed = True
+        for name, result in self.explain_query_plans().items():
+            status = "OK  " if result["uses_index"] else "SCAN"
+            print(f"[{status}] {name}: {'; '.join(result['plan'])}")
+            all_indexed = all_indexed and result["uses_index"]
+        return all_indexed
 
     def add_employee(self, employee_data):
         """Add a new employee to the database with error handling."""
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with self.pool.connection() as conn:
                 cursor = conn.cursor()
                 cursor.execute('''
                 INSERT INTO employees (
@@ -242,46 +1164,46 @@ class DataManager:
             print(f"Error adding employee: {e}")
 
     def get_employee_by_id(self, employee_id):
-        """Retrieve employee data by ID from the database."""
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
-            cursor.execute("SELECT * FROM employees WHERE id = ?", (employee_id,))
-            row = cursor.fetchone()
-            if row:
-                # Assuming columns are in the correct order; match them to the Employee fields
-                return {
-                    "id": row[0],
-                    "full_name": row[1],
-                    "address": row[2],
-                    "ssn": row[3],
-                    "phone": row[4],
-                    "email": row[5],
-                    "employment_type": row[6],
-                    "job_title": row[7],
-                    "department": row[8],
-                    "start_date": row[9],
-                    "end_date": row[10],
-                    "federal_w4": row[11],
-                    "state_tax_form": row[12],
-                    "hourly_rate": row[13],
-                    "annual_salary": row[14],
-                    "overtime_rate": row[15],
-                    "commission": row[16],
-                    "pay_frequency": row[17]
-                }
-            return None
+        """Retrieve employee data by ID from the database as an EmployeeRecord."""
+        with self.pool.connection() as conn:
+            cursor = _employee_cursor(conn)
+            cursor.execute(f"SELECT {EMPLOYEE_SELECT} FROM employees WHERE id = ?", (employee_id,))
+            return cursor.fetchone()
 
     def get_all_employees(self):
-        """Retrieve all employee records."""
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
-            cursor.execute("SELECT * FROM employees")
-            return cursor.fetchall()
+        """Retrieve all employee records as a list of EmployeeRecord."""
+        return list(self.iter_employees())
+
+    def iter_employees(self, batch_size=500):
+        """Yield every employee as an EmployeeRecord, fetching batch_size rows at a time."""
+        with self.pool.connection() as conn:
+            cursor = _employee_cursor(conn)
+            cursor.arraysize = batch_size
+            cursor.execute(f"SELECT {EMPLOYEE_SELECT} FROM employees ORDER BY id")
+            while True:
+                records = cursor.fetchmany()
+                if not records:
+                    return
+                yield from records
+
+    def get_employees_by_ids(self, employee_ids):
+        """Fetch many employees in as few queries as possible; returns {employee_id: EmployeeRecord}."""
+        ids = list(dict.fromkeys(employee_ids))
+        employees = {}
+        with self.pool.connection() as conn:
+            cursor = _employee_cursor(conn)
+            for start in range(0, len(ids), SQLITE_MAX_PARAMS):
+                batch = ids[start:start + SQLITE_MAX_PARAMS]
+                placeholders = ", ".join("?" * len(batch))
+                cursor.execute(f"SELECT {EMPLOYEE_SELECT} FROM employees WHERE id IN ({placeholders})", batch)
+                for record in cursor.fetchall():
+                    employees[record.id] = record
+        return employees
 
     def add_inventory_item(self, product, stock, min_threshold, price):
         """Add a new inventory item or update stock if it exists, with error handling."""
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with self.pool.connection() as conn:
                 cursor = conn.cursor()
                 cursor.execute(
                     "INSERT OR IGNORE INTO inventory (product, stock, min_threshold, price) VALUES (?, ?, ?, ?)",
@@ -293,14 +1215,14 @@ class DataManager:
 
     def get_inventory(self):
         """Retrieve all inventory records."""
-        with sqlite3.connect(self.db_path) as conn:
+        with self.pool.connection() as conn:
             cursor = conn.cursor()
             cursor.execute("SELECT product, stock, min_threshold, price FROM inventory")
             return [(row[0], int(row[1]), int(row[2]), float(row[3])) for row in cursor.fetchall()]
 
     def get_time_logs_for_employee(self, employee_id, start_date=None, end_date=None):
         """Retrieve time logs for an employee, optionally within a specified date range."""
-        with sqlite3.connect(self.db_path) as conn:
+        with self.pool.connection() as conn:
             cursor = conn.cursor()
             if start_date and end_date:
                 cursor.execute('''
@@ -319,19 +1241,9 @@ class DataManager:
                      "overtime_hours": row[4], "time_off_requested": row[5], "time_off_approved": row[6],
                      "status": row[7]} for row in cursor.fetchall()]
 
-    def add_time_log(self, employee_id, date, clock_in=None, clock_out=None, hours_worked=0, overtime_hours=0):
-        """Insert a new time log for an employee."""
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
-            cursor.execute('''
-                INSERT INTO time_logs (employee_id, date, clock_in, clock_out, hours_worked, overtime_hours)
-                VALUES (?, ?, ?, ?, ?, ?)
-            ''', (employee_id, date, clock_in, clock_out, hours_worked, overtime_hours))
-            conn.commit()
-
     def get_time_log_by_date(self, employee_id, date):
         """Retrieve the time log for a specific employee on a specific date."""
-        with sqlite3.connect(self.db_path) as conn:
+        with self.pool.connection() as conn:
             cursor = conn.cursor()
             cursor.execute("SELECT * FROM time_logs WHERE employee_id = ? AND date = ?", (employee_id, date))
             row = cursor.fetchone()
@@ -340,21 +1252,11 @@ class DataManager:
                 return dict(zip(columns, row))
             return None
 
-    def update_clock_out(self, employee_id, date, clock_out, hours_worked, overtime_hours):
-        """Update the clock-out time and hours worked for a specific time log."""
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
-            cursor.execute('''
-                UPDATE time_logs 
-                SET clock_out = ?, hours_worked = ?, overtime_hours = ? 
-                WHERE employee_id = ? AND date = ?
-            ''', (clock_out, hours_worked, overtime_hours, employee_id, date))
-            conn.commit()
             
     def update_stock(self, product, quantity):
         """Update the stock level for a given product."""
         quantity = int(quantity)
-        with sqlite3.connect(self.db_path) as conn:
+        with self.pool.connection() as conn:
             cursor = conn.cursor()
             cursor.execute("UPDATE inventory SET stock = stock + ? WHERE product = ?", (quantity, product))
             conn.commit()
@@ -362,7 +1264,7 @@ class DataManager:
 
     def check_stock(self, product):
         """Check the stock level for a specific product."""
-        with sqlite3.connect(self.db_path) as conn:
+        with self.pool.connection() as conn:
             cursor = conn.cursor()
             cursor.execute("SELECT stock FROM inventory WHERE product = ?", (product,))
             stock = cursor.fetchone()
@@ -370,171 +1272,350 @@ class DataManager:
 
     def get_product_price(self, product):
         """Retrieve product price from the database."""
-        with sqlite3.connect(self.db_path) as conn:
+        with self.pool.connection() as conn:
             cursor = conn.cursor()
             cursor.execute("SELECT price FROM inventory WHERE product = ?", (product,))
             result = cursor.fetchone()
             return result[0] if result else None
 
     def save_order(self, order_data):
-        """Save a new order to the database with discount application and real-time stock check."""
-        # Ensure product price is available in order_data
-        if "product_price" not in order_data:
-            order_data["product_price"] = self.get_product_price(order_data["product"])
-            if order_data["product_price"] is None:
-                print("Error: Product price not found.")
-                return
-
-        # Apply discounts based on order criteria
-        order_data["discounted_amount"] = self.apply_discounts(order_data)
-        
-        def save():
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
-                cursor.execute(
-                    "INSERT OR IGNORE INTO orders (customer, product, quantity, payment_type, discounted_amount, date) VALUES (?, ?, ?, ?, ?, ?)",
-                    (order_data["customer"], order_data["product"], order_data["quantity"], 
-                     order_data["payment_type"], order_data["discounted_amount"], 
-                     datetime.now().strftime('%Y-%m-%d'))
-                )
-                conn.commit()
-            # Update stock after saving order
-            self.update_stock(order_data["product"], -order_data["quantity"])
-        
-        threading.Thread(target=save).start()
+        """Save a new order with discounts applied, reserving stock only if enough is available.
+
+        Kept for callers of the old API; the work is done atomically by place_order. Returns its OrderResult.
+        """
+        result = self.place_order(order_data)
+        if result.status == OrderResult.UNKNOWN_PRODUCT:
+            print("Error: Product price not found.")
+        elif result.status == OrderResult.INSUFFICIENT_STOCK:
+            print(f"Error: Insufficient stock for {order_data['product']} ({result.remaining_stock} available).")
+        return result
+
+    def place_order(self, order_data):
+        """Price, discount, reserve stock for and insert an order in a single transaction.
+
+        Stock is decremented with a conditional UPDATE, so concurrent orders can never oversell a product.
+        Returns an OrderResult whose status is ACCEPTED, INSUFFICIENT_STOCK or UNKNOWN_PRODUCT.
+        """
+        product = order_data["product"]
+        quantity = int(order_data["quantity"])
+        conn = self.pool.connection()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute("SELECT price, stock FROM inventory WHERE product = ?", (product,)).fetchone()
+            if row is None:
+                conn.rollback()
+                return OrderResult(OrderResult.UNKNOWN_PRODUCT)
+            price, stock = row
+            cursor = conn.execute(
+                "UPDATE inventory SET stock = stock - ? WHERE product = ? AND stock >= ?",
+                (quantity, product, quantity)
+            )
+            if cursor.rowcount == 0:
+                conn.rollback()
+                return OrderResult(OrderResult.INSUFFICIENT_STOCK, remaining_stock=stock)
+            order_data["quantity"] = quantity
+            order_data["product_price"] = price
+            order_data["discounted_amount"] = self.apply_discounts(order_data)
+            cursor = conn.execute(
+                "INSERT INTO orders (customer, product, quantity, payment_type, discounted_amount, date) VALUES (?, ?, ?, ?, ?, ?)",
+                (order_data["customer"], product, quantity, order_data["payment_type"],
+                 order_data["discounted_amount"], datetime.now().strftime('%Y-%m-%d'))
+            )
+            conn.commit()
+        except BaseException:
+            # Any failure after BEGIN IMMEDIATE must release the write lock held by this pooled connection
+            conn.rollback()
+            raise
+        return OrderResult(OrderResult.ACCEPTED, cursor.lastrowid, order_data["discounted_amount"], stock - quantity)
 
     def apply_discounts(self, order_data):
         """Apply discounts based on order criteria (e.g., amount thresholds, promotions, and date-sensitive discounts)."""
-        discount = 0
         today = datetime.now().date()
         product_price = order_data["product_price"]  # Use the actual product price
+        discount = self._discount_rate(order_data["quantity"], order_data["customer"], self._seasonal_discount(today))
 
-        # Basic discounts
-        if order_data["quantity"] > 5:
-            discount = 0.10  # 10% discount for bulk orders
-        if order_data["customer"] == "returning":
-            discount += 0.05  # Additional 5% for returning customers
+        # Calculate the discounted amount based on actual product price
+        total_cost = order_data["quantity"] * product_price
+        discounted_amount = total_cost * (1 - discount)
+
+        return discounted_amount
 
-        # Date-sensitive discounts
+    def _seasonal_discount(self, today):
+        """Return the date-sensitive discount that applies on the given day."""
         black_friday = datetime(today.year, 11, 24).date()
         holiday_season_start = datetime(today.year, 12, 20).date()
         holiday_season_end = datetime(today.year, 12, 31).date()
 
         if today == black_friday:
-            discount += 0.20
+            return 0.20
         elif holiday_season_start <= today <= holiday_season_end:
-            discount += 0.15
-
-        # Calculate the discounted amount based on actual product price
-        total_cost = order_data["quantity"] * product_price
-        discounted_amount = total_cost * (1 - discount)
+            return 0.15
+        return 0
 
-        return discounted_amount
+    def _discount_rate(self, quantity, customer, seasonal_discount):
+        """Combine the bulk, returning-customer and seasonal discounts into one rate."""
+        discount = 0
+        if quantity > 5:
+            discount = 0.10  # 10% discount for bulk orders
+        if customer == "returning":
+            discount += 0.05  # Additional 5% for returning customers
+        if seasonal_discount:
+            discount += seasonal_discount
+        return discount
+
+    def import_inventory_csv(self, file_path, chunk_size=5000):
+        """Stream an inventory CSV into the database in chunks, one executemany transaction per chunk.
+
+        Existing products are left untouched, matching add_inventory_item. Bad rows are skipped and
+        reported with their line numbers. Returns an ImportReport.
+        """
+        report = ImportReport(file_path)
+        with open(file_path, mode='r', newline='') as file:
+            reader = csv.DictReader(file)
+            while True:
+                chunk = []
+                consumed = 0  # Lines taken from the reader, blank ones included
+                for row in itertools.islice(reader, chunk_size):
+                    consumed += 1
+                    if not any(value.strip() for value in row.values() if isinstance(value, str)):
+                        continue  # Blank line
+                    report.rows_read += 1
+                    try:
+                        chunk.append((row['product'], int(row['stock']), int(row['min_threshold']), float(row['price'])))
+                    except (KeyError, TypeError, ValueError) as e:
+                        report.add_error(reader.line_num, f"{type(e).__name__}: {e}")
+                if not consumed:
+                    break
+                if not chunk:
+                    continue
+                with self.pool.connection() as conn:
+                    conn.executemany(
+                        "INSERT OR IGNORE INTO inventory (product, stock, min_threshold, price) VALUES (?, ?, ?, ?)",
+                        chunk
+                    )
+                report.rows_imported += len(chunk)
+        report.finish()
+        return report
+
+    def import_orders_csv(self, file_path, chunk_size=5000):
+        """Stream an orders CSV into the database in chunks, one executemany transaction per chunk.
+
+        Prices come from one preloaded product map and discounts are applied as save_order would.
+        An optional 'date' column (YYYY-MM-DD) is kept; otherwise today's date is used. Stock is
+        decremented once per product per chunk. Bad rows are skipped and reported with their line
+        numbers. Returns an ImportReport.
+        """
+        report = ImportReport(file_path)
+        with self.pool.connection() as conn:
+            prices = dict(conn.execute("SELECT product, price FROM inventory"))
+        today = datetime.now().date()
+        today_text = today.strftime('%Y-%m-%d')
+        seasonal_discount = self._seasonal_discount(today)
+
+        valid_dates = {today_text}  # Dates repeat heavily, so each distinct one is parsed only once
+
+        with open(file_path, mode='r', newline='') as file:
+            reader = csv.reader(file)
+            header = next(reader, [])
+            missing = [column for column in ('customer', 'product', 'quantity', 'payment_type') if column not in header]
+            if missing:
+                report.add_error(1, f"missing required columns: {', '.join(missing)}")
+                report.finish()
+                return report
+            customer_i, product_i, quantity_i, payment_i = (
+                header.index('customer'), header.index('product'), header.index('quantity'), header.index('payment_type'))
+            date_i = header.index('date') if 'date' in header else None
+            while True:
+                chunk = []
+                stock_changes = {}
+                consumed = 0  # Lines taken from the reader, blank ones included
+                for row in itertools.islice(reader, chunk_size):
+                    consumed += 1
+                    if not any(field.strip() for field in row):
+                        continue  # Blank line
+                    report.rows_read += 1
+                    try:
+                        product = row[product_i]
+                        price = prices.get(product)
+                        if price is None:
+                            raise ValueError(f"unknown product {product!r}")
+                        quantity = int(row[quantity_i])
+                        customer = row[customer_i]
+                        order_date = (row[date_i] if date_i is not None else None) or today_text
+                        if order_date not in valid_dates:
+                            # strptime accepts unpadded dates such as 2024-1-7, which SQLite's date functions do not
+                            if datetime.strptime(order_date, '%Y-%m-%d').strftime('%Y-%m-%d') != order_date:
+                                raise ValueError(f"date {order_date!r} is not in YYYY-MM-DD format")
+                            valid_dates.add(order_date)
+                        discount = self._discount_rate(quantity, customer, seasonal_discount)
+                        chunk.append((customer, product, quantity, row[payment_i],
+                                      quantity * price * (1 - discount), order_date))
+                    except (IndexError, ValueError) as e:
+                        report.add_error(reader.line_num, f"{type(e).__name__}: {e}")
+                        continue
+                    stock_changes[product] = stock_changes.get(product, 0) + quantity
+                if not consumed:
+                    break
+                if not chunk:
+                    continue
+                with self.pool.connection() as conn:
+                    conn.executemany(
+                        "INSERT INTO orders (customer, product, quantity, payment_type, discounted_amount, date) VALUES (?, ?, ?, ?, ?, ?)",
+                        chunk
+                    )
+                    conn.executemany(
+                        "UPDATE inventory SET stock = stock - ? WHERE product = ?",
+                        [(quantity, product) for product, quantity in stock_changes.items()]
+                    )
+                report.rows_imported += len(chunk)
+        report.finish()
+        return report
 
     def sync_inventory_from_csv(self, file_path):
         """Load inventory data from a CSV file into the database with error handling."""
         try:
-            with open(file_path, mode='r') as file:
-                reader = csv.DictReader(file)
-                for row in reader:
-                    product = row['product']
-                    stock = int(row['stock'])
-                    min_threshold = int(row['min_threshold'])
-                    price = float(row['price'])
-                    self.add_inventory_item(product, stock, min_threshold, price)
+            report = self.import_inventory_csv(file_path)
+            report.print_summary()
+            return report
         except FileNotFoundError as e:
             print(f"File not found: {e}")
         except csv.Error as e:
             print(f"Error reading CSV file: {e}")
 
-    def save_inventory_to_csv(self, file_path):
-        """Save current inventory data from the database to a CSV file."""
-        inventory = self.get_inventory()
-        try:
-            with open(file_path, mode='w', newline='') as file:
-                writer = csv.writer(file)
-                writer.writerow(['product', 'stock', 'min_threshold', 'price'])
-                for item in inventory:
-                    writer.writerow(item)
-        except IOError as e:
-            print(f"Error writing to CSV file: {e}")
+    def save_inventory_to_csv(self, file_path, compress=None, arraysize=1000):
+        """Stream current inventory data from the database to a CSV file, gzipped if requested or if the path ends in .gz."""
+        return self._export_query_to_csv(
+            "SELECT product, stock, min_threshold, price FROM inventory", (),
+            ['product', 'stock', 'min_threshold', 'price'], file_path, compress, arraysize
+        )
 
     def sync_orders_from_csv(self, file_path):
         """Load order data from a CSV file into the database with error handling."""
         try:
-            with open(file_path, mode='r') as file:
-                reader = csv.DictReader(file)
-                for row in reader:
-                    customer = row['customer']
-                    product = row['product']
-                    quantity = int(row['quantity'])
-                    payment_type = row['payment_type']
-                    discounted_amount = float(row['discounted_amount'])
-                    order_data = {
-                        "customer": customer,
-                        "product": product,
-                        "quantity": quantity,
-                        "payment_type": payment_type,
-                        "discounted_amount": discounted_amount,
-                        "product_price": self.get_product_price(product)
-                    }
-                    if order_data["product_price"] is not None:
-                        self.save_order(order_data)
+            report = self.import_orders_csv(file_path)
+            report.print_summary()
+            return report
         except FileNotFoundError as e:
             print(f"File not found: {e}")
         except csv.Error as e:
             print(f"Error reading CSV file: {e}")
 
-    def save_orders_to_csv(self, file_path):
-        """Save current order data from the database to a CSV file."""
-        orders = self.load_orders()
+    def save_orders_to_csv(self, file_path, start_date=None, end_date=None, compress=None, arraysize=1000):
+        """Stream order data from the database to a CSV file, optionally limited to a date range and gzipped.
+
+        Rows are fetched arraysize at a time and written as they arrive, so memory use does not grow
+        with the size of the orders table.
+        """
+        conditions, params = [], []
+        if start_date:
+            conditions.append("date >= ?")
+            params.append(start_date)
+        if end_date:
+            conditions.append("date <= ?")
+            params.append(end_date)
+        query = "SELECT id, customer, product, quantity, payment_type, discounted_amount, date FROM orders"
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        return self._export_query_to_csv(
+            query, params, ['id', 'customer', 'product', 'quantity', 'payment_type', 'discounted_amount', 'date'],
+            file_path, compress, arraysize
+        )
+
+    def _export_query_to_csv(self, query, params, header, file_path, compress, arraysize):
+        """Write a query's rows to CSV in cursor batches and report the rate; returns the number of rows written."""
+        if compress is None:
+            compress = file_path.endswith(".gz")
+        start = time.perf_counter()
+        rows_written = 0
         try:
-            with open(file_path, mode='w', newline='') as file:
-                writer = csv.writer(file)
-                writer.writerow(['id', 'customer', 'product', 'quantity', 'payment_type', 'discounted_amount', 'date'])
-                for order in orders:
-                    writer.writerow(order)
+            with self.pool.connection() as conn:
+                cursor = conn.cursor()
+                cursor.arraysize = arraysize
+                cursor.execute(query, params)
+                opener = gzip.open if compress else open
+                with opener(file_path, mode='wt', newline='') as file:
+                    writer = csv.writer(file)
+                    writer.writerow(header)
+                    while True:
+                        rows = cursor.fetchmany()
+                        if not rows:
+                            break
+                        writer.writerows(rows)
+                        rows_written += len(rows)
         except IOError as e:
             print(f"Error writing to CSV file: {e}")
+            return rows_written
+        elapsed = time.perf_counter() - start
+        rate = rows_written / elapsed if elapsed else 0.0
+        print(f"Exported {rows_written} rows to {file_path} in {elapsed:.2f}s ({rate:.0f} rows/s).")
+        return rows_written
 
     def load_orders(self):
         """Retrieve all order records."""
-        with sqlite3.connect(self.db_path) as conn:
+        with self.pool.connection() as conn:
             cursor = conn.cursor()
             cursor.execute("SELECT * FROM orders")
             return cursor.fetchall()
 
+    def get_revenue_report(self, timeframe="daily", start_date=None, end_date=None, product=None):
+        """Total discounted revenue per daily, weekly, monthly or yearly bucket, summed in SQLite.
+
+        Reads the daily_revenue rollup, so the cost grows with the number of days rather than orders.
+        Keys match the old Python reports: YYYY-MM-DD, YYYY-WW (Sunday-based week as in strftime %U),
+        YYYY-MM and YYYY. start_date and end_date bound order dates (inclusive) and product limits the report
+        to one product. Returns {key: total} in key order; rows whose date cannot be parsed are left out.
+        Raises ValueError for an unknown timeframe. report_cache serves the same reports from memory.
+        """
+        if timeframe not in REVENUE_REPORT_KEYS:
+            raise ValueError(f"Invalid timeframe: {timeframe}. Please select daily, weekly, monthly, or yearly.")
+        start_date = _as_date(start_date).isoformat() if start_date is not None else None
+        end_date = _as_date(end_date).isoformat() if end_date is not None else None
+        with self.pool.connection() as conn:
+            return _revenue_report(conn, timeframe, start_date, end_date, product)
+
+    def rebuild_daily_revenue(self):
+        """Recompute the daily_revenue rollup from orders, e.g. after writes made with triggers disabled."""
+        start = time.perf_counter()
+        with self.pool.connection() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            _rebuild_daily_revenue(conn.cursor())
+            rows = conn.execute("SELECT COUNT(*) FROM daily_revenue").fetchone()[0]
+        self.report_cache.invalidate()
+        return {"rows": rows, "elapsed": time.perf_counter() - start}
+
     def load_payments(self):
         """Retrieve all payment records from the database."""
-        with sqlite3.connect(self.db_path) as conn:
+        with self.pool.connection() as conn:
             cursor = conn.cursor()
             cursor.execute("SELECT * FROM payments")
             return cursor.fetchall()
 
     def add_time_log(self, employee_id, date, clock_in=None, clock_out=None, hours_worked=0, overtime_hours=0):
-        """Insert a new time log for an employee."""
-        with sqlite3.connect(self.db_path) as conn:
+        """Insert a new time log for an employee and refresh that day in the hours rollup."""
+        with self.pool.connection() as conn:
             cursor = conn.cursor()
             cursor.execute('''
                 INSERT INTO time_logs (employee_id, date, clock_in, clock_out, hours_worked, overtime_hours)
                 VALUES (?, ?, ?, ?, ?, ?)
             ''', (employee_id, date, clock_in, clock_out, hours_worked, overtime_hours))
+            _refresh_hours_rollup(cursor, employee_id, [date])
             conn.commit()
 
     def update_clock_out(self, employee_id, date, clock_out, hours_worked, overtime_hours):
-        """Update the clock-out time and hours worked for a specific time log."""
-        with sqlite3.connect(self.db_path) as conn:
+        """Update the clock-out time and hours worked for a specific time log, keeping the hours rollup current."""
+        with self.pool.connection() as conn:
             cursor = conn.cursor()
             cursor.execute('''
                 UPDATE time_logs 
                 SET clock_out = ?, hours_worked = ?, overtime_hours = ? 
                 WHERE employee_id = ? AND date = ?
             ''', (clock_out, hours_worked, overtime_hours, employee_id, date))
+            _refresh_hours_rollup(cursor, employee_id, [date])
             conn.commit()
 
     def request_time_off(self, employee_id, start_date, end_date, reason):
         """Record a time-off request for the employee."""
-        with sqlite3.connect(self.db_path) as conn:
+        with self.pool.connection() as conn:
             cursor = conn.cursor()
             cursor.execute('''
                 INSERT INTO time_off_requests (employee_id, start_date, end_date, reason, status)
@@ -544,19 +1625,63 @@ class DataManager:
 
     def approve_time_off(self, time_log_id, hours_approved):
         """Approve a time-off request by updating the status and approved hours."""
-        with sqlite3.connect(self.db_path) as conn:
+        with self.pool.connection() as conn:
             cursor = conn.cursor()
             cursor.execute('''
                 UPDATE time_logs 
                 SET time_off_approved = ?, status = 'Approved' 
                 WHERE id = ?
             ''', (hours_approved, time_log_id))
+            row = cursor.execute("SELECT employee_id, date FROM time_logs WHERE id = ?", (time_log_id,)).fetchone()
+            if row and row[1]:
+                _refresh_hours_rollup(cursor, row[0], [row[1]])
             conn.commit()
 
+    def rebuild_hours_rollup(self, employee_id=None):
+        """Recompute the daily and weekly hours rollup from time_logs, for everyone or one employee.
+
+        Use after time logs are written outside add_time_log, update_clock_out and approve_time_off.
+        """
+        start = time.perf_counter()
+        with self.pool.connection() as conn:
+            _refresh_hours_rollup(conn.cursor(), employee_id)
+            daily_rows = conn.execute("SELECT COUNT(*) FROM hours_rollup_daily").fetchone()[0]
+            weekly_rows = conn.execute("SELECT COUNT(*) FROM hours_rollup_weekly").fetchone()[0]
+        return {"daily_rows": daily_rows, "weekly_rows": weekly_rows, "elapsed": time.perf_counter() - start}
+
+    def get_hours_rollup(self, employee_id, start_date, end_date):
+        """Return hour totals for an employee between two dates (inclusive) from the rollup.
+
+        ISO weeks that lie wholly inside the range are read from the weekly rollup and the partial weeks
+        at either end from the daily rollup, so a pay period costs a handful of rows. The regular, overtime
+        and doubletime hours are the ones stored by the work state's OvertimeRule when the rollup was refreshed.
+        """
+        start_day, end_day = _as_date(start_date), _as_date(end_date)
+        first_full_week = _week_start(start_day + timedelta(days=6))
+        last_full_week = _week_start(end_day + timedelta(days=1)) - timedelta(days=7)
+        full_weeks = (first_full_week.isoformat(), last_full_week.isoformat())
+        with self.pool.connection() as conn:
+            row = conn.execute('''
+                SELECT COALESCE(SUM(days_worked), 0), COALESCE(SUM(hours_worked), 0), COALESCE(SUM(regular_hours), 0),
+                       COALESCE(SUM(overtime_hours), 0), COALESCE(SUM(doubletime_hours), 0),
+                       COALESCE(SUM(time_off_hours), 0)
+                FROM (
+                    SELECT days_worked, hours_worked, regular_hours, overtime_hours, doubletime_hours, time_off_hours
+                    FROM hours_rollup_weekly
+                    WHERE employee_id = ? AND week_start BETWEEN ? AND ?
+                    UNION ALL
+                    SELECT hours_worked > 0, hours_worked, regular_hours, overtime_hours, doubletime_hours, time_off_hours
+                    FROM hours_rollup_daily
+                    WHERE employee_id = ? AND date BETWEEN ? AND ? AND week_start NOT BETWEEN ? AND ?
+                )
+            ''', (employee_id, *full_weeks, employee_id, start_day.isoformat(), end_day.isoformat(), *full_weeks)).fetchone()
+        keys = ("days_worked", "hours_worked", "regular_hours", "overtime_hours", "doubletime_hours", "time_off_hours")
+        return dict(zip(keys, row))
+
     def set_deductions(self, employee_id, federal_tax_rate, fica_tax_rate, state_tax_rate,
                        health_insurance, retirement_contribution, other_deductions):
         """Set or update deductions for an employee."""
-        with sqlite3.connect(self.db_path) as conn:
+        with self.pool.connection() as conn:
             cursor = conn.cursor()
 
             # First, try to update an existing record
@@ -582,7 +1707,7 @@ class DataManager:
 
     def get_deductions(self, employee_id):
         """Retrieve deductions for a specific employee."""
-        with sqlite3.connect(self.db_path) as conn:
+        with self.pool.connection() as conn:
             cursor = conn.cursor()
             cursor.execute("SELECT * FROM deductions WHERE employee_id = ?", (employee_id,))
             row = cursor.fetchone()
@@ -593,7 +1718,7 @@ class DataManager:
 
     def add_bank_details(self, employee_id, bank_name, account_number, routing_number):
         """Add or update bank details for an employee."""
-        with sqlite3.connect(self.db_path) as conn:
+        with self.pool.connection() as conn:
             cursor = conn.cursor()
             cursor.execute('''
                 INSERT INTO bank_details (employee_id, bank_name, account_number, routing_number)
@@ -605,19 +1730,23 @@ class DataManager:
             ''', (employee_id, bank_name, account_number, routing_number))
             conn.commit()
 
-    def record_payroll(self, employee_id, pay_date, gross_pay, deductions, net_pay):
-        """Record a payroll transaction in payroll history."""
-        with sqlite3.connect(self.db_path) as conn:
+    def record_payroll(self, employee_id, pay_date, gross_pay, deductions, net_pay, voluntary_deductions=None):
+        """Record a payroll transaction in payroll history.
+
+        voluntary_deductions is the get_employee_deductions dict applied to this payment; when given, it and
+        the tax part of deductions are stored with the row for pay stubs.
+        """
+        with self.pool.connection() as conn:
             cursor = conn.cursor()
-            cursor.execute('''
-                INSERT INTO payroll_history (employee_id, pay_date, gross_pay, deductions, net_pay)
-                VALUES (?, ?, ?, ?, ?)
-            ''', (employee_id, pay_date, gross_pay, deductions, net_pay))
+            cursor.execute(f'''
+                INSERT INTO payroll_history ({_PAYROLL_HISTORY_INSERT_COLUMNS})
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', _payroll_history_row(employee_id, pay_date, gross_pay, deductions, net_pay, voluntary_deductions))
             conn.commit()
 
     def get_employee_id_by_ssn(self, ssn):
         """Retrieve the employee ID based on the SSN."""
-        with sqlite3.connect(self.db_path) as conn:
+        with self.pool.connection() as conn:
             cursor = conn.cursor()
             cursor.execute("SELECT id FROM employees WHERE ssn = ?", (ssn,))
             result = cursor.fetchone()
@@ -625,7 +1754,7 @@ class DataManager:
 
     def update_compensation(self, employee_id, hourly_rate=None, annual_salary=None, pay_frequency=None):
         """Update compensation details for an employee based on the employment type."""
-        with sqlite3.connect(self.db_path) as conn:
+        with self.pool.connection() as conn:
             cursor = conn.cursor()
             if hourly_rate is not None:
                 cursor.execute("UPDATE employees SET hourly_rate = ? WHERE id = ?", (hourly_rate, employee_id))
@@ -635,9 +1764,17 @@ class DataManager:
                 cursor.execute("UPDATE employees SET pay_frequency = ? WHERE id = ?", (pay_frequency, employee_id))
             conn.commit()
 
+    def set_work_state(self, employee_id, work_state):
+        """Change the state an employee works in and re-split their rolled-up hours under its overtime rules."""
+        with self.pool.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("UPDATE employees SET work_state = ? WHERE id = ?", (work_state, employee_id))
+            _refresh_hours_rollup(cursor, employee_id)
+            conn.commit()
+
     def set_payroll_schedule(self, employee_id, pay_frequency, next_pay_date):
         """Set or update the payroll schedule for an employee."""
-        with sqlite3.connect(self.db_path) as conn:
+        with self.pool.connection() as conn:
             cursor = conn.cursor()
 
             # Attempt to update an existing record
@@ -656,22 +1793,211 @@ class DataManager:
 
             conn.commit()
 
-    def get_payroll_history(self, employee_id):
-        """Retrieve payroll history for a specific employee."""
-        with sqlite3.connect(self.db_path) as conn:
+    def get_due_payroll(self, pay_date):
+        """Return (employee_id, pay_frequency) for every employee whose next pay date is on or before pay_date."""
+        with self.pool.connection() as conn:
+            return conn.execute('''
+                SELECT employee_id, pay_frequency
+                FROM payroll_schedule
+                WHERE next_pay_date <= ?
+                ORDER BY employee_id
+            ''', (pay_date,)).fetchall()
+
+    def get_deductions_by_ids(self, employee_ids):
+        """Return {employee_id: get_employee_deductions dict} for many employees, batching the IN lists."""
+        ids = list(dict.fromkeys(employee_ids))
+        deductions = {}
+        with self.pool.connection() as conn:
+            for start in range(0, len(ids), SQLITE_MAX_PARAMS):
+                batch = ids[start:start + SQLITE_MAX_PARAMS]
+                placeholders = ", ".join("?" * len(batch))
+                for employee_id, health, retirement, other in conn.execute(f'''
+                    SELECT employee_id, health_insurance, retirement_contribution, other_deductions
+                    FROM deductions
+                    WHERE employee_id IN ({placeholders})
+                    ORDER BY id
+                ''', batch):
+                    # Like get_employee_deductions, the first row recorded for an employee wins
+                    deductions.setdefault(employee_id, {"health_insurance": health or 0.0,
+                                                        "retirement_contribution": retirement or 0.0,
+                                                        "other_deductions": other or 0.0})
+        return deductions
+
+    def get_voluntary_deductions_by_ids(self, employee_ids):
+        """Return {employee_id: total voluntary deductions} for many employees, batching the IN lists."""
+        return {employee_id: sum(parts.values())
+                for employee_id, parts in self.get_deductions_by_ids(employee_ids).items()}
+
+    def get_hours_by_employee_ids(self, employee_ids, start_date, end_date):
+        """Return {employee_id: [(date, hours_worked), ...]} from the daily hours rollup, batching the IN lists."""
+        ids = list(dict.fromkeys(employee_ids))
+        hours = {}
+        with self.pool.connection() as conn:
+            for start in range(0, len(ids), SQLITE_MAX_PARAMS):
+                batch = ids[start:start + SQLITE_MAX_PARAMS]
+                placeholders = ", ".join("?" * len(batch))
+                for employee_id, date, hours_worked in conn.execute(f'''
+                    SELECT employee_id, date, hours_worked
+                    FROM hours_rollup_daily
+                    WHERE employee_id IN ({placeholders}) AND date BETWEEN ? AND ?
+                    ORDER BY employee_id, date
+                ''', batch + [_as_date(start_date).isoformat(), _as_date(end_date).isoformat()]):
+                    hours.setdefault(employee_id, []).append((date, hours_worked))
+        return hours
+
+    def iter_daily_hours(self, start_date, end_date, batch_size=5000):
+        """Yield (employee_id, date, hours_worked) from the daily hours rollup, ordered by employee and date.
+
+        Rows are fetched batch_size at a time, so a whole workforce's history streams in bounded memory.
+        """
+        with self.pool.connection() as conn:
             cursor = conn.cursor()
+            cursor.arraysize = batch_size
             cursor.execute('''
-                SELECT pay_date, gross_pay, deductions, net_pay
-                FROM payroll_history
-                WHERE employee_id = ?
-                ORDER BY pay_date DESC
-            ''', (employee_id,))
+                SELECT employee_id, date, hours_worked
+                FROM hours_rollup_daily
+                WHERE date BETWEEN ? AND ?
+                ORDER BY employee_id, date
+            ''', (_as_date(start_date).isoformat(), _as_date(end_date).isoformat()))
+            while True:
+                rows = cursor.fetchmany()
+                if not rows:
+                    return
+                yield from rows
+
+    def iter_pay_stub_rows(self, pay_date, batch_size=1000):
+        """Yield one dict per payroll_history row on pay_date with the employee, deduction and year-to-date
+        fields a pay stub needs, ordered by employee.
+
+        Employees and deductions are joined in the same query and rows are fetched batch_size at a time, so a
+        whole company's stubs stream in bounded memory. Year-to-date totals run from January 1 through pay_date.
+        Taxes and voluntary deductions are the amounts stored with the payment when it was recorded.
+        """
+        pay_date = _as_date(pay_date)
+        year_start = pay_date.replace(month=1, day=1).isoformat()
+        with self.pool.connection() as conn:
+            cursor = conn.cursor()
+            cursor.arraysize = batch_size
+            cursor.execute('''
+                SELECT ph.id AS payroll_id, ph.employee_id, ph.pay_date, ph.gross_pay, ph.deductions, ph.net_pay,
+                       e.full_name, e.address, e.ssn, e.job_title, e.department, e.employment_type,
+                       e.pay_frequency, e.hourly_rate, e.annual_salary, e.work_state,
+                       COALESCE(ph.health_insurance, d.health_insurance, 0) AS health_insurance,
+                       COALESCE(ph.retirement_contribution, d.retirement_contribution, 0) AS retirement_contribution,
+                       COALESCE(ph.other_deductions, d.other_deductions, 0) AS other_deductions,
+                       COALESCE(ph.tax_deductions, ph.deductions - COALESCE(d.health_insurance, 0)
+                                - COALESCE(d.retirement_contribution, 0) - COALESCE(d.other_deductions, 0))
+                           AS tax_deductions,
+                       (SELECT SUM(gross_pay) FROM payroll_history
+                        WHERE employee_id = ph.employee_id AND pay_date BETWEEN :year_start AND ph.pay_date) AS ytd_gross_pay,
+                       (SELECT SUM(deductions) FROM payroll_history
+                        WHERE employee_id = ph.employee_id AND pay_date BETWEEN :year_start AND ph.pay_date) AS ytd_deductions,
+                       (SELECT SUM(net_pay) FROM payroll_history
+                        WHERE employee_id = ph.employee_id AND pay_date BETWEEN :year_start AND ph.pay_date) AS ytd_net_pay
+                FROM payroll_history ph
+                JOIN employees e ON e.id = ph.employee_id
+                -- Rows recorded before the components were stored fall back to the current deductions; like
+                -- get_employee_deductions, the first row recorded for an employee wins
+                LEFT JOIN deductions d ON d.id = (SELECT MIN(id) FROM deductions WHERE employee_id = ph.employee_id)
+                WHERE ph.pay_date = :pay_date
+                ORDER BY ph.employee_id, ph.id
+            ''', {"year_start": year_start, "pay_date": pay_date.isoformat()})
             columns = [column[0] for column in cursor.description]
-            return [dict(zip(columns, row)) for row in cursor.fetchall()]
+            while True:
+                rows = cursor.fetchmany()
+                if not rows:
+                    return
+                for row in rows:
+                    yield dict(zip(columns, row))
+
+    def record_payroll_run(self, payroll_rows, schedule_updates):
+        """Write payroll history rows and advance pay dates in one transaction.
+
+        payroll_rows holds (employee_id, pay_date, gross_pay, deductions, net_pay, voluntary_deductions), where
+        voluntary_deductions is a get_employee_deductions dict or None, and schedule_updates holds
+        (next_pay_date, employee_id).
+        """
+        with self.pool.connection() as conn:
+            conn.executemany(f'''
+                INSERT INTO payroll_history ({_PAYROLL_HISTORY_INSERT_COLUMNS})
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', (_payroll_history_row(*row) for row in payroll_rows))
+            conn.executemany(
+                "UPDATE payroll_schedule SET next_pay_date = ? WHERE employee_id = ?",
+                schedule_updates
+            )
+
+    def get_payroll_history(self, employee_id, start_date=None, end_date=None):
+        """Retrieve payroll history for a specific employee, newest first, optionally within a date range.
+
+        Rows keep their original shape (pay_date, gross_pay, deductions, net_pay); the paging id is only
+        part of get_payroll_history_page rows.
+        """
+        rows = []
+        cursor = None
+        while True:
+            page = self.get_payroll_history_page(employee_id, start_date, end_date, limit=500, cursor=cursor)
+            rows.extend({key: value for key, value in row.items() if key != "id"} for row in page["rows"])
+            cursor = page["next_cursor"]
+            if cursor is None:
+                return rows
+
+    def get_payroll_history_page(self, employee_id, start_date=None, end_date=None, limit=20, cursor=None):
+        """Return one page of an employee's payroll history, newest first.
+
+        start_date and end_date bound pay_date (inclusive). cursor is the next_cursor of the previous page, a
+        (pay_date, id) pair; the page seeks past it on the (employee_id, pay_date) index rather than using
+        OFFSET, so every page costs the same however far back it is. Returns a dict with rows and next_cursor,
+        which is None on the last page.
+        """
+        conditions = ["employee_id = ?"]
+        params = [employee_id]
+        if start_date is not None:
+            conditions.append("pay_date >= ?")
+            params.append(_as_date(start_date).isoformat())
+        if end_date is not None:
+            conditions.append("pay_date <= ?")
+            params.append(_as_date(end_date).isoformat())
+        if cursor is not None:
+            # The pay_date <= ? bound lets SQLite seek straight to the cursor on the index
+            conditions.append("pay_date <= ? AND (pay_date < ? OR id < ?)")
+            params.extend((cursor[0], cursor[0], cursor[1]))
+        with self.pool.connection() as conn:
+            result = conn.execute(f'''
+                SELECT id, pay_date, gross_pay, deductions, net_pay
+                FROM payroll_history
+                WHERE {" AND ".join(conditions)}
+                ORDER BY pay_date DESC, id DESC
+                LIMIT ?
+            ''', (*params, limit + 1))
+            columns = [column[0] for column in result.description]
+            rows = [dict(zip(columns, row)) for row in result.fetchall()]
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = (rows[-1]["pay_date"], rows[-1]["id"])
+        return {"rows": rows, "next_cursor": next_cursor}
+
+    def get_payroll_totals(self, employee_id, start_date, end_date):
+        """Sum an employee's gross pay, deductions and net pay over pay dates between two dates (inclusive)."""
+        with self.pool.connection() as conn:
+            row = conn.execute('''
+                SELECT COUNT(*), COALESCE(SUM(gross_pay), 0), COALESCE(SUM(deductions), 0),
+                       COALESCE(SUM(net_pay), 0), MIN(pay_date), MAX(pay_date)
+                FROM payroll_history
+                WHERE employee_id = ? AND pay_date BETWEEN ? AND ?
+            ''', (employee_id, _as_date(start_date).isoformat(), _as_date(end_date).isoformat())).fetchone()
+        keys = ("pay_periods", "gross_pay", "deductions", "net_pay", "first_pay_date", "last_pay_date")
+        return dict(zip(keys, row))
+
+    def get_year_to_date_totals(self, employee_id, as_of=None):
+        """Year-to-date payroll totals for an employee, from January 1 through as_of (default today)."""
+        as_of = _as_date(as_of or date.today())
+        return self.get_payroll_totals(employee_id, as_of.replace(month=1, day=1), as_of)
 
     def set_state_tax(self, state, income_tax_rate, sui_rate, local_tax_rate=0.0):
         """Set or update tax rates for a specific state."""
-        with sqlite3.connect(self.db_path) as conn:
+        with self.pool.connection() as conn:
             cursor = conn.cursor()
             cursor.execute('''
                 INSERT INTO state_tax (state, income_tax_rate, sui_rate, local_tax_rate)
@@ -682,25 +2008,15 @@ class DataManager:
                     local_tax_rate = excluded.local_tax_rate
             ''', (state, income_tax_rate, sui_rate, local_tax_rate))
             conn.commit()
+        self.reference_cache.invalidate("state_tax")
 
     def get_state_tax_rates(self, state):
         """Retrieve state and local tax rates for a given state."""
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
-            cursor.execute('''
-                SELECT income_tax_rate, sui_rate, local_tax_rate
-                FROM state_tax
-                WHERE state = ?
-            ''', (state,))
-            row = cursor.fetchone()
-            if row:
-                return {
-                    "income_tax_rate": row[0],
-                    "sui_rate": row[1],
-                    "local_tax_rate": row[2]
-                }
-            else:
-                return {"income_tax_rate": 0.0, "sui_rate": 0.0, "local_tax_rate": 0.0}
+        rates = self.reference_cache.table("state_tax").get(state)
+        if rates:
+            return dict(rates)
+        else:
+            return {"income_tax_rate": 0.0, "sui_rate": 0.0, "local_tax_rate": 0.0}
 
     def get_federal_tax_rate(self):
         """Return the current federal income tax rate."""
@@ -714,7 +2030,7 @@ class DataManager:
 
     def get_employee_deductions(self, employee_id):
         """Retrieve voluntary deductions for an employee."""
-        with sqlite3.connect(self.db_path) as conn:
+        with self.pool.connection() as conn:
             cursor = conn.cursor()
             cursor.execute('''
                 SELECT health_insurance, retirement_contribution, other_deductions
@@ -730,37 +2046,45 @@ class DataManager:
 
     def get_overtime_rules(self, state):
         """Retrieve overtime rules for a specific state."""
-        with sqlite3.connect(self.db_path) as conn:
+        rules = self.reference_cache.table("state_overtime_rules").get(state)
+        if rules:
+            return dict(rules)
+        else:
+            # Default to standard weekly overtime if no state-specific rule exists
+            return dict(DEFAULT_OVERTIME_RULES)
+
+    def get_overtime_rule(self, state):
+        """Return the compiled OvertimeRule for a state, recompiling only after the rules table is reloaded."""
+        table = self.reference_cache.table("state_overtime_rules")
+        compiled = self._overtime_rule_book
+        if compiled is None or compiled[0] is not table:
+            compiled = (table, OvertimeRuleBook(table))
+            self._overtime_rule_book = compiled
+        return compiled[1].rule_for(state)
+
+    def set_overtime_rules(self, state, daily_overtime_threshold=8, doubletime_threshold=12,
+                           weekly_overtime_threshold=40, overtime_rate=1.5, doubletime_rate=2.0,
+                           seventh_day_overtime=False):
+        """Set or update a state's overtime rules; pass None for a threshold the state does not have."""
+        with self.pool.connection() as conn:
+            conn.execute('''
+                INSERT OR REPLACE INTO state_overtime_rules (state, daily_overtime_threshold, doubletime_threshold,
+                                                             weekly_overtime_threshold, overtime_rate, doubletime_rate,
+                                                             seventh_day_overtime)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            ''', (state, daily_overtime_threshold, doubletime_threshold, weekly_overtime_threshold, overtime_rate,
+                  doubletime_rate, int(seventh_day_overtime)))
+            # The stored overtime split of everyone working in the state now follows the new rules
             cursor = conn.cursor()
-            cursor.execute('''
-                SELECT daily_overtime_threshold, doubletime_threshold, weekly_overtime_threshold,
-                       overtime_rate, doubletime_rate
-                FROM state_overtime_rules
-                WHERE state = ?
-            ''', (state,))
-            row = cursor.fetchone()
-            if row:
-                return {
-                    "daily_overtime_threshold": row[0],
-                    "doubletime_threshold": row[1],
-                    "weekly_overtime_threshold": row[2],
-                    "overtime_rate": row[3],
-                    "doubletime_rate": row[4]
-                }
-            else:
-                # Default to standard weekly overtime if no state-specific rule exists
-                return {
-                    "daily_overtime_threshold": 8,
-                    "doubletime_threshold": 12,
-                    "weekly_overtime_threshold": 40,
-                    "overtime_rate": 1.5,
-                    "doubletime_rate": 2.0
-                }
+            for (employee_id,) in cursor.execute("SELECT id FROM employees WHERE work_state = ?", (state,)).fetchall():
+                _refresh_hours_rollup(cursor, employee_id)
+            conn.commit()
+        self.reference_cache.invalidate("state_overtime_rules")
 
     def accrue_leave(self, employee_id, hours_worked):
         """Accrue leave for an employee based on state policy and hours worked."""
         employee_data = self.get_employee_by_id(employee_id)
-        state = employee_data.get("state")
+        state = employee_data.get("work_state")
         leave_policy = self.get_leave_policy(state)
 
         # Calculate accrued leave
@@ -768,8 +2092,9 @@ class DataManager:
         family_leave_accrued = hours_worked * leave_policy['family_leave_rate']
 
         # Update the employee's leave balances
-        with sqlite3.connect(self.db_path) as conn:
+        with self.pool.connection() as conn:
             cursor = conn.cursor()
+            cursor.execute("INSERT OR IGNORE INTO leave_balances (employee_id) VALUES (?)", (employee_id,))
             cursor.execute('''
                 UPDATE leave_balances
                 SET sick_leave = sick_leave + ?, family_leave = family_leave + ?
@@ -777,34 +2102,117 @@ class DataManager:
             ''', (sick_leave_accrued, family_leave_accrued, employee_id))
             conn.commit()
 
+    def accrue_leave_for_period(self, period_start, period_end):
+        """Accrue sick and family leave for every employee from the hours worked in a closed pay period.
+
+        Hours come from the daily hours rollup and rates from the work state's leave policy. The ledger
+        insert and the balance update are two set-based statements in one transaction, and the ledger is
+        keyed by employee and period, so closing the same period again accrues nothing twice. A period that
+        overlaps an already closed one with different bounds is rejected. Returns a summary dict.
+        """
+        start = time.perf_counter()
+        period = (_as_date(period_start).isoformat(), _as_date(period_end).isoformat())
+        if period[0] > period[1]:
+            raise ValueError("period_start must not be after period_end")
+        conn = self.pool.connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            overlapping = conn.execute('''
+                SELECT period_start, period_end FROM leave_accrual_runs
+                WHERE period_start <= ? AND period_end >= ? AND NOT (period_start = ? AND period_end = ?)
+                LIMIT 1
+            ''', (period[1], period[0], *period)).fetchone()
+            if overlapping:
+                raise ValueError(f"Period overlaps the accrual period {overlapping[0]} to {overlapping[1]}")
+            run_id = conn.execute(
+                "INSERT INTO leave_accrual_runs (period_start, period_end, run_at) VALUES (?, ?, ?)",
+                (*period, datetime.now().isoformat(timespec="seconds"))).lastrowid
+            conn.execute('''
+                INSERT OR IGNORE INTO leave_accruals (employee_id, period_start, period_end, run_id, hours_worked,
+                                                      sick_leave, family_leave)
+                SELECT hours.employee_id, ?, ?, ?, hours.worked,
+                       hours.worked * COALESCE(policy.sick_leave_rate, 0),
+                       hours.worked * COALESCE(policy.family_leave_rate, 0)
+                FROM (
+                    SELECT employee_id, SUM(hours_worked) AS worked
+                    FROM hours_rollup_daily
+                    WHERE date BETWEEN ? AND ?
+                    GROUP BY employee_id
+                ) AS hours
+                JOIN employees ON employees.id = hours.employee_id
+                LEFT JOIN state_leave_policies AS policy ON policy.state = employees.work_state
+            ''', (*period, run_id, *period))
+            conn.execute('''
+                INSERT OR IGNORE INTO leave_balances (employee_id)
+                SELECT employee_id FROM leave_accruals WHERE run_id = ?
+            ''', (run_id,))
+            # Correlated subqueries rather than UPDATE ... FROM, which needs SQLite 3.33 or later; each one
+            # is a primary-key lookup on (employee_id, period_start, period_end)
+            conn.execute('''
+                UPDATE leave_balances
+                SET sick_leave = sick_leave + (
+                        SELECT accrued.sick_leave FROM leave_accruals AS accrued
+                        WHERE accrued.employee_id = leave_balances.employee_id
+                          AND accrued.period_start = ? AND accrued.period_end = ? AND accrued.run_id = ?),
+                    family_leave = family_leave + (
+                        SELECT accrued.family_leave FROM leave_accruals AS accrued
+                        WHERE accrued.employee_id = leave_balances.employee_id
+                          AND accrued.period_start = ? AND accrued.period_end = ? AND accrued.run_id = ?)
+                WHERE employee_id IN (SELECT employee_id FROM leave_accruals WHERE run_id = ?)
+            ''', (*period, run_id, *period, run_id, run_id))
+            employees, hours_worked, sick_leave, family_leave = conn.execute('''
+                SELECT COUNT(*), COALESCE(SUM(hours_worked), 0), COALESCE(SUM(sick_leave), 0),
+                       COALESCE(SUM(family_leave), 0)
+                FROM leave_accruals WHERE run_id = ?
+            ''', (run_id,)).fetchone()
+            if employees:
+                conn.execute('''
+                    UPDATE leave_accrual_runs SET employees = ?, hours_worked = ?, sick_leave = ?, family_leave = ?
+                    WHERE id = ?
+                ''', (employees, hours_worked, sick_leave, family_leave, run_id))
+            else:
+                conn.execute("DELETE FROM leave_accrual_runs WHERE id = ?", (run_id,))
+            already_accrued = conn.execute('''
+                SELECT COUNT(*) FROM leave_accruals WHERE period_start = ? AND period_end = ? AND run_id != ?
+            ''', (*period, run_id)).fetchone()[0]
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        return {
+            "period_start": period[0],
+            "period_end": period[1],
+            "employees_accrued": employees,
+            "already_accrued": already_accrued,
+            "hours_worked": hours_worked,
+            "sick_leave": sick_leave,
+            "family_leave": family_leave,
+            "elapsed": time.perf_counter() - start,
+        }
+
+    def get_leave_balances(self, employee_id):
+        """Return {'sick_leave', 'family_leave', 'other_leave'} for an employee, zeros if none are recorded."""
+        with self.pool.connection() as conn:
+            row = conn.execute(
+                "SELECT sick_leave, family_leave, other_leave FROM leave_balances WHERE employee_id = ?",
+                (employee_id,)).fetchone()
+        return dict(zip(("sick_leave", "family_leave", "other_leave"), row or (0.0, 0.0, 0.0)))
+
     def get_leave_policy(self, state):
         """Retrieve leave accrual rates for a specific state."""
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
-            cursor.execute('''
-                SELECT sick_leave_rate, family_leave_rate
-                FROM state_leave_policies
-                WHERE state = ?
-            ''', (state,))
-            row = cursor.fetchone()
-            return {
-                "sick_leave_rate": row[0] if row else 0.0,
-                "family_leave_rate": row[1] if row else 0.0
-            }
+        policy = self.reference_cache.table("state_leave_policies").get(state)
+        return {
+            "sick_leave_rate": policy["sick_leave_rate"] if policy else 0.0,
+            "family_leave_rate": policy["family_leave_rate"] if policy else 0.0
+        }
 
     def is_reciprocal_state(self, home_state, work_state):
         """Check if a reciprocity agreement exists between home and work states."""
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
-            cursor.execute('''
-                SELECT 1 FROM tax_reciprocity
-                WHERE home_state = ? AND work_state = ?
-            ''', (home_state, work_state))
-            return cursor.fetchone() is not None
+        return (home_state, work_state) in self.reference_cache.table("tax_reciprocity")
 
     def set_country_tax(self, country_code, income_tax_rate, social_contribution_rate, expatriate_tax_rate=0.0):
         """Set or update tax information for a specific country."""
-        with sqlite3.connect(self.db_path) as conn:
+        with self.pool.connection() as conn:
             cursor = conn.cursor()
             cursor.execute('''
                 INSERT INTO country_tax (country_code, income_tax_rate, social_contribution_rate, expatriate_tax_rate)
@@ -815,51 +2223,124 @@ class DataManager:
                     expatriate_tax_rate = excluded.expatriate_tax_rate
             ''', (country_code, income_tax_rate, social_contribution_rate, expatriate_tax_rate))
             conn.commit()
+        self.reference_cache.invalidate("country_tax")
 
     def get_country_tax_rates(self, country_code):
         """Retrieve tax rates for a specific country."""
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
-            cursor.execute('''
-                SELECT income_tax_rate, social_contribution_rate, expatriate_tax_rate
-                FROM country_tax
-                WHERE country_code = ?
-            ''', (country_code,))
-            row = cursor.fetchone()
-            return {
-                "income_tax_rate": row[0] if row else 0.0,
-                "social_contribution_rate": row[1] if row else 0.0,
-                "expatriate_tax_rate": row[2] if row else 0.0
-            }
+        rates = self.reference_cache.table("country_tax").get(country_code)
+        return {
+            "income_tax_rate": rates["income_tax_rate"] if rates else 0.0,
+            "social_contribution_rate": rates["social_contribution_rate"] if rates else 0.0,
+            "expatriate_tax_rate": rates["expatriate_tax_rate"] if rates else 0.0
+        }
+
+    def fetch_and_update_exchange_rates(self, base_currency="USD", api_url=None, timeout=(3.05, 10),
+                                        retries=3, backoff=0.5):
+        """Fetch the latest exchange rates from an external API and update the database.
+
+        Requests are conditional (If-None-Match / If-Modified-Since), bounded by timeout and retried with
+        exponential backoff on connection errors, 429 and 5xx responses. Only rates that changed are
+        written, with one executemany. api_url may contain '{base}' and can point at a local stub server.
+        Returns a summary dict with status 'updated', 'not_modified' or 'failed'; entries whose rate is not a
+        positive number are left out and listed under 'skipped'.
+        """
+        url = (api_url or EXCHANGE_RATE_API_URL).format(base=base_currency)
+        etag, last_modified = self._exchange_rate_validators.get(url, (None, None))
+        headers = {}
+        if etag:
+            headers["If-None-Match"] = etag
+        if last_modified:
+            headers["If-Modified-Since"] = last_modified
+
+        response = None
+        for attempt in range(retries + 1):
+            try:
+                response = requests.get(url, headers=headers, timeout=timeout)
+                if response.status_code != 429 and response.status_code < 500:
+                    break
+                error = requests.HTTPError(f"{response.status_code} response from {url}", response=response)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                error = e
+            response = None
+            if attempt < retries:
+                time.sleep(backoff * 2 ** attempt)
+        if response is None:
+            print(f"Error fetching exchange rates: {error}")
+            return {"status": "failed", "error": str(error)}
+
+        if response.status_code == 304:
+            print("Exchange rates unchanged since the last refresh.")
+            return {"status": "not_modified", "updated": 0, "unchanged": len(self.get_exchange_rates())}
 
-    def fetch_and_update_exchange_rates(self, base_currency="USD"):
-        """Fetch the latest exchange rates from an external API and update the database."""
-        api_url = f"https://api.exchangerate-api.com/v4/latest/{base_currency}"
-        
         try:
-            response = requests.get(api_url)
             response.raise_for_status()
             rates = response.json().get("rates", {})
-            
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
-                for currency_code, rate in rates.items():
-                    cursor.execute('''
-                        INSERT INTO currency_rates (currency_code, exchange_rate, last_updated)
-                        VALUES (?, ?, datetime('now'))
-                        ON CONFLICT(currency_code) DO UPDATE SET
-                            exchange_rate = excluded.exchange_rate,
-                            last_updated = datetime('now')
-                    ''', (currency_code, rate))
-                conn.commit()
-            print("Exchange rates successfully updated.")
-        
-        except requests.RequestException as e:
+            if not isinstance(rates, dict):
+                raise ValueError(f"expected a rates object, got {type(rates).__name__}")
+        except (requests.RequestException, ValueError, AttributeError) as e:
             print(f"Error fetching exchange rates: {e}")
+            return {"status": "failed", "error": str(e)}
+
+        # A bad entry is skipped and reported rather than aborting the whole refresh
+        valid, skipped = {}, []
+        for code, rate in rates.items():
+            try:
+                rate = float(rate)
+            except (TypeError, ValueError):
+                rate = None
+            if rate is None or not math.isfinite(rate) or rate <= 0:
+                skipped.append(code)
+            else:
+                valid[code] = rate
+        if skipped:
+            print(f"Skipped {len(skipped)} invalid exchange rate(s): {', '.join(map(str, skipped[:10]))}")
+
+        # A rate quoted against a different base is a change even when the number is the same
+        with self.pool.connection() as conn:
+            stored = {code: (rate, base) for code, rate, base in conn.execute(
+                "SELECT currency_code, exchange_rate, base_currency FROM currency_rates")}
+        current = self.get_exchange_rates()
+        changed = [(code, rate, base_currency) for code, rate in valid.items()
+                   if stored.get(code) != (rate, base_currency)]
+        if changed:
+            with self.pool.connection() as conn:
+                conn.executemany('''
+                    INSERT INTO currency_rates (currency_code, exchange_rate, base_currency, last_updated)
+                    VALUES (?, ?, ?, datetime('now'))
+                    ON CONFLICT(currency_code) DO UPDATE SET
+                        exchange_rate = excluded.exchange_rate,
+                        base_currency = excluded.base_currency,
+                        last_updated = datetime('now')
+                ''', changed)
+            updated = dict(current)
+            updated.update((code, rate) for code, rate, _ in changed)
+            self._exchange_rates = updated
+        self._exchange_rate_validators[url] = (response.headers.get("ETag"), response.headers.get("Last-Modified"))
+        unchanged = len(valid) - len(changed)
+        print(f"Exchange rates successfully updated ({len(changed)} changed, {unchanged} unchanged).")
+        return {"status": "updated", "updated": len(changed), "unchanged": unchanged, "skipped": skipped}
+
+    def get_exchange_rates(self):
+        """Return the in-memory {currency_code: rate} map, loading it from currency_rates on first use."""
+        if self._exchange_rates is None:
+            with self.pool.connection() as conn:
+                self._exchange_rates = dict(conn.execute("SELECT currency_code, exchange_rate FROM currency_rates"))
+        return self._exchange_rates
+
+    def convert_currency(self, amount, from_currency, to_currency):
+        """Convert an amount between two currencies using the cached rate map; returns None if a rate is missing."""
+        if from_currency == to_currency:
+            return amount
+        rates = self.get_exchange_rates()
+        from_rate = rates.get(from_currency)
+        to_rate = rates.get(to_currency)
+        if not from_rate or to_rate is None:
+            return None
+        return amount / from_rate * to_rate
 
     def update_tax_forms(self, employee_id, federal_form_path, state_form_path):
         """Update the federal and state tax form paths for an employee."""
-        with sqlite3.connect(self.db_path) as conn:
+        with self.pool.connection() as conn:
             cursor = conn.cursor()
             cursor.execute('''
                 UPDATE employees
@@ -871,7 +2352,7 @@ class DataManager:
 
     def add_or_update_minimum_wage(self, state, minimum_wage):
         """Add or update the minimum wage for a given state."""
-        with sqlite3.connect(self.db_path) as conn:
+        with self.pool.connection() as conn:
             cursor = conn.cursor()
             cursor.execute('''
                 INSERT INTO state_minimum_wages (state, minimum_wage)
@@ -879,11 +2360,8 @@ class DataManager:
                 ON CONFLICT(state) DO UPDATE SET minimum_wage = excluded.minimum_wage
             ''', (state, minimum_wage))
             conn.commit()
+        self.reference_cache.invalidate("state_minimum_wages")
 
     def get_minimum_wage(self, state):
         """Retrieve the minimum wage for a given state."""
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
-            cursor.execute('SELECT minimum_wage FROM state_minimum_wages WHERE state = ?', (state,))
-            result = cursor.fetchone()
-            return result[0] if result else None
+        return self.reference_cache.table("state_minimum_wages").get(state)
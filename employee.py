@@ -66,3 +66,81 @@ class Employee:
             elif self.pay_frequency == "monthly":
                 return self.hourly_rate * weekly_hours * 4
         return 0
+
+
+# Column order of the employees table, as selected by DataManager's employee queries
+EMPLOYEE_COLUMNS = (
+    "id", "full_name", "address", "ssn", "phone", "email", "employment_type",
+    "job_title", "department", "start_date", "end_date", "federal_w4", "state_tax_form",
+    "hourly_rate", "annual_salary", "overtime_rate", "commission", "pay_frequency",
+    "local_id", "work_permit_status", "currency_preference",
+    "home_state", "work_state", "country_code", "is_expatriate",
+)
+
+
+class EmployeeRecord:
+    """Compact read-only employee row; also supports record["field"] and record.get("field") like the old dicts."""
+
+    __slots__ = EMPLOYEE_COLUMNS
+    _FIELDS = frozenset(EMPLOYEE_COLUMNS)
+
+    def __init__(self, id, full_name, address, ssn, phone, email, employment_type,
+                 job_title, department, start_date, end_date, federal_w4, state_tax_form,
+                 hourly_rate, annual_salary, overtime_rate, commission, pay_frequency,
+                 local_id, work_permit_status, currency_preference,
+                 home_state, work_state, country_code, is_expatriate):
+        self.id = id
+        self.full_name = full_name
+        self.address = address
+        self.ssn = ssn
+        self.phone = phone
+        self.email = email
+        self.employment_type = employment_type
+        self.job_title = job_title
+        self.department = department
+        self.start_date = start_date
+        self.end_date = end_date
+        self.federal_w4 = federal_w4
+        self.state_tax_form = state_tax_form
+        self.hourly_rate = hourly_rate
+        self.annual_salary = annual_salary
+        self.overtime_rate = overtime_rate
+        self.commission = commission
+        self.pay_frequency = pay_frequency
+        self.local_id = local_id
+        self.work_permit_status = work_permit_status
+        self.currency_preference = currency_preference
+        self.home_state = home_state
+        self.work_state = work_state
+        self.country_code = country_code
+        self.is_expatriate = bool(is_expatriate)
+
+    @classmethod
+    def from_row(cls, cursor, row):
+        """sqlite3 row factory for queries that select EMPLOYEE_COLUMNS in order."""
+        return cls(*row)
+
+    def get(self, field, default=None):
+        if field in self._FIELDS:
+            return getattr(self, field)
+        return default
+
+    def __getitem__(self, field):
+        if field not in self._FIELDS:
+            raise KeyError(field)
+        return getattr(self, field)
+
+    def __contains__(self, field):
+        return field in self._FIELDS
+
+    def keys(self):
+        return EMPLOYEE_COLUMNS
+
+    def to_dict(self):
+        return {field: getattr(self, field) for field in EMPLOYEE_COLUMNS}
+
+    def __eq__(self, other):
+        return isinstance(other, EmployeeRecord) and self.to_dict() == other.to_dict()
+
+    def __repr__(self):
+        return f"EmployeeRecord(id={self.id!r}, full_name={self.full_name!r}, department={self.department!r})"
@@ -1,11 +1,11 @@
 # employee_portal.py
 
-from datamanager import DataManager
+from datamanager import get_data_manager
 from datetime import datetime
 
 class EmployeePortal:
-    def __init__(self, employee_id):
-        self.data_manager = DataManager()
+    def __init__(self, employee_id, data_manager=None):
+        self.data_manager = data_manager or get_data_manager()
         self.employee_id = employee_id  # Set the employee ID
 
 
@@ -32,12 +32,21 @@ class EmployeePortal:
         else:
             print("Clock-in record not found for today.")
 
-    def view_pay_stubs(self):
-        """Allow the employee to view their pay stubs."""
-        pay_history = self.data_manager.get_payroll_history(self.employee_id)
+    def view_pay_stubs(self, page_size=10):
+        """Allow the employee to view their pay stubs, newest first, a page at a time."""
+        ytd = self.data_manager.get_year_to_date_totals(self.employee_id)
+        print(f"Year to Date ({ytd['pay_periods']} pay periods): Gross Pay: ${ytd['gross_pay']:.2f}, "
+              f"Deductions: ${ytd['deductions']:.2f}, Net Pay: ${ytd['net_pay']:.2f}")
         print("Your Pay Stubs:")
-        for record in pay_history:
-            print(f"Date: {record['date']}, Net Pay: ${record['net_pay']:.2f}")
+        cursor = None
+        while True:
+            page = self.data_manager.get_payroll_history_page(self.employee_id, limit=page_size, cursor=cursor)
+            for record in page["rows"]:
+                print(f"Date: {record['pay_date']}, Gross Pay: ${record['gross_pay']:.2f}, "
+                      f"Deductions: ${record['deductions']:.2f}, Net Pay: ${record['net_pay']:.2f}")
+            cursor = page["next_cursor"]
+            if cursor is None or input("Show older pay stubs? (y/n): ").strip().lower() != 'y':
+                break
 
     def update_tax_forms(self):
         """Allow the employee to update their tax forms."""
@@ -1,12 +1,16 @@
 import openai
 import csv
-from datamanager import DataManager
+from datamanager import REVENUE_REPORT_KEYS, get_data_manager
 from datetime import datetime
+from forecasting import daily_series, forecast_revenue
+from historical import DEFAULT_CHUNK_BYTES, read_historical_data
+from insights import InsightError, OpenAIChatClient
 
 class Finance:
-    def __init__(self):
-        self.data_manager = DataManager()
+    def __init__(self, data_manager=None):
+        self.data_manager = data_manager or get_data_manager()
         self.api_key_loaded = False  # Track if API key is loaded to avoid reloading
+        self.last_historical_report = None  # HistoricalDataReport from the last read_historical_data
 
     def load_api_key(self):
         """Load the OpenAI API key from a file."""
@@ -23,38 +27,36 @@ class Finance:
         for payment in payments:
             print(f"Reconciling Payment ID {payment[0]} - Status: {payment[2]}")
 
-    def generate_financial_report(self, timeframe='daily'):
-        """Generate a report of total revenue by specified timeframe."""
-        orders = self.data_manager.load_orders()
-        report_data = {}
+    def generate_financial_report(self, timeframe='daily', start_date=None, end_date=None):
+        """Generate a report of total revenue by specified timeframe and return it as {period: total}.
 
-        for order in orders:
-            order_date = order[6]  # Assuming 'date' is the 7th column
-            discounted_amount = float(order[5])  # Access the correct index for discounted amount
-
-            # Determine the key based on the timeframe
-            try:
-                date_obj = datetime.strptime(order_date, '%Y-%m-%d')
-                if timeframe == 'daily':
-                    key = order_date
-                elif timeframe == 'weekly':
-                    key = date_obj.strftime("%Y-%U")  # Year-Week number
-                elif timeframe == 'monthly':
-                    key = date_obj.strftime("%Y-%m")  # Year-Month
-                elif timeframe == 'yearly':
-                    key = date_obj.strftime("%Y")  # Year
-                else:
-                    print("Invalid timeframe. Please select daily, weekly, monthly, or yearly.")
-                    return
-
-                report_data[key] = report_data.get(key, 0) + discounted_amount
-            except ValueError:
-                print(f"Invalid date format in order data: {order_date}")
+        Reports come from the data manager's report cache, which only re-reads buckets that new orders
+        touched, optionally limited to a date range. Raises ValueError for a start or end date not in
+        YYYY-MM-DD format.
+        """
+        if timeframe not in REVENUE_REPORT_KEYS:
+            print("Invalid timeframe. Please select daily, weekly, monthly, or yearly.")
+            return None
+        report_data = self.data_manager.report_cache.report(timeframe, start_date, end_date)
 
         print(f"{timeframe.capitalize()} Financial Report:")
         for date, total in report_data.items():
             print(f"Date: {date}, Total Revenue: ${total:.2f}")
-
+        return report_data
+
+    def rebuild_revenue_rollup(self):
+        """Recompute the daily revenue rollup that the financial reports read from."""
+        result = self.data_manager.rebuild_daily_revenue()
+        print(f"Rebuilt daily revenue rollup: {result['rows']} rows in {result['elapsed']:.2f}s.")
+        return result
+
+    def show_report_cache_stats(self):
+        """Print hit statistics for the financial report cache."""
+        stats = self.data_manager.report_cache_stats()
+        print(f"Report cache: {stats['hits']} hits, {stats['refreshes']} incremental refreshes "
+              f"({stats['buckets_recomputed']} buckets recomputed), {stats['misses']} full computes, "
+              f"hit rate {stats['hit_rate']:.0%}, {stats['entries']} cached reports.")
+        return stats
 
     def export_report_to_csv(self, report_data, timeframe='daily'):
         """Export the financial report data to a CSV file."""
@@ -72,79 +74,162 @@ class Finance:
         except IOError as e:
             print(f"Error writing to CSV file: {e}")
 
-    def ai_financial_forecast(self, file_path):
-        """Generate a financial forecast using AI based on historical revenue data read from a CSV file."""
-        if not self.api_key_loaded:
-            self.load_api_key()
-            if not openai.api_key:
-                print("Unable to load API key. Financial forecast cannot be generated.")
-                return
-
-        historical_data = self.read_historical_data(file_path)
+    def revenue_history(self, file_path=None):
+        """Daily revenue {date: total} from a CSV export when file_path is given, otherwise from recorded orders."""
+        if file_path:
+            return self.read_historical_data(file_path)
+        return self.data_manager.report_cache.report("daily")
+
+    def forecast_revenue(self, file_path=None, horizon=30, level=0.9, historical_data=None):
+        """Forecast daily revenue locally and print it; returns a ForecastResult or None.
+
+        History is historical_data if given, else revenue_history(file_path). Seasonal naive, Holt-Winters and
+        rolling linear trend models are backtested and the best one is used, so no network access is needed.
+        """
+        if horizon < 1:
+            print("The forecast horizon must be at least 1 day.")
+            return None
+        if historical_data is None:
+            historical_data = self.revenue_history(file_path)
         if not historical_data:
             print("No historical data available for forecast.")
-            return
-
-        # Prepare the prompt for OpenAI
-        prompt = "Based on the following historical revenue data, provide a financial forecast for the next month:\n"
-        for date, total in historical_data.items():
-            prompt += f"{date}: ${total:.2f}\n"
+            return None
+
+        result = forecast_revenue(historical_data, horizon, level=level)
+        if result is None:
+            print("At least two days of history are needed for a forecast.")
+            return None
+
+        print(f"Revenue Forecast ({result.model.replace('_', ' ')}, {result.history_days} days of history, "
+              f"{result.elapsed * 1000:.1f} ms):")
+        if result.skipped_dates:
+            print(f"  Skipped {result.skipped_dates} history entries whose date is not YYYY-MM-DD.")
+        for name, score in result.backtest.items():
+            print(f"  Backtest {name.replace('_', ' ')}: MAE ${score['mae']:.2f} over {score['folds']} folds")
+        for day, point, lower, upper in zip(result.dates, result.point, result.lower, result.upper):
+            print(f"Date: {day}, Forecast: ${point:.2f} ({result.level:.0%} interval ${lower:.2f} - ${upper:.2f})")
+        print(f"Total forecast for the next {horizon} days: ${result.total:.2f}")
+        return result
+
+    def ai_financial_forecast(self, file_path=None, horizon=30):
+        """Generate a financial forecast, with AI commentary on top of the local statistical forecast.
+
+        The local forecast always runs; the AI call is optional and only receives weekly summaries of the
+        recent history and of the forecast rather than every date. Returns (ForecastResult, commentary),
+        where commentary is None when no API key is available or the call fails.
+        """
+        historical_data = self.revenue_history(file_path)
+        result = self.forecast_revenue(horizon=horizon, historical_data=historical_data)
+        if result is None:
+            return None, None
 
+        if not self.api_key_loaded:
+            self.load_api_key()
+        if not openai.api_key:
+            print("Unable to load API key. Showing the local forecast without AI commentary.")
+            return result, None
+
+        _, history, _ = daily_series(historical_data)
+        whole_weeks = len(history) // 7
+        recent_weeks = history[len(history) - whole_weeks * 7:][-56:].reshape(-1, 7).sum(axis=1)
+        # A horizon that is not a whole number of weeks ends in a shorter chunk, labelled with its day count
+        forecast_weeks = [
+            f"${result.point[i:i + 7].sum():.2f}" + ("" if horizon - i >= 7 else f" (final {horizon - i} days)")
+            for i in range(0, horizon, 7)
+        ]
+        prompt = (
+            f"Weekly revenue for the last {len(recent_weeks)} weeks: "
+            + ", ".join(f"${total:.2f}" for total in recent_weeks)
+            + f".\nA {result.model.replace('_', ' ')} model forecasts the next {horizon} days by week as: "
+            + ", ".join(forecast_weeks)
+            + f" (total ${result.total:.2f}).\nComment on this forecast and the main risks for next month."
+        )
         try:
-            response = openai.ChatCompletion.create(
-                model="gpt-3.5-turbo",
-                messages=[{"role": "user", "content": prompt}]
-            )
-            forecast = response['choices'][0]['message']['content']
-            print("AI Financial Forecast:")
-            print(forecast)
-        except openai.error.OpenAIError as e:
-            print(f"Error generating forecast: {e}")
-
-    def read_historical_data(self, file_path):
-        """Read historical data from CSV file."""
-        historical_data = {}
+            commentary = OpenAIChatClient().complete(prompt)
+        except InsightError as e:
+            print(f"Error generating AI commentary: {e}")
+            return result, None
+        print("AI Financial Forecast Commentary:")
+        print(commentary)
+        return result, commentary
+
+    def read_historical_data(self, file_path, processes=None, chunk_bytes=DEFAULT_CHUNK_BYTES):
+        """Read historical data from CSV file and return {date: total discounted amount}.
+
+        The file is parsed in line-aligned byte ranges across a process pool (see historical.py); row counts,
+        bad rows and throughput are printed and kept in self.last_historical_report.
+        """
         try:
-            with open(file_path, mode='r') as file:
-                reader = csv.DictReader(file)
-                for row in reader:
-                    order_date = row.get('date')
-                    amount = row.get('discounted_amount')
-                    if order_date and amount:
-                        try:
-                            historical_data[order_date] = historical_data.get(order_date, 0) + float(amount)
-                        except ValueError:
-                            print(f"Invalid amount in CSV: {amount} for date {order_date}")
-            return historical_data
+            report = read_historical_data(file_path, processes, chunk_bytes)
         except FileNotFoundError:
             print(f"File not found: {file_path}")
-        except ValueError:
-            print("Invalid data format in the CSV file.")
+            return None
+        except (ValueError, UnicodeDecodeError) as e:
+            print(f"Invalid data format in the CSV file: {e}")
+            return None
         except csv.Error as e:
             print(f"Error reading CSV file: {e}")
-        return None
+            return None
+        self.last_historical_report = report
+        report.print_summary()
+        return report.totals
+
+    def forecast_menu(self):
+        """Prompt for a history source and horizon, then forecast revenue with optional AI commentary."""
+        file_path = input("Historical CSV file (leave blank to use recorded orders): ").strip() or None
+        while True:
+            try:
+                horizon = int(input("Days to forecast [30]: ").strip() or 30)
+            except ValueError:
+                print("Invalid number of days.")
+                continue
+            if horizon >= 1:
+                break
+            print("Enter at least 1 day.")
+        if input("Add AI commentary? (y/n): ").strip().lower() == 'y':
+            self.ai_financial_forecast(file_path, horizon)
+        else:
+            self.forecast_revenue(file_path, horizon)
 
     def menu(self):
         """Display the finance department menu."""
+        last_report = None  # (timeframe, start_date, end_date) of the last generated report
         while True:
             print("\nFinance Department Menu")
             print("1. Reconcile Payments")
             print("2. Generate Financial Report")
             print("3. Export Financial Report to CSV")
-            print("4. Back to Main Menu")
+            print("4. Rebuild Revenue Rollup")
+            print("5. Report Cache Statistics")
+            print("6. Revenue Forecast")
+            print("7. Back to Main Menu")
             choice = input("Enter choice: ")
             
             if choice == '1':
                 self.reconcile_payments()
             elif choice == '2':
                 timeframe = input("Enter timeframe (daily/weekly/monthly/yearly): ").strip().lower()
-                report_data = self.generate_financial_report(timeframe)
+                start_date = input("Start date (YYYY-MM-DD, blank for all): ").strip() or None
+                end_date = input("End date (YYYY-MM-DD, blank for all): ").strip() or None
+                try:
+                    if self.generate_financial_report(timeframe, start_date, end_date) is not None:
+                        last_report = (timeframe, start_date, end_date)
+                except ValueError:
+                    print("Invalid date. Please use the format YYYY-MM-DD.")
             elif choice == '3':
-                if 'report_data' in locals():
-                    self.export_report_to_csv(report_data, timeframe)
-                else:
+                if last_report is None:
                     print("Please generate a report first.")
+                else:
+                    # Served from the report cache, refreshed if orders arrived since the report was shown
+                    report_data = self.data_manager.report_cache.report(*last_report)
+                    self.export_report_to_csv(report_data, last_report[0])
             elif choice == '4':
+                self.rebuild_revenue_rollup()
+            elif choice == '5':
+                self.show_report_cache_stats()
+            elif choice == '6':
+                self.forecast_menu()
+            elif choice == '7':
                 break
             else:
                 print("Invalid choice.")
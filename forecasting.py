@@ -0,0 +1,228 @@
+import time
+from datetime import date, timedelta
+from statistics import NormalDist
+import numpy as np
+
+
+def _parse_day(value):
+    try:
+        return date.fromisoformat(str(value)[:10])
+    except ValueError:
+        return None
+
+
+def daily_series(totals):
+    """Turn {YYYY-MM-DD: revenue} into (first_date, values, skipped) with one value per day; missing days are 0.
+
+    Keys that are not YYYY-MM-DD dates (e.g. from a hand-edited CSV export) are left out and counted in skipped.
+    """
+    parsed = [(_parse_day(day), total) for day, total in totals.items()]
+    valid = [(day, total) for day, total in parsed if day is not None]
+    skipped = len(parsed) - len(valid)
+    if not valid:
+        return None, np.zeros(0), skipped
+    first_day = min(day for day, _ in valid)
+    values = np.zeros((max(day for day, _ in valid) - first_day).days + 1)
+    for day, total in valid:
+        values[(day - first_day).days] += total
+    return first_day, values, skipped
+
+
+class SeasonalNaive:
+    """Each future day repeats the value one season (a week by default) earlier."""
+
+    name = "seasonal_naive"
+
+    def __init__(self, season=7):
+        self.season = season
+
+    def min_history(self):
+        return self.season
+
+    def fit_predict(self, y, horizon):
+        last_season = y[-self.season:]
+        return last_season[np.arange(horizon) % self.season]
+
+    def fitted(self, y):
+        """One-step in-sample predictions aligned with y[self.season:]."""
+        return y[:-self.season]
+
+
+class HoltWinters:
+    """Additive Holt-Winters (level, trend and seasonal) exponential smoothing.
+
+    The smoothing parameters are chosen from a small grid by one-step in-sample squared error.
+    """
+
+    name = "holt_winters"
+    GRID = [(alpha, beta, gamma) for alpha in (0.1, 0.3, 0.5) for beta in (0.0, 0.05) for gamma in (0.05, 0.2)]
+
+    def __init__(self, season=7, grid=None):
+        self.season = season
+        self.grid = grid or self.GRID
+        self.params = None
+
+    def min_history(self):
+        return 2 * self.season
+
+    def _smooth(self, y, alpha, beta, gamma):
+        """Run the recursions over y; returns (level, trend, seasonals, one-step squared error)."""
+        m = self.season
+        level = sum(y[:m]) / m
+        trend = (sum(y[m:2 * m]) - sum(y[:m])) / (m * m)
+        seasonals = [value - level for value in y[:m]]
+        sse = 0.0
+        for t in range(m, len(y)):
+            value = y[t]
+            season_index = t % m
+            error = value - (level + trend + seasonals[season_index])
+            sse += error * error
+            previous_level = level
+            level = alpha * (value - seasonals[season_index]) + (1 - alpha) * (level + trend)
+            trend = beta * (level - previous_level) + (1 - beta) * trend
+            seasonals[season_index] = gamma * (value - level) + (1 - gamma) * seasonals[season_index]
+        return level, trend, seasonals, sse
+
+    def fit_predict(self, y, horizon):
+        values = y.tolist()  # Plain floats are much faster than NumPy scalars in the recursion
+        best = None
+        for alpha, beta, gamma in self.grid:
+            level, trend, seasonals, sse = self._smooth(values, alpha, beta, gamma)
+            if best is None or sse < best[0]:
+                best = (sse, (alpha, beta, gamma), level, trend, seasonals)
+        _, self.params, level, trend, seasonals = best
+        n, m = len(values), self.season
+        steps = np.arange(1, horizon + 1)
+        return level + trend * steps + np.asarray(seasonals)[(n + steps - 1) % m]
+
+
+class RollingLinearTrend:
+    """Least-squares line through the last window days plus the average day-of-season residual."""
+
+    name = "rolling_linear_trend"
+
+    def __init__(self, window=56, season=7):
+        self.window = window
+        self.season = season
+
+    def min_history(self):
+        return max(2 * self.season, 14)
+
+    def fit_predict(self, y, horizon):
+        recent = y[-self.window:]
+        n = len(recent)
+        x = np.arange(n)
+        slope, intercept = np.polyfit(x, recent, 1)
+        residuals = recent - (intercept + slope * x)
+        # Day-of-season positions are counted from the start of y, so they line up with the forecast days
+        positions = (np.arange(n) + len(y) - n) % self.season
+        sums = np.bincount(positions, weights=residuals, minlength=self.season)
+        counts = np.bincount(positions, minlength=self.season)
+        profile = np.divide(sums, counts, out=np.zeros(self.season), where=counts > 0)
+        future = np.arange(n, n + horizon)
+        return intercept + slope * future + profile[(future + len(y) - n) % self.season]
+
+
+DEFAULT_MODELS = (SeasonalNaive, HoltWinters, RollingLinearTrend)
+
+
+class ForecastResult:
+    """Point forecasts with prediction intervals from the model that backtested best."""
+
+    def __init__(self, model, start_date, point, lower, upper, level, backtest, history_days, elapsed,
+                 skipped_dates=0):
+        self.model = model
+        self.start_date = start_date
+        self.point = point
+        self.lower = lower
+        self.upper = upper
+        self.level = level
+        self.backtest = backtest  # model name -> {"mae", "rmse", "folds"}
+        self.history_days = history_days
+        self.elapsed = elapsed
+        self.skipped_dates = skipped_dates  # History keys left out because they were not dates
+
+    @property
+    def dates(self):
+        return [(self.start_date + timedelta(days=i)).isoformat() for i in range(len(self.point))]
+
+    @property
+    def total(self):
+        return float(self.point.sum())
+
+    def to_dict(self):
+        return {
+            "model": self.model,
+            "level": self.level,
+            "history_days": self.history_days,
+            "skipped_dates": self.skipped_dates,
+            "forecast": [{"date": day, "point": float(point), "lower": float(lower), "upper": float(upper)}
+                         for day, point, lower, upper in zip(self.dates, self.point, self.lower, self.upper)],
+            "total": self.total,
+            "backtest": self.backtest,
+            "elapsed": self.elapsed,
+        }
+
+    def __repr__(self):
+        return (f"ForecastResult(model={self.model!r}, horizon={len(self.point)}, total={self.total:.2f}, "
+                f"elapsed={self.elapsed:.4f})")
+
+
+def backtest(model, y, horizon, folds):
+    """Rolling-origin backtest: fit on everything before each origin and forecast the next horizon days.
+
+    Returns an array of errors shaped (folds, horizon), newest origin last.
+    """
+    errors = []
+    for fold in range(folds, 0, -1):
+        origin = len(y) - fold * horizon
+        errors.append(y[origin:origin + horizon] - model.fit_predict(y[:origin], horizon))
+    return np.asarray(errors)
+
+
+def forecast_revenue(totals, horizon=30, season=7, level=0.9, folds=4, models=DEFAULT_MODELS):
+    """Forecast daily revenue for the horizon days after the last date in totals ({YYYY-MM-DD: revenue}).
+
+    Every model that has enough history is backtested over up to folds rolling origins and the one with the
+    lowest mean absolute error is refitted on the full series. Intervals at the given level come from the
+    backtest errors at each step ahead (falling back to one-step in-sample errors widened by the square root
+    of the step when there is too little history to backtest). Keys that are not dates are skipped and
+    counted in the result. Returns a ForecastResult, or None when totals has fewer than two valid days.
+    Raises ValueError when horizon is less than one day.
+    """
+    if horizon < 1:
+        raise ValueError(f"horizon must be at least 1 day, got {horizon}")
+    start = time.perf_counter()
+    first_day, y, skipped = daily_series(totals)
+    if len(y) < 2:
+        return None
+    candidates = [model_class(season=season) for model_class in models]
+    candidates = [model for model in candidates if len(y) >= model.min_history()] or [SeasonalNaive(season=1)]
+
+    scores = {}
+    best, best_errors = None, None
+    for model in candidates:
+        usable_folds = min(folds, (len(y) - model.min_history()) // horizon)
+        if usable_folds < 1:
+            continue
+        errors = backtest(model, y, horizon, usable_folds)
+        scores[model.name] = {"mae": float(np.abs(errors).mean()), "rmse": float(np.sqrt((errors ** 2).mean())),
+                              "folds": usable_folds}
+        if best is None or scores[model.name]["mae"] < scores[best.name]["mae"]:
+            best, best_errors = model, errors
+    if best is None:
+        best = next((model for model in candidates if model.name == HoltWinters.name), candidates[0])
+
+    point = best.fit_predict(y, horizon)
+    z = NormalDist().inv_cdf(0.5 + level / 2)
+    if best_errors is not None and len(best_errors) > 1:
+        spread = np.sqrt((best_errors ** 2).mean(axis=0))
+    else:
+        naive = SeasonalNaive(season=min(season, len(y) - 1))
+        one_step = y[naive.season:] - naive.fitted(y)
+        spread = np.sqrt((one_step ** 2).mean()) * np.sqrt(np.arange(1, horizon + 1))
+    lower = np.maximum(point - z * spread, 0.0)  # Revenue cannot go negative
+    upper = point + z * spread
+
+    return ForecastResult(best.name, first_day + timedelta(days=len(y)), point, lower, upper, level,
+                          scores, len(y), time.perf_counter() - start, skipped)
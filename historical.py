@@ -0,0 +1,164 @@
+import csv
+import io
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+DEFAULT_CHUNK_BYTES = 32 * 1024 * 1024
+
+
+class HistoricalDataReport:
+    """Per-date revenue totals read from a historical CSV export, with row counts, bad rows and throughput."""
+
+    def __init__(self, file_path, max_error_details=100):
+        self.file_path = file_path
+        self.totals = {}  # date -> summed discounted_amount
+        self.rows_read = 0
+        self.rows_parsed = 0
+        self.skipped_rows = 0  # rows with no date or amount, which the old reader ignored silently
+        self.bad_rows = 0  # rows whose amount is not a number
+        self.errors = []  # (byte_offset_of_chunk, message), capped at max_error_details
+        self.max_error_details = max_error_details
+        self.bytes_read = 0
+        self.chunks = 0
+        self.processes = 1
+        self.started = time.perf_counter()
+        self.elapsed = 0.0
+
+    def merge(self, partial):
+        """Fold one chunk's result from parse_chunk into the running totals."""
+        sums, rows_read, rows_parsed, skipped, bad, errors, bytes_read = partial
+        totals = self.totals
+        for day, amount in sums.items():
+            totals[day] = totals.get(day, 0) + amount
+        self.rows_read += rows_read
+        self.rows_parsed += rows_parsed
+        self.skipped_rows += skipped
+        self.bad_rows += bad
+        self.errors.extend(errors[:self.max_error_details - len(self.errors)])
+        self.bytes_read += bytes_read
+        self.chunks += 1
+
+    def finish(self):
+        self.elapsed = time.perf_counter() - self.started
+
+    @property
+    def rows_per_second(self):
+        return self.rows_read / self.elapsed if self.elapsed else 0.0
+
+    @property
+    def megabytes_per_second(self):
+        return self.bytes_read / 2**20 / self.elapsed if self.elapsed else 0.0
+
+    def print_summary(self):
+        """Print the read totals followed by each recorded bad row."""
+        print(f"Read {self.rows_parsed} of {self.rows_read} rows ({len(self.totals)} dates) from {self.file_path} "
+              f"in {self.elapsed:.2f}s with {self.processes} process(es): {self.rows_per_second:.0f} rows/s, "
+              f"{self.megabytes_per_second:.1f} MB/s. {self.bad_rows} bad rows, {self.skipped_rows} skipped.")
+        for offset, message in self.errors:
+            print(f"  Chunk at byte {offset}: {message}")
+        if self.bad_rows > len(self.errors):
+            print(f"  ... {self.bad_rows - len(self.errors)} more bad rows not shown.")
+
+
+def read_header(file_path):
+    """Return (column names, byte offset where the data rows start)."""
+    with open(file_path, "rb") as file:
+        line = file.readline()
+    header = next(csv.reader([line.decode("utf-8-sig")]), [])
+    return [column.strip() for column in header], len(line)
+
+
+def chunk_ranges(file_path, start, chunk_bytes=DEFAULT_CHUNK_BYTES):
+    """Split the bytes from start to the end of the file into [begin, end) ranges that end on a newline.
+
+    Each boundary is moved forward to just past the next newline, so no row is split between chunks.
+    Quoted fields that contain newlines are not supported.
+    """
+    size = os.path.getsize(file_path)
+    ranges = []
+    with open(file_path, "rb") as file:
+        begin = start
+        while begin < size:
+            end = begin + chunk_bytes
+            if end < size:
+                file.seek(end)
+                file.readline()
+                end = file.tell()
+            else:
+                end = size
+            ranges.append((begin, end))
+            begin = end
+    return ranges
+
+
+def parse_chunk(file_path, begin, end, date_index, amount_index, max_error_details=100):
+    """Sum discounted_amount per date over one line-aligned byte range; runs in worker processes.
+
+    Returns (sums, rows_read, rows_parsed, skipped_rows, bad_rows, errors, bytes_read).
+    """
+    with open(file_path, "rb") as file:
+        file.seek(begin)
+        data = file.read(end - begin)
+    sums = {}
+    rows_read = rows_parsed = skipped = bad = 0
+    errors = []
+    for row in csv.reader(io.StringIO(data.decode("utf-8"), newline="")):
+        if not row:
+            continue
+        rows_read += 1
+        try:
+            order_date = row[date_index]
+            amount = row[amount_index]
+        except IndexError:
+            skipped += 1
+            continue
+        if not order_date or not amount:
+            skipped += 1
+            continue
+        try:
+            value = float(amount)
+        except ValueError:
+            bad += 1
+            if len(errors) < max_error_details:
+                errors.append((begin, f"Invalid amount in CSV: {amount} for date {order_date}"))
+            continue
+        sums[order_date] = sums.get(order_date, 0) + value
+        rows_parsed += 1
+    return sums, rows_read, rows_parsed, skipped, bad, errors, end - begin
+
+
+def read_historical_data(file_path, processes=None, chunk_bytes=DEFAULT_CHUNK_BYTES, max_error_details=100):
+    """Sum the 'discounted_amount' column per 'date' across a CSV export and return a HistoricalDataReport.
+
+    The file is split into line-aligned byte ranges of about chunk_bytes that are parsed independently, across
+    a process pool when processes > 1 (None uses every CPU), and their partial per-date sums are merged.
+    At most two ranges per worker are in flight, so memory is bounded by chunk_bytes times the worker count
+    plus one entry per distinct date. Raises FileNotFoundError, or ValueError when a required column is missing.
+    """
+    report = HistoricalDataReport(file_path, max_error_details)
+    header, data_start = read_header(file_path)
+    missing = [column for column in ("date", "discounted_amount") if column not in header]
+    if missing:
+        raise ValueError(f"missing required columns: {', '.join(missing)}")
+    date_index, amount_index = header.index("date"), header.index("discounted_amount")
+
+    ranges = chunk_ranges(file_path, data_start, chunk_bytes)
+    processes = min(processes or os.cpu_count() or 1, len(ranges)) or 1
+    report.processes = processes
+    if processes > 1:
+        with ProcessPoolExecutor(max_workers=processes) as executor:
+            pending = deque()
+            for begin, end in ranges:
+                if len(pending) >= processes * 2:
+                    report.merge(pending.popleft().result())
+                pending.append(executor.submit(parse_chunk, file_path, begin, end, date_index, amount_index,
+                                               max_error_details))
+            while pending:
+                report.merge(pending.popleft().result())
+    else:
+        for begin, end in ranges:
+            report.merge(parse_chunk(file_path, begin, end, date_index, amount_index, max_error_details))
+    report.finish()
+    return report
@@ -1,13 +1,25 @@
 import openai
-from datamanager import DataManager
+from datamanager import get_data_manager
 from employee import Employee
 import datetime
 from datetime import datetime, timedelta
 from dateutil.relativedelta import relativedelta
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+import contextlib
+import io
+import os
+import time
+from insights import InsightDriver, InsightError, OpenAIChatClient, ResponseCache
+from paystubs import write_pay_stubs
+from profiling import PayrollProfiler
+from payroll import (PayrollSimulator, ReferenceData, build_payroll_items, compute_net_pay, compute_payroll_chunk,
+                     earliest_period_start, hourly_gross_pay, next_pay_date, standard_time_logs)
 
 class HR:
-    def __init__(self):
-        self.data_manager = DataManager()
+    def __init__(self, data_manager=None, profiler=None):
+        self.data_manager = data_manager or get_data_manager()
+        self.profiler = profiler or PayrollProfiler()  # Disabled unless enabled, e.g. by profile_payroll
         self.api_key_loaded = False  # Track if API key is loaded
 
     def load_api_key(self):
@@ -113,34 +125,58 @@ class HR:
         }
         return salary * bonus_rates.get(role, 0)  # Default to 0 if role not in dictionary
 
-    def generate_bonus_insight(self):
-        """Generate AI insights for employee bonuses based on performance."""
-        self.load_api_key()
-        if not openai.api_key:
-            print("Unable to load API key. Bonus insight generation cannot proceed.")
-            return
-
+    def bonus_insight_prompt(self, emp):
+        """Build the bonus-suggestion prompt for one employee."""
+        return (f"Suggest a bonus for {emp.full_name}, who is a {emp.job_title} in {emp.department} "
+                f"with a salary of {emp.annual_salary or emp.hourly_rate}.")
+
+    def generate_bonus_insight(self, client=None, max_workers=8, requests_per_second=3,
+                               cache_dir=".insight_cache", employees=None):
+        """Generate AI insights for employee bonuses based on performance.
+
+        Prompts run concurrently through an InsightDriver (at most max_workers in flight, at most
+        requests_per_second started), and responses are cached on disk under cache_dir so reruns only
+        pay for new or changed prompts. client defaults to the OpenAI API; pass any object with a
+        complete(prompt) method, such as an HTTPChatClient pointed at a local stub. Returns
+        (results, stats): one InsightResult per employee keyed by employee id, and a run summary dict.
+        """
+        if client is None:
+            self.load_api_key()
+            if not openai.api_key:
+                raise InsightError("Unable to load API key. Bonus insight generation cannot proceed.")
+            client = OpenAIChatClient()
+
+        employees = self.data_manager.get_all_employees() if employees is None else employees
+        driver = InsightDriver(client, max_workers=max_workers, requests_per_second=requests_per_second,
+                               cache=ResponseCache(cache_dir) if cache_dir else None)
+        return driver.run((emp.id, self.bonus_insight_prompt(emp)) for emp in employees)
+
+    def show_bonus_insights(self):
+        """Generate bonus insights for every employee and print them."""
         employees = self.data_manager.get_all_employees()
         if not employees:
             print("No employees found to generate bonus insights.")
             return
+        try:
+            results, stats = self.generate_bonus_insight(employees=employees)
+        except InsightError as e:
+            print(e)
+            return
 
-        for emp in employees:
-            try:
-                response = openai.ChatCompletion.create(
-                    model="gpt-3.5-turbo",
-                    messages=[{
-                        "role": "user",
-                        "content": f"Suggest a bonus for {emp[1]}, who is a {emp[2]} in {emp[3]} with a salary of {emp[4]}."
-                    }]
-                )
-                # Extract the insight from the response, if available
-                insight = response['choices'][0]['message']['content'] if response['choices'] else "No insight available"
-                print(f"Bonus Insight for {emp[1]}: {insight}")
-            except openai.error.OpenAIError as e:
-                print(f"Error generating insight for {emp[1]}: {e}")
-            except (IndexError, KeyError):
-                print(f"Unexpected response format from OpenAI API for {emp[1]}.")
+        names = {emp.id: emp.full_name for emp in employees}
+        for result in results:
+            if result.ok:
+                print(f"Bonus Insight for {names[result.key]}: {result.text}")
+            else:
+                print(f"Error generating insight for {names[result.key]}: {result.error}")
+        print(f"{stats['succeeded']} insights generated ({stats['cached']} from cache, "
+              f"{stats['failed']} failed) in {stats['elapsed']:.1f}s.")
+
+    def rebuild_hours_rollup(self):
+        """Recompute the daily and weekly hours rollup from every time log."""
+        result = self.data_manager.rebuild_hours_rollup()
+        print(f"Hours rollup rebuilt: {result['daily_rows']} daily and {result['weekly_rows']} weekly rows "
+              f"in {result['elapsed']:.2f}s.")
 
     def approve_time_off(self, time_log_id, hours_approved):
         """Approve time-off request."""
@@ -177,123 +213,39 @@ class HR:
         )
         print(f"Deductions set for Employee ID {employee_id}.")
 
-    def apply_overtime(self, employee_id, total_hours_worked, daily_hours):
-        """Calculate adjusted pay with overtime based on state rules and hours worked."""
-        employee_data = self.data_manager.get_employee_by_id(employee_id)
-        state = employee_data.get("state")
-        overtime_rules = self.data_manager.get_overtime_rules(state)
-        
-        # Overtime calculations
-        regular_hours = 0
-        overtime_hours = 0
-        doubletime_hours = 0
-
-        # Daily overtime calculation
-        for hours in daily_hours:
-            if hours > overtime_rules["doubletime_threshold"]:
-                doubletime_hours += hours - overtime_rules["doubletime_threshold"]
-                overtime_hours += overtime_rules["doubletime_threshold"] - overtime_rules["daily_overtime_threshold"]
-                regular_hours += overtime_rules["daily_overtime_threshold"]
-            elif hours > overtime_rules["daily_overtime_threshold"]:
-                overtime_hours += hours - overtime_rules["daily_overtime_threshold"]
-                regular_hours += overtime_rules["daily_overtime_threshold"]
-            else:
-                regular_hours += hours
-
-        # Weekly overtime calculation
-        weekly_overtime_hours = max(0, total_hours_worked - overtime_rules["weekly_overtime_threshold"])
-        regular_hours = min(regular_hours, overtime_rules["weekly_overtime_threshold"])
-
-        # Adjust overtime hours
-        if weekly_overtime_hours > overtime_hours:
-            overtime_hours = weekly_overtime_hours
-        
-        return {
-            "regular_hours": regular_hours,
-            "overtime_hours": overtime_hours,
-            "doubletime_hours": doubletime_hours,
-            "overtime_rate": overtime_rules["overtime_rate"],
-            "doubletime_rate": overtime_rules["doubletime_rate"]
-        }
-
-    def calculate_net_pay(self, employee_id, gross_pay, total_hours_worked, daily_hours, leave_hours=0):
-        """Calculate net pay, including state and country taxes, reciprocity, and overtime adjustments."""
-
-        # Retrieve employee data
-        employee_data = self.data_manager.get_employee_by_id(employee_id)
-        home_state = employee_data.get("home_state")
-        work_state = employee_data.get("work_state")
-        country_code = employee_data.get("country_code")
-        is_expatriate = employee_data.get("is_expatriate", False)
-
-        # Calculate base hourly rate
-        hourly_rate = gross_pay / total_hours_worked
-
-        # Minimum wage check (using home state as default)
-        minimum_wage = self.data_manager.get_minimum_wage(home_state)
-        if minimum_wage and hourly_rate < minimum_wage:
-            hourly_rate = minimum_wage
-            print(f"Adjusted hourly rate to minimum wage for {home_state}: ${hourly_rate:.2f}")
-
-        # Adjusted gross pay with leave and overtime
-        leave_pay = leave_hours * hourly_rate
-        adjusted_gross_pay = gross_pay + leave_pay
-
-        # Apply overtime adjustments
-        overtime_data = self.apply_overtime(employee_id, total_hours_worked, daily_hours)
-        overtime_pay = (
-            overtime_data["overtime_hours"] * hourly_rate * overtime_data["overtime_rate"] +
-            overtime_data["doubletime_hours"] * hourly_rate * overtime_data["doubletime_rate"]
-        )
-        adjusted_gross_pay = (overtime_data["regular_hours"] * hourly_rate) + overtime_pay
-
-        # Country-specific tax calculations
-        tax_rates = self.data_manager.get_country_tax_rates(country_code)
-        income_tax = adjusted_gross_pay * tax_rates.get("income_tax_rate", 0)
-        social_contribution = adjusted_gross_pay * tax_rates.get("social_contribution_rate", 0)
-        expatriate_tax = adjusted_gross_pay * tax_rates.get("expatriate_tax_rate", 0) if is_expatriate else 0
-
-        # State tax with reciprocity
-        if self.data_manager.is_reciprocal_state(home_state, work_state):
-            state_tax_data = self.data_manager.get_state_tax_rates(home_state)
-        else:
-            home_state_tax_data = self.data_manager.get_state_tax_rates(home_state)
-            work_state_tax_data = self.data_manager.get_state_tax_rates(work_state)
-            state_tax_data = {
-                "income_tax_rate": home_state_tax_data.get("income_tax_rate", 0) + work_state_tax_data.get("income_tax_rate", 0),
-                "sui_rate": home_state_tax_data.get("sui_rate", 0) + work_state_tax_data.get("sui_rate", 0),
-                "local_tax_rate": home_state_tax_data.get("local_tax_rate", 0) + work_state_tax_data.get("local_tax_rate", 0)
-            }
-
-        # Calculate state and local taxes
-        state_tax = adjusted_gross_pay * state_tax_data.get("income_tax_rate", 0)
-        sui_tax = adjusted_gross_pay * state_tax_data.get("sui_rate", 0)
-        local_tax = adjusted_gross_pay * state_tax_data.get("local_tax_rate", 0)
-
-        # Federal and FICA taxes
-        federal_tax = adjusted_gross_pay * self.data_manager.get_federal_tax_rate()
-        fica_tax = adjusted_gross_pay * self.data_manager.get_fica_tax_rate()
+    def apply_overtime(self, employee_id, time_logs):
+        """Split a date-ordered stream of (date, hours_worked) into regular, overtime and doubletime hours
+        using the compiled overtime rules of the employee's work state."""
+        with self.profiler.stage("apply_overtime", employee_id):
+            employee_data = self.data_manager.get_employee_by_id(employee_id)
+            return self.data_manager.get_overtime_rule(employee_data.get("work_state")).split(time_logs)
 
-        # Voluntary deductions
-        voluntary_deductions = self.data_manager.get_employee_deductions(employee_id)
-        total_voluntary_deductions = sum(voluntary_deductions.values())
+    def period_time_logs(self, employee_id, start_date, end_date):
+        """Return the (date, hours_worked) stream for a pay period from the daily hours rollup."""
+        with self.profiler.stage("period_time_logs", employee_id):
+            logged = self.data_manager.get_hours_by_employee_ids([employee_id], start_date, end_date)
+        return logged.get(employee_id, [])
 
-        # Calculate total deductions and net pay
-        total_deductions = (
-            federal_tax + fica_tax + state_tax + sui_tax + local_tax +
-            income_tax + social_contribution + expatriate_tax + total_voluntary_deductions
-        )
-        net_pay = adjusted_gross_pay - total_deductions
+    def calculate_net_pay(self, employee_id, gross_pay, total_hours_worked, time_logs, leave_hours=0):
+        """Calculate net pay, including state and country taxes, reciprocity, and overtime adjustments."""
+        with self.profiler.stage("calculate_net_pay", employee_id):
+            employee_data = self.data_manager.get_employee_by_id(employee_id)
+            references = ReferenceData.from_data_manager(self.data_manager)
+            voluntary_deductions = sum(self.data_manager.get_employee_deductions(employee_id).values())
+            breakdown = compute_net_pay(gross_pay, total_hours_worked, time_logs, employee_data, references,
+                                        voluntary_deductions)
 
         # Output breakdown for debugging or logging
-        print(f"Adjusted Gross Pay: ${adjusted_gross_pay:.2f}")
-        print(f"Federal Tax: ${federal_tax:.2f}, FICA Tax: ${fica_tax:.2f}")
-        print(f"Income Tax: ${income_tax:.2f}, Social Contribution: ${social_contribution:.2f}, Expatriate Tax: ${expatriate_tax:.2f}")
-        print(f"State Tax: ${state_tax:.2f}, SUI Tax: ${sui_tax:.2f}, Local Tax: ${local_tax:.2f}")
-        print(f"Total Deductions: ${total_deductions:.2f}")
-        print(f"Net Pay: ${net_pay:.2f}")
+        if breakdown["minimum_wage_applied"]:
+            print(f"Adjusted hourly rate to minimum wage for {employee_data.get('home_state')}: ${breakdown['hourly_rate']:.2f}")
+        print(f"Adjusted Gross Pay: ${breakdown['adjusted_gross_pay']:.2f}")
+        print(f"Federal Tax: ${breakdown['federal_tax']:.2f}, FICA Tax: ${breakdown['fica_tax']:.2f}")
+        print(f"Income Tax: ${breakdown['income_tax']:.2f}, Social Contribution: ${breakdown['social_contribution']:.2f}, Expatriate Tax: ${breakdown['expatriate_tax']:.2f}")
+        print(f"State Tax: ${breakdown['state_tax']:.2f}, SUI Tax: ${breakdown['sui_tax']:.2f}, Local Tax: ${breakdown['local_tax']:.2f}")
+        print(f"Total Deductions: ${breakdown['total_deductions']:.2f}")
+        print(f"Net Pay: ${breakdown['net_pay']:.2f}")
 
-        return net_pay
+        return breakdown["net_pay"]
 
 
     def log_payroll(self):
@@ -301,7 +253,18 @@ class HR:
         try:
             employee_id = int(input("Enter Employee ID: "))
             pay_date = input("Enter Pay Date (YYYY-MM-DD): ")
+            self.process_payroll(employee_id, pay_date)
+        except ValueError as e:
+            print(f"Invalid input: {e}")
 
+    def process_payroll(self, employee_id, pay_date, record=True):
+        """Compute (and unless record is False, record) one employee's pay for pay_date.
+
+        Returns a dict with gross_pay, deductions and net_pay (plus net pay converted to the employee's
+        preferred currency when a rate is cached), or None when pay cannot be calculated.
+        Raises ValueError for a pay date not in YYYY-MM-DD format.
+        """
+        with self.profiler.stage("log_payroll", employee_id):
             # Validate pay date format
             pay_date_obj = datetime.strptime(pay_date, "%Y-%m-%d")
 
@@ -309,95 +272,325 @@ class HR:
             employee_data = self.data_manager.get_employee_by_id(employee_id)
             if not employee_data:
                 print("Employee not found.")
-                return
+                return None
 
             employment_type = employee_data.get("employment_type")
             pay_frequency = employee_data.get("pay_frequency")
 
             # Calculate start and end of pay period based on pay frequency
             start_date, end_date = self.calculate_pay_period(pay_date_obj, pay_frequency)
+            if start_date is None:
+                print(f"Skipping Employee ID {employee_id}: unknown pay frequency {pay_frequency!r}.")
+                return None
+
+            # One time-log read serves both the hourly gross pay and the overtime split below
+            time_logs = self.period_time_logs(employee_id, start_date, end_date)
 
             if employment_type == "hourly":
-                gross_pay = self.calculate_hourly_gross_pay(employee_id, start_date, end_date, employee_data)
+                gross_pay = self.calculate_hourly_gross_pay(employee_id, start_date, end_date, employee_data, time_logs)
             elif employment_type == "salaried":
                 gross_pay = self.calculate_salaried_gross_pay(employee_data)
             else:
                 print("Unknown employment type.")
-                return
+                return None
 
             if gross_pay is None:
-                return  # Exit if gross pay calculation failed
+                return None  # Exit if gross pay calculation failed
+
+            # Hours for the overtime split; salaried staff without time logs are assumed to work standard days
+            if not sum(hours for _, hours in time_logs) and employment_type == "salaried":
+                time_logs = standard_time_logs(pay_date_obj.date(), pay_frequency)
+            total_hours = sum(hours for _, hours in time_logs)
 
             # Calculate net pay after applying deductions
-            net_pay = self.calculate_net_pay(employee_id, gross_pay)
+            net_pay = self.calculate_net_pay(employee_id, gross_pay, total_hours, time_logs)
             deductions = gross_pay - net_pay
             print(f"Total Deductions: ${deductions:.2f}, Net Pay: ${net_pay:.2f}")
 
-            # Record payroll in payroll history
-            self.data_manager.record_payroll(employee_id, pay_date, gross_pay, deductions, net_pay)
-            print(f"Payroll recorded for Employee ID {employee_id}.")
+            # Show net pay in the employee's preferred currency using the cached exchange-rate map
+            currency = (employee_data.get("currency_preference") or "USD").upper()
+            converted_net_pay = None
+            if currency != "USD":
+                converted_net_pay = self.data_manager.convert_currency(net_pay, "USD", currency)
+                if converted_net_pay is None:
+                    print(f"No exchange rate available for {currency}; net pay shown in USD only.")
+                else:
+                    print(f"Net Pay in {currency}: {converted_net_pay:,.2f}")
 
+            # Record payroll in payroll history
+            if record:
+                with self.profiler.stage("record_payroll"):
+                    self.data_manager.record_payroll(employee_id, pay_date, gross_pay, deductions, net_pay,
+                                                     self.data_manager.get_employee_deductions(employee_id))
+                print(f"Payroll recorded for Employee ID {employee_id}.")
+            return {"employee_id": employee_id, "gross_pay": gross_pay, "deductions": deductions, "net_pay": net_pay,
+                    "currency": currency, "converted_net_pay": converted_net_pay}
+
+    def profile_payroll(self, pay_date, employee_ids=None, record=False, json_path=None, slowest=10):
+        """Run the per-employee payroll path with profiling on and return the profile summary.
+
+        employee_ids defaults to every employee. Pay is only written to payroll history when record is True.
+        The summary is also written to json_path when given.
+        """
+        if employee_ids is None:
+            employee_ids = [employee.id for employee in self.data_manager.iter_employees()]
+        self.profiler.reset()
+        self.profiler.enable(self.data_manager)
+        try:
+            with contextlib.redirect_stdout(io.StringIO()):
+                for employee_id in employee_ids:
+                    self.process_payroll(employee_id, pay_date, record=record)
+        finally:
+            self.profiler.disable()
+        if json_path:
+            self.profiler.export_json(json_path, slowest)
+        return self.profiler.summary(slowest)
+
+    def profile_payroll_menu(self):
+        """Prompt for a pay date, profile the payroll path for every employee and print the results."""
+        pay_date = input("Enter Pay Date (YYYY-MM-DD): ")
+        json_path = input("Export JSON to (leave blank to skip): ").strip() or None
+        try:
+            self.profile_payroll(pay_date, json_path=json_path)
+        except ValueError:
+            print("Invalid date. Please use the format YYYY-MM-DD.")
+            return
+        self.profiler.print_summary()
+        if json_path:
+            print(f"Profile written to {json_path}.")
+
+    def run_payroll(self, pay_date, processes=None, chunk_size=500):
+        """Pay every employee due on or before pay_date in one batch and return a summary.
+
+        Employees, deductions, time logs and reference data are preloaded in a handful of queries,
+        pay is computed in memory (optionally across a process pool), and payroll history plus the
+        advanced pay dates are written in a single transaction.
+        """
+        timings = {}
+        run_start = stage_start = time.perf_counter()
+        pay_date_obj = datetime.strptime(str(pay_date), "%Y-%m-%d").date()
+
+        # Stage 1: who is due
+        due = self.data_manager.get_due_payroll(pay_date_obj.isoformat())
+        timings["select_due"] = time.perf_counter() - stage_start
+
+        # Stage 2: preload everything the calculation needs
+        stage_start = time.perf_counter()
+        employee_ids = [employee_id for employee_id, _ in due]
+        employees = self.data_manager.get_employees_by_ids(employee_ids)
+        deduction_parts = self.data_manager.get_deductions_by_ids(employee_ids)
+        deductions = {employee_id: sum(parts.values()) for employee_id, parts in deduction_parts.items()}
+        references = ReferenceData.from_data_manager(self.data_manager)
+        earliest_start = earliest_period_start(pay_date_obj)
+        hours = self.data_manager.get_hours_by_employee_ids(employee_ids, earliest_start, pay_date_obj)
+        timings["preload"] = time.perf_counter() - stage_start
+
+        # Stage 3: compute gross and net pay
+        stage_start = time.perf_counter()
+        items, skipped = build_payroll_items(due, employees, hours, deductions, pay_date_obj)
+
+        if processes and processes > 1 and len(items) > chunk_size:
+            chunks = [items[i:i + chunk_size] for i in range(0, len(items), chunk_size)]
+            with ProcessPoolExecutor(max_workers=processes) as executor:
+                results = [entry for chunk in executor.map(compute_payroll_chunk, chunks, repeat(references))
+                           for entry in chunk]
+        else:
+            results = compute_payroll_chunk(items, references)
+        timings["compute"] = time.perf_counter() - stage_start
+
+        # Stage 4: write history and advance schedules together
+        stage_start = time.perf_counter()
+        payroll_rows = []
+        schedule_updates = []
+        frequencies = {item[0].get("id"): item[1] for item in items}
+        for employee_id, gross_pay, deductions_total, net_pay, reason in results:
+            if reason:
+                skipped.append((employee_id, reason))
+                continue
+            payroll_rows.append((employee_id, pay_date_obj.isoformat(), gross_pay, deductions_total, net_pay,
+                                 deduction_parts.get(employee_id, {})))
+            schedule_updates.append(
+                (next_pay_date(pay_date_obj, frequencies[employee_id]).isoformat(), employee_id))
+        self.data_manager.record_payroll_run(payroll_rows, schedule_updates)
+        timings["write"] = time.perf_counter() - stage_start
+
+        elapsed = time.perf_counter() - run_start
+        summary = {
+            "pay_date": pay_date_obj.isoformat(),
+            "employees_due": len(due),
+            "employees_paid": len(payroll_rows),
+            "skipped": skipped,
+            "total_gross": sum(row[2] for row in payroll_rows),
+            "total_deductions": sum(row[3] for row in payroll_rows),
+            "total_net": sum(row[4] for row in payroll_rows),
+            "stage_seconds": timings,
+            "elapsed_seconds": elapsed,
+            "employees_per_second": len(due) / elapsed if elapsed else 0.0,
+        }
+        print(f"Payroll for {summary['pay_date']}: paid {summary['employees_paid']} of {summary['employees_due']} "
+              f"employees in {elapsed:.2f}s ({summary['employees_per_second']:.0f} employees/s).")
+        print("Stage timings: " + ", ".join(f"{stage} {seconds * 1000:.1f} ms" for stage, seconds in timings.items()))
+        print(f"Total Gross: ${summary['total_gross']:.2f}, Total Deductions: ${summary['total_deductions']:.2f}, "
+              f"Total Net: ${summary['total_net']:.2f}")
+        for employee_id, reason in skipped:
+            print(f"Skipped Employee ID {employee_id}: {reason}")
+        return summary
+
+    def generate_pay_stubs(self, pay_date, output_dir=None, fmt="text", processes=None):
+        """Write a pay stub for every employee paid on pay_date and return the write summary."""
+        pay_date = datetime.strptime(str(pay_date), "%Y-%m-%d").date().isoformat()
+        output_dir = output_dir or os.path.join("pay_stubs", pay_date)
+        summary = write_pay_stubs(self.data_manager, pay_date, output_dir, fmt, processes)
+        print(f"Wrote {summary['stubs_written']} {fmt} pay stubs to {output_dir} in {summary['elapsed_seconds']:.2f}s.")
+        return summary
+
+    def pay_stubs_menu(self):
+        """Prompt for a pay date and format and write that pay date's stubs."""
+        pay_date = input("Enter Pay Date (YYYY-MM-DD): ")
+        fmt = input("Format (text/html) [text]: ").strip().lower() or "text"
+        try:
+            self.generate_pay_stubs(pay_date, fmt=fmt)
         except ValueError as e:
             print(f"Invalid input: {e}")
 
-    def calculate_pay_period(self, pay_date, pay_frequency):
-        """Calculate the start and end dates of the pay period based on the pay frequency."""
-        if pay_frequency == "weekly":
-            start_date = pay_date - timedelta(weeks=1)
-            end_date = pay_date
-        elif pay_frequency == "biweekly":
-            start_date = pay_date - timedelta(weeks=2)
-            end_date = pay_date
-        elif pay_frequency == "monthly":
-            start_date = pay_date - relativedelta(months=1)
-            end_date = pay_date
-        else:
-            print("Unknown pay frequency.")
-            return None, None
-
-        print(f"Calculated Pay Period: {start_date.date()} to {end_date.date()}")
-        return start_date.date(), end_date.date()
-
-    def calculate_hourly_gross_pay(self, employee_id, start_date, end_date, employee_data):
-        """Calculate gross pay for an hourly employee based on time worked and overtime."""
-        hourly_rate = employee_data.get("hourly_rate")
-        if hourly_rate is None:
-            print("Hourly rate is missing for this employee.")
-            return None
+    def simulate_payroll(self, pay_date, scenarios):
+        """Estimate what hypothetical rate changes would cost for the pay period ending on pay_date.
+
+        scenarios maps a name to ReferenceData.with_overrides arguments; see PayrollSimulator.simulate.
+        The workforce is loaded once and nothing is written to the database.
+        """
+        pay_date_obj = datetime.strptime(str(pay_date), "%Y-%m-%d").date()
+        simulator = PayrollSimulator.from_data_manager(self.data_manager, pay_date_obj)
+        reports = simulator.simulate(scenarios)
+        baseline = simulator.baseline()
+        print(f"What-if payroll for {pay_date_obj.isoformat()}: {len(simulator.employee_ids)} employees, "
+              f"baseline net ${float(baseline['net_pay'].sum()):.2f}, {len(simulator.skipped)} skipped")
+        for name, report in reports.items():
+            print(f"\nScenario: {name}")
+            print(f"  Total Net: ${report['total_net']:.2f} (change ${report['net_delta']:+.2f}), "
+                  f"Total Deductions: ${report['total_deductions']:.2f} (change ${report['deductions_delta']:+.2f}), "
+                  f"{report['employees_affected']} employees affected")
+            for heading, key in (("Department", "by_department"), ("State", "by_state")):
+                for group, delta in sorted(report[key].items(), key=lambda entry: str(entry[0])):
+                    if delta["net_delta"] or delta["deductions_delta"]:
+                        print(f"    {heading} {group}: net ${delta['net_delta']:+.2f}, "
+                              f"deductions ${delta['deductions_delta']:+.2f}")
+        return reports
+
+    def what_if_menu(self):
+        """Collect what-if scenarios interactively and run them in one pass."""
+        pay_date = input("Enter Pay Date (YYYY-MM-DD): ")
+        scenarios = {}
+        while True:
+            name = input("Scenario name (leave blank to run): ").strip()
+            if not name:
+                break
+            overrides = {}
+            try:
+                state = input("State for income tax change (leave blank to skip): ").strip().upper()
+                if state:
+                    overrides["state_tax"] = {state: {"income_tax_rate": float(input(f"New income tax rate for {state}: "))}}
+                fica_rate = input("New FICA rate (leave blank to skip): ").strip()
+                if fica_rate:
+                    overrides["fica_tax_rate"] = float(fica_rate)
+                wage_state = input("State for minimum wage change (leave blank to skip): ").strip().upper()
+                if wage_state:
+                    overrides["minimum_wages"] = {wage_state: float(input(f"New minimum wage for {wage_state}: "))}
+            except ValueError:
+                print("Invalid rate. Scenario discarded.")
+                continue
+            scenarios[name] = overrides
+        if not scenarios:
+            print("No scenarios entered.")
+            return
+        try:
+            self.simulate_payroll(pay_date, scenarios)
+        except ValueError:
+            print("Invalid date. Please use the format YYYY-MM-DD.")
 
-        # Calculate total hours worked and overtime hours based on time logs within the pay period
-        total_hours, overtime_hours = self.calculate_hours_worked(employee_id, start_date, end_date)
-        if total_hours == 0:
-            print("No hours worked in this pay period.")
+    def close_leave_period(self, period_start=None, period_end=None):
+        """Accrue sick and family leave for every employee for a closed pay period."""
+        try:
+            period_start = period_start or input("Enter Period Start (YYYY-MM-DD): ")
+            period_end = period_end or input("Enter Period End (YYYY-MM-DD): ")
+            result = self.data_manager.accrue_leave_for_period(period_start, period_end)
+        except ValueError as e:
+            print(f"Invalid input: {e}")
             return None
+        print(f"Leave accrued for {result['employees_accrued']} employees for {result['period_start']} to "
+              f"{result['period_end']} in {result['elapsed']:.2f}s: sick {result['sick_leave']:.2f} h, "
+              f"family {result['family_leave']:.2f} h.")
+        if result["already_accrued"]:
+            print(f"{result['already_accrued']} employees had already accrued leave for this period and were skipped.")
+        return result
 
-        # Calculate gross pay (including overtime at 1.5x rate for overtime hours)
-        gross_pay = (total_hours * hourly_rate) + (overtime_hours * hourly_rate * 1.5)
-        print(f"Total Hours: {total_hours}, Overtime Hours: {overtime_hours}, Gross Pay: ${gross_pay:.2f}")
-        return gross_pay
+    def calculate_pay_period(self, pay_date, pay_frequency):
+        """Calculate the start and end dates of the pay period based on the pay frequency."""
+        with self.profiler.stage("calculate_pay_period"):
+            if pay_frequency == "weekly":
+                start_date = pay_date - timedelta(weeks=1)
+                end_date = pay_date
+            elif pay_frequency == "biweekly":
+                start_date = pay_date - timedelta(weeks=2)
+                end_date = pay_date
+            elif pay_frequency == "monthly":
+                start_date = pay_date - relativedelta(months=1)
+                end_date = pay_date
+            else:
+                print("Unknown pay frequency.")
+                return None, None
+
+            print(f"Calculated Pay Period: {start_date.date()} to {end_date.date()}")
+            return start_date.date(), end_date.date()
+
+    def calculate_hourly_gross_pay(self, employee_id, start_date, end_date, employee_data, time_logs=None):
+        """Calculate gross pay for an hourly employee based on time worked and overtime.
+
+        time_logs is the period's (date, hours_worked) stream when the caller has already read it.
+        """
+        with self.profiler.stage("calculate_hourly_gross_pay", employee_id):
+            hourly_rate = employee_data.get("hourly_rate")
+            if hourly_rate is None:
+                print("Hourly rate is missing for this employee.")
+                return None
+
+            # Classify the pay period's hours with the work state's overtime rules
+            if time_logs is None:
+                time_logs = self.period_time_logs(employee_id, start_date, end_date)
+            if not sum(hours for _, hours in time_logs):
+                print("No hours worked in this pay period.")
+                return None
+
+            with self.profiler.stage("overtime_split", employee_id):
+                overtime_rule = self.data_manager.get_overtime_rule(employee_data.get("work_state"))
+                gross_pay, split = hourly_gross_pay(time_logs, hourly_rate, overtime_rule)
+            print(f"Regular Hours: {split['regular_hours']}, Overtime Hours: {split['overtime_hours']}, "
+                  f"Doubletime Hours: {split['doubletime_hours']}, Gross Pay: ${gross_pay:.2f}")
+            return gross_pay
 
     def calculate_salaried_gross_pay(self, employee_data):
         """Calculate gross pay for a salaried employee based on pay frequency."""
-        annual_salary = employee_data.get("annual_salary")
-        pay_frequency = employee_data.get("pay_frequency")  # Assume values like 'monthly', 'biweekly'
-
-        if annual_salary is None or pay_frequency is None:
-            print("Annual salary or pay frequency is missing for this employee.")
-            return None
-
-        # Calculate gross pay based on pay frequency
-        if pay_frequency == "monthly":
-            gross_pay = annual_salary / 12
-        elif pay_frequency == "biweekly":
-            gross_pay = annual_salary / 26
-        elif pay_frequency == "weekly":
-            gross_pay = annual_salary / 52
-        else:
-            print("Unknown pay frequency.")
-            return None
+        with self.profiler.stage("calculate_salaried_gross_pay", employee_data.get("id")):
+            annual_salary = employee_data.get("annual_salary")
+            pay_frequency = employee_data.get("pay_frequency")  # Assume values like 'monthly', 'biweekly'
+
+            if annual_salary is None or pay_frequency is None:
+                print("Annual salary or pay frequency is missing for this employee.")
+                return None
+
+            # Calculate gross pay based on pay frequency
+            if pay_frequency == "monthly":
+                gross_pay = annual_salary / 12
+            elif pay_frequency == "biweekly":
+                gross_pay = annual_salary / 26
+            elif pay_frequency == "weekly":
+                gross_pay = annual_salary / 52
+            else:
+                print("Unknown pay frequency.")
+                return None
 
-        print(f"Pay Frequency: {pay_frequency.capitalize()}, Gross Pay: ${gross_pay:.2f}")
-        return gross_pay
+            print(f"Pay Frequency: {pay_frequency.capitalize()}, Gross Pay: ${gross_pay:.2f}")
+            return gross_pay
 
     def update_payroll_schedule(self):
         """Update the payroll schedule for an existing employee."""
@@ -429,45 +622,40 @@ class HR:
             print("Invalid input. Please enter valid details.")
 
     def calculate_hours_worked(self, employee_id, start_date, end_date):
-        """Calculate total and overtime hours worked by an employee within the specified pay period."""
-        # Retrieve all time logs for the employee within the pay period
-        time_logs = self.data_manager.get_time_logs_for_employee(employee_id, start_date, end_date)
-        total_hours = 0
-        overtime_hours = 0
-
-        # Calculate regular and overtime hours from time logs
-        for log in time_logs:
-            hours_worked = log['hours_worked']
-            if hours_worked > 8:
-                # Standard overtime rules: over 8 hours in a day counts as overtime
-                overtime_hours += hours_worked - 8
-                total_hours += 8  # Only 8 hours count as regular time
-            else:
-                total_hours += hours_worked
-
-        print(f"Total Hours: {total_hours}, Overtime Hours: {overtime_hours}")
-        return total_hours, overtime_hours
-
-    def view_payroll_history(self):
-        """View payroll history for a specific employee."""
+        """Calculate regular, overtime and doubletime hours worked by an employee within the specified pay period."""
+        split = self.apply_overtime(employee_id, self.period_time_logs(employee_id, start_date, end_date))
+        print(f"Regular Hours: {split['regular_hours']}, Overtime Hours: {split['overtime_hours']}, "
+              f"Doubletime Hours: {split['doubletime_hours']}")
+        return split
+
+    def view_payroll_history(self, page_size=20):
+        """View payroll history for a specific employee, newest first, a page at a time."""
         try:
             employee_id = int(input("Enter Employee ID: "))
-            payroll_history = self.data_manager.get_payroll_history(employee_id)
+        except ValueError:
+            print("Invalid input. Please enter a valid Employee ID.")
+            return
 
-            if not payroll_history:
-                print(f"No payroll history found for Employee ID {employee_id}.")
-                return
+        page = self.data_manager.get_payroll_history_page(employee_id, limit=page_size)
+        if not page["rows"]:
+            print(f"No payroll history found for Employee ID {employee_id}.")
+            return
 
-            print(f"Payroll History for Employee ID {employee_id}:")
-            for record in payroll_history:
+        ytd = self.data_manager.get_year_to_date_totals(employee_id)
+        print(f"Payroll History for Employee ID {employee_id}:")
+        print(f"Year to Date ({ytd['pay_periods']} pay periods): Gross Pay: ${ytd['gross_pay']:.2f}, "
+              f"Deductions: ${ytd['deductions']:.2f}, Net Pay: ${ytd['net_pay']:.2f}")
+        while True:
+            for record in page["rows"]:
                 pay_date = record['pay_date']
                 gross_pay = record['gross_pay']
                 deductions = record['deductions']
                 net_pay = record['net_pay']
                 print(f"Date: {pay_date}, Gross Pay: ${gross_pay:.2f}, Deductions: ${deductions:.2f}, Net Pay: ${net_pay:.2f}")
-
-        except ValueError:
-            print("Invalid input. Please enter a valid Employee ID.")
+            if page["next_cursor"] is None or input("Show older records? (y/n): ").strip().lower() != 'y':
+                break
+            page = self.data_manager.get_payroll_history_page(employee_id, limit=page_size,
+                                                              cursor=page["next_cursor"])
 
     
     def menu(self):
@@ -481,7 +669,14 @@ class HR:
             print("5. View Payroll History")
             print("6. Set Employee Deductions")
             print("7. Set Compensation")  # Added Set Compensation option
-            print("8. Back to Main Menu")
+            print("8. Run Payroll for Pay Date")
+            print("9. Payroll What-If Simulator")
+            print("10. Rebuild Hours Rollup")
+            print("11. Close Leave Accrual Period")
+            print("12. Generate Bonus Insights")
+            print("13. Profile Payroll")
+            print("14. Generate Pay Stubs")
+            print("15. Back to Main Menu")
             choice = input("Enter choice: ")
 
             if choice == '1':
@@ -499,6 +694,24 @@ class HR:
             elif choice == '7':
                 self.set_compensation()  # Call set_compensation
             elif choice == '8':
+                pay_date = input("Enter Pay Date (YYYY-MM-DD): ")
+                try:
+                    self.run_payroll(pay_date)
+                except ValueError:
+                    print("Invalid date. Please use the format YYYY-MM-DD.")
+            elif choice == '9':
+                self.what_if_menu()
+            elif choice == '10':
+                self.rebuild_hours_rollup()
+            elif choice == '11':
+                self.close_leave_period()
+            elif choice == '12':
+                self.show_bonus_insights()
+            elif choice == '13':
+                self.profile_payroll_menu()
+            elif choice == '14':
+                self.pay_stubs_menu()
+            elif choice == '15':
                 break
             else:
                 print("Invalid choice.")
@@ -0,0 +1,231 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import openai
+import requests
+
+DEFAULT_MODEL = "gpt-3.5-turbo"
+
+
+class InsightError(Exception):
+    """Raised by a chat client when a completion cannot be produced."""
+
+
+class OpenAIChatClient:
+    """Chat client backed by the openai package, as used elsewhere in the application."""
+
+    def __init__(self, model=DEFAULT_MODEL):
+        self.model = model
+
+    def complete(self, prompt):
+        try:
+            response = openai.ChatCompletion.create(
+                model=self.model,
+                messages=[{"role": "user", "content": prompt}]
+            )
+            return response['choices'][0]['message']['content']
+        except openai.error.OpenAIError as e:
+            raise InsightError(str(e)) from e
+        except (IndexError, KeyError) as e:
+            raise InsightError("Unexpected response format from OpenAI API.") from e
+
+
+class HTTPChatClient:
+    """Chat client for any OpenAI-compatible /chat/completions endpoint, such as a local stub server."""
+
+    def __init__(self, base_url, api_key=None, model=DEFAULT_MODEL, timeout=(3.05, 30)):
+        self.url = base_url.rstrip("/") + "/chat/completions"
+        self.model = model
+        self.timeout = timeout
+        self.session = requests.Session()
+        if api_key:
+            self.session.headers["Authorization"] = f"Bearer {api_key}"
+
+    def complete(self, prompt):
+        try:
+            response = self.session.post(self.url, timeout=self.timeout, json={
+                "model": self.model,
+                "messages": [{"role": "user", "content": prompt}],
+            })
+            response.raise_for_status()
+            return response.json()['choices'][0]['message']['content']
+        except requests.RequestException as e:
+            raise InsightError(str(e)) from e
+        except (ValueError, IndexError, KeyError) as e:
+            raise InsightError("Unexpected response format from chat endpoint.") from e
+
+
+class TokenBucket:
+    """Thread-safe token bucket: refills at rate tokens per second up to capacity; acquire() blocks until one is free."""
+
+    def __init__(self, rate, capacity=None):
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else max(1.0, rate))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+        self.waited = 0.0
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+                self.waited += wait
+            time.sleep(wait)
+
+
+class ResponseCache:
+    """On-disk cache of completions, one JSON file per prompt keyed by the SHA-256 of model and prompt."""
+
+    def __init__(self, directory=".insight_cache"):
+        self.directory = directory
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def key(model, prompt):
+        return hashlib.sha256(f"{model}\n{prompt}".encode("utf-8")).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], f"{key}.json")
+
+    def get(self, key):
+        try:
+            with open(self._path(key), encoding="utf-8") as file:
+                text = json.load(file)["response"]
+        except (OSError, ValueError, KeyError):
+            with self.lock:
+                self.misses += 1
+            return None
+        with self.lock:
+            self.hits += 1
+        return text
+
+    def put(self, key, prompt, text):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write to a temporary file and rename, so concurrent readers never see a partial entry
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as file:
+                json.dump({"prompt": prompt, "response": text, "created": time.time()}, file)
+            os.replace(temp_path, path)
+        except BaseException:
+            # Do not leave half-written temporary files behind in the cache directory
+            try:
+                os.unlink(temp_path)
+            except OSError:
+                pass
+            raise
+
+
+class InsightResult:
+    """Outcome of one prompt: the response text, or the error that prevented it."""
+
+    def __init__(self, key, prompt, text=None, error=None, cached=False, attempts=0, elapsed=0.0):
+        self.key = key
+        self.prompt = prompt
+        self.text = text
+        self.error = error
+        self.cached = cached
+        self.attempts = attempts
+        self.elapsed = elapsed
+
+    @property
+    def ok(self):
+        return self.error is None
+
+    def to_dict(self):
+        return {"key": self.key, "prompt": self.prompt, "text": self.text, "error": self.error,
+                "cached": self.cached, "attempts": self.attempts, "elapsed": self.elapsed}
+
+    def __repr__(self):
+        return (f"InsightResult(key={self.key!r}, ok={self.ok!r}, cached={self.cached!r}, "
+                f"attempts={self.attempts!r}, elapsed={self.elapsed:.3f})")
+
+
+class InsightDriver:
+    """Runs many prompts through a chat client with bounded concurrency, a rate limit, retries and a response cache.
+
+    client is any object with complete(prompt) -> str that raises InsightError on failure. Identical prompts
+    in one run are sent once. Results come back in input order as InsightResult objects.
+    """
+
+    def __init__(self, client, max_workers=8, requests_per_second=None, burst=None, cache=None,
+                 retries=2, backoff=0.5):
+        self.client = client
+        self.max_workers = max_workers
+        self.rate_limiter = TokenBucket(requests_per_second, burst) if requests_per_second else None
+        self.cache = cache
+        self.retries = retries
+        self.backoff = backoff
+        self.model = getattr(client, "model", DEFAULT_MODEL)
+
+    def _complete(self, prompt):
+        """Return (text, error, cached, attempts) for one prompt."""
+        cache_key = ResponseCache.key(self.model, prompt)
+        if self.cache is not None:
+            text = self.cache.get(cache_key)
+            if text is not None:
+                return text, None, True, 0
+        error = None
+        for attempt in range(1, self.retries + 2):
+            if self.rate_limiter is not None:
+                self.rate_limiter.acquire()
+            try:
+                text = self.client.complete(prompt)
+            except InsightError as e:
+                error = str(e)
+                if attempt <= self.retries:
+                    time.sleep(self.backoff * 2 ** (attempt - 1))
+                continue
+            if self.cache is not None:
+                self.cache.put(cache_key, prompt, text)
+            return text, None, False, attempt
+        return None, error, False, self.retries + 1
+
+    def run(self, prompts):
+        """Complete (key, prompt) pairs and return one InsightResult per pair, in order, plus a stats dict."""
+        prompts = list(prompts)
+        start = time.perf_counter()
+        waited_before = self.rate_limiter.waited if self.rate_limiter else 0.0
+        unique_prompts = list(dict.fromkeys(prompt for _, prompt in prompts))
+
+        def timed(prompt):
+            started = time.perf_counter()
+            return self._complete(prompt) + (time.perf_counter() - started,)
+
+        if self.max_workers and self.max_workers > 1 and len(unique_prompts) > 1:
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                outcomes = dict(zip(unique_prompts, executor.map(timed, unique_prompts)))
+        else:
+            outcomes = {prompt: timed(prompt) for prompt in unique_prompts}
+
+        results = []
+        for key, prompt in prompts:
+            text, error, cached, attempts, elapsed = outcomes[prompt]
+            results.append(InsightResult(key, prompt, text, error, cached, attempts, elapsed))
+        elapsed = time.perf_counter() - start
+        stats = {
+            "prompts": len(prompts),
+            "unique_prompts": len(unique_prompts),
+            "succeeded": sum(result.ok for result in results),
+            "failed": sum(not result.ok for result in results),
+            "cached": sum(outcome[2] for outcome in outcomes.values()),
+            "api_calls": sum(outcome[3] for outcome in outcomes.values()),
+            # Summed over worker threads, so it can exceed the wall-clock elapsed time
+            "rate_limit_wait": (self.rate_limiter.waited if self.rate_limiter else 0.0) - waited_before,
+            "elapsed": elapsed,
+        }
+        return results, stats
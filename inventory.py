@@ -1,10 +1,10 @@
 import threading
 import time
-from datamanager import DataManager
+from datamanager import get_data_manager
 
 class Inventory:
-    def __init__(self):
-        self.data_manager = DataManager()
+    def __init__(self, data_manager=None):
+        self.data_manager = data_manager or get_data_manager()
         self.checking = threading.Event()  # Use Event for thread-safe checking flag
         self.checking.set()  # Set the flag to start monitoring
         self.monitor_thread = threading.Thread(target=self.monitor_stock_background)
@@ -1,4 +1,4 @@
-from datamanager import DataManager
+from datamanager import get_data_manager
 from sales import Sales
 from inventory import Inventory
 from hr import HR
@@ -7,7 +7,7 @@ from employee_portal import EmployeePortal
 import schedule
 
 
-data_manager = DataManager()
+data_manager = get_data_manager()  # One shared instance for every department
 
 def update_exchange_rates():
     data_manager.fetch_and_update_exchange_rates()
@@ -41,10 +41,10 @@ def add_sample_products():
 
 def main_menu():
     """Display the main menu for department selection."""
-    hr = HR()
-    finance = Finance()
-    inventory = Inventory()
-    sales = Sales()
+    hr = HR(data_manager)
+    finance = Finance(data_manager)
+    inventory = Inventory(data_manager)
+    sales = Sales(data_manager)
 
     while True:
         print("\nWelcome to OptimaCorp Operations System")
@@ -60,7 +60,7 @@ def main_menu():
             hr.menu()
         elif choice == '2':
             employee_id = input("Enter your Employee ID to access the Employee Portal: ")
-            employee_portal = EmployeePortal(employee_id)
+            employee_portal = EmployeePortal(employee_id, data_manager)
             employee_portal.menu(employee_id)
         elif choice == '3':
             finance.menu()
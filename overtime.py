@@ -0,0 +1,169 @@
+from datetime import date
+from functools import lru_cache
+from itertools import groupby
+from operator import itemgetter
+
+DEFAULT_OVERTIME_RULES = {
+    "daily_overtime_threshold": 8,
+    "doubletime_threshold": 12,
+    "weekly_overtime_threshold": 40,
+    "overtime_rate": 1.5,
+    "doubletime_rate": 2.0,
+    "seventh_day_overtime": False,
+}
+
+
+@lru_cache(maxsize=4096)
+def _day_number(value):
+    """Proleptic ordinal of a date or YYYY-MM-DD string; day 1 (0001-01-01) is a Monday."""
+    if isinstance(value, date):
+        return value.toordinal()
+    return date.fromisoformat(str(value)[:10]).toordinal()
+
+
+class OvertimeRule:
+    """One state's overtime rules, compiled for a single pass over a date-ordered time-log stream.
+
+    Hours are classified per day, then per Monday-based workweek:
+    - daily: hours past daily_overtime_threshold are overtime and past doubletime_threshold doubletime;
+    - weekly: regular hours past weekly_overtime_threshold in a workweek become overtime;
+    - seventh day: when enabled, on the seventh consecutive day worked in a workweek the first
+      daily_overtime_threshold hours are overtime and the rest doubletime.
+    A threshold of None switches that rule off.
+    """
+
+    __slots__ = ("daily_threshold", "doubletime_threshold", "weekly_threshold", "overtime_rate",
+                 "doubletime_rate", "seventh_day_overtime")
+
+    def __init__(self, daily_overtime_threshold=8, doubletime_threshold=12, weekly_overtime_threshold=40,
+                 overtime_rate=1.5, doubletime_rate=2.0, seventh_day_overtime=False):
+        self.daily_threshold = daily_overtime_threshold
+        self.doubletime_threshold = doubletime_threshold
+        self.weekly_threshold = weekly_overtime_threshold
+        self.overtime_rate = overtime_rate
+        self.doubletime_rate = doubletime_rate
+        self.seventh_day_overtime = bool(seventh_day_overtime)
+
+    @classmethod
+    def from_dict(cls, rules):
+        """Compile a rules dict as returned by DataManager.get_overtime_rules."""
+        merged = {**DEFAULT_OVERTIME_RULES, **rules}
+        return cls(**{key: merged[key] for key in DEFAULT_OVERTIME_RULES})
+
+    def to_dict(self):
+        return {
+            "daily_overtime_threshold": self.daily_threshold,
+            "doubletime_threshold": self.doubletime_threshold,
+            "weekly_overtime_threshold": self.weekly_threshold,
+            "overtime_rate": self.overtime_rate,
+            "doubletime_rate": self.doubletime_rate,
+            "seventh_day_overtime": self.seventh_day_overtime,
+        }
+
+    def __getstate__(self):
+        return self.to_dict()
+
+    def __setstate__(self, state):
+        self.__init__(**state)
+
+    def __repr__(self):
+        return f"OvertimeRule({self.to_dict()!r})"
+
+    def _split_day(self, hours, seventh_day):
+        """Return (regular, overtime, doubletime) for one day's hours, before the weekly rule."""
+        if seventh_day:
+            threshold = self.daily_threshold if self.daily_threshold is not None else 8
+            return 0.0, min(hours, threshold), max(hours - threshold, 0.0)
+        doubletime = 0.0
+        if self.doubletime_threshold is not None and hours > self.doubletime_threshold:
+            doubletime = hours - self.doubletime_threshold
+            hours = self.doubletime_threshold
+        overtime = 0.0
+        if self.daily_threshold is not None and hours > self.daily_threshold:
+            overtime = hours - self.daily_threshold
+            hours = self.daily_threshold
+        return hours, overtime, doubletime
+
+    def split_days(self, time_logs):
+        """Classify a date-ordered stream of (date, hours_worked) pairs in one pass, one day at a time.
+
+        Several entries for the same date are added together. Yields (date, hours_worked, regular, overtime,
+        doubletime) for every day with hours, where date is the first value seen for that day.
+        """
+        week = None
+        week_regular = 0.0
+        streak = 0
+        previous_day = current_day = current_value = None
+        day_hours = 0.0
+        weekly_threshold = self.weekly_threshold
+
+        for date_value, hours in _with_end_marker(time_logs):
+            day = _day_number(date_value) if date_value is not None else None
+            if day == current_day:
+                day_hours += hours or 0.0
+                continue
+            if current_day is not None and day_hours > 0:
+                # Close the finished day: daily and seventh-day rules first, then the weekly cap
+                current_week = (current_day - 1) // 7
+                if current_week != week:
+                    week, week_regular, streak = current_week, 0.0, 0
+                streak = streak + 1 if previous_day == current_day - 1 and streak else 1
+                previous_day = current_day
+                day_regular, day_overtime, day_doubletime = self._split_day(
+                    day_hours, self.seventh_day_overtime and streak == 7)
+                if weekly_threshold is not None and week_regular + day_regular > weekly_threshold:
+                    moved = week_regular + day_regular - weekly_threshold
+                    moved = day_regular if moved > day_regular else moved
+                    day_regular -= moved
+                    day_overtime += moved
+                week_regular += day_regular
+                yield current_value, day_hours, day_regular, day_overtime, day_doubletime
+            current_day = day
+            current_value = date_value
+            day_hours = hours or 0.0
+
+    def split(self, time_logs):
+        """Classify a date-ordered stream of (date, hours_worked) pairs in one pass.
+
+        Several entries for the same date are added together. Returns a dict with regular_hours,
+        overtime_hours, doubletime_hours and the rule's overtime_rate and doubletime_rate.
+        """
+        regular = overtime = doubletime = 0.0
+        for _, _, day_regular, day_overtime, day_doubletime in self.split_days(time_logs):
+            regular += day_regular
+            overtime += day_overtime
+            doubletime += day_doubletime
+        return {
+            "regular_hours": regular,
+            "overtime_hours": overtime,
+            "doubletime_hours": doubletime,
+            "overtime_rate": self.overtime_rate,
+            "doubletime_rate": self.doubletime_rate,
+        }
+
+
+def _with_end_marker(time_logs):
+    """Yield the time logs followed by a (None, 0.0) marker that flushes the last day."""
+    yield from time_logs
+    yield None, 0.0
+
+
+class OvertimeRuleBook:
+    """Compiled overtime rules for every state, with the default rules for states that have none."""
+
+    def __init__(self, rules_by_state=None):
+        self.default = OvertimeRule.from_dict(DEFAULT_OVERTIME_RULES)
+        self.rules = {state: OvertimeRule.from_dict(rules) for state, rules in (rules_by_state or {}).items()}
+
+    def rule_for(self, state):
+        return self.rules.get(state) or self.default
+
+    def split_stream(self, rows, state_for_employee):
+        """Classify a stream of (employee_id, date, hours_worked) rows ordered by employee and date.
+
+        state_for_employee maps an employee id to the state whose rules apply (missing ids use the
+        default rules). Yields (employee_id, split) pairs in one pass without holding the stream in memory.
+        """
+        for employee_id, logs in groupby(rows, key=itemgetter(0)):
+            rule = self.rule_for(state_for_employee.get(employee_id))
+            yield employee_id, rule.split((log[1], log[2]) for log in logs)
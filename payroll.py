@@ -0,0 +1,496 @@
+import math
+import numpy as np
+from datetime import timedelta
+from dateutil.relativedelta import relativedelta
+from overtime import DEFAULT_OVERTIME_RULES, OvertimeRuleBook
+
+# Days a salaried employee with no time logs is assumed to work, per pay frequency
+STANDARD_PERIOD_DAYS = {
+    "weekly": 5,
+    "biweekly": 10,
+    "monthly": 52 * 5 / 12,
+}
+
+SALARY_PERIODS_PER_YEAR = {
+    "weekly": 52,
+    "biweekly": 26,
+    "monthly": 12,
+}
+
+class ReferenceData:
+    """Snapshot of the tax, wage and overtime reference tables, so pay can be computed without database access.
+
+    Instances hold only plain dicts, sets and compiled overtime rules, so they can be sent to worker processes.
+    """
+
+    def __init__(self, state_tax=None, country_tax=None, overtime_rules=None, minimum_wages=None,
+                 reciprocity=None, federal_tax_rate=0.1, fica_tax_rate=0.062):
+        self.state_tax = state_tax or {}
+        self.country_tax = country_tax or {}
+        self.overtime_rules_by_state = overtime_rules or {}
+        self.overtime_rule_book = OvertimeRuleBook(self.overtime_rules_by_state)
+        self.minimum_wages = minimum_wages or {}
+        self.reciprocity = reciprocity or set()
+        self.federal_tax_rate = federal_tax_rate
+        self.fica_tax_rate = fica_tax_rate
+
+    @classmethod
+    def from_data_manager(cls, data_manager):
+        """Build a snapshot from a DataManager's reference cache (one query per table at most)."""
+        cache = data_manager.reference_cache
+        return cls(
+            state_tax=dict(cache.table("state_tax")),
+            country_tax=dict(cache.table("country_tax")),
+            overtime_rules=dict(cache.table("state_overtime_rules")),
+            minimum_wages=dict(cache.table("state_minimum_wages")),
+            reciprocity=set(cache.table("tax_reciprocity")),
+            federal_tax_rate=data_manager.get_federal_tax_rate(),
+            fica_tax_rate=data_manager.get_fica_tax_rate(),
+        )
+
+    def with_overrides(self, state_tax=None, country_tax=None, overtime_rules=None, minimum_wages=None,
+                       reciprocity=None, federal_tax_rate=None, fica_tax_rate=None):
+        """Return a copy with hypothetical changes applied, leaving this snapshot (and the database) untouched.
+
+        Per-state and per-country overrides are merged over the current rates, so {"CA": {"income_tax_rate": 0.1}}
+        changes only California's income tax. reciprocity, when given, replaces the set of reciprocal pairs.
+        """
+        merged_state_tax = dict(self.state_tax)
+        for state, rates in (state_tax or {}).items():
+            merged_state_tax[state] = {**self.state_tax_rates(state), **rates}
+        merged_country_tax = dict(self.country_tax)
+        for country_code, rates in (country_tax or {}).items():
+            merged_country_tax[country_code] = {**self.country_tax_rates(country_code), **rates}
+        merged_overtime_rules = dict(self.overtime_rules_by_state)
+        for state, rules in (overtime_rules or {}).items():
+            merged_overtime_rules[state] = {**self.overtime_rules(state), **rules}
+        return ReferenceData(
+            state_tax=merged_state_tax,
+            country_tax=merged_country_tax,
+            overtime_rules=merged_overtime_rules,
+            minimum_wages={**self.minimum_wages, **(minimum_wages or {})},
+            reciprocity=set(self.reciprocity if reciprocity is None else reciprocity),
+            federal_tax_rate=self.federal_tax_rate if federal_tax_rate is None else federal_tax_rate,
+            fica_tax_rate=self.fica_tax_rate if fica_tax_rate is None else fica_tax_rate,
+        )
+
+    def state_tax_rates(self, state):
+        return self.state_tax.get(state) or {"income_tax_rate": 0.0, "sui_rate": 0.0, "local_tax_rate": 0.0}
+
+    def country_tax_rates(self, country_code):
+        return self.country_tax.get(country_code) or {
+            "income_tax_rate": 0.0, "social_contribution_rate": 0.0, "expatriate_tax_rate": 0.0}
+
+    def overtime_rules(self, state):
+        return self.overtime_rules_by_state.get(state) or DEFAULT_OVERTIME_RULES
+
+    def overtime_rule(self, state):
+        """The compiled OvertimeRule for a state, compiled once per snapshot."""
+        return self.overtime_rule_book.rule_for(state)
+
+    def minimum_wage(self, state):
+        return self.minimum_wages.get(state)
+
+    def is_reciprocal(self, home_state, work_state):
+        return (home_state, work_state) in self.reciprocity
+
+
+def pay_period(pay_date, pay_frequency):
+    """Return the (start, end) dates of the pay period ending on pay_date, or (None, None) for an unknown frequency."""
+    if pay_frequency == "weekly":
+        start_date = pay_date - timedelta(weeks=1)
+    elif pay_frequency == "biweekly":
+        start_date = pay_date - timedelta(weeks=2)
+    elif pay_frequency == "monthly":
+        start_date = pay_date - relativedelta(months=1)
+    else:
+        return None, None
+    return start_date, pay_date
+
+
+def next_pay_date(pay_date, pay_frequency):
+    """Return the pay date following pay_date for the given frequency."""
+    if pay_frequency == "weekly":
+        return pay_date + timedelta(weeks=1)
+    elif pay_frequency == "biweekly":
+        return pay_date + timedelta(weeks=2)
+    elif pay_frequency == "monthly":
+        return pay_date + relativedelta(months=1)
+    return None
+
+
+def earliest_period_start(pay_date):
+    """Start of the longest pay period ending on pay_date, so one time-log query covers every frequency."""
+    return min(pay_period(pay_date, frequency)[0] for frequency in SALARY_PERIODS_PER_YEAR)
+
+
+def build_payroll_items(due, employees, hours, deductions, pay_date):
+    """Turn (employee_id, pay_frequency) pairs and preloaded data into payroll work items.
+
+    employees maps ids to records, hours maps ids to date-ordered [(date, hours_worked)] covering at least
+    earliest_period_start(pay_date) to pay_date, and deductions maps ids to voluntary totals.
+    Returns (items, skipped) where skipped holds (employee_id, reason) pairs.
+    """
+    items = []
+    skipped = []
+    for employee_id, schedule_frequency in due:
+        employee = employees.get(employee_id)
+        if employee is None:
+            skipped.append((employee_id, "employee not found"))
+            continue
+        pay_frequency = schedule_frequency or employee.get("pay_frequency")
+        start_date, end_date = pay_period(pay_date, pay_frequency)
+        if start_date is None:
+            skipped.append((employee_id, f"unknown pay frequency {pay_frequency!r}"))
+            continue
+        start_text, end_text = start_date.isoformat(), end_date.isoformat()
+        time_logs = [(date, worked) for date, worked in hours.get(employee_id, ()) if start_text <= date <= end_text]
+        items.append((employee, pay_frequency, time_logs, deductions.get(employee_id, 0.0), pay_date))
+    return items, skipped
+
+
+def hourly_gross_pay(time_logs, hourly_rate, overtime_rule):
+    """Gross pay for an hourly employee: regular hours at the hourly rate, overtime and doubletime at the rule's rates.
+
+    Returns (gross_pay, split) where split is the OvertimeRule.split result for time_logs.
+    """
+    split = overtime_rule.split(time_logs)
+    gross_pay = (
+        split["regular_hours"] * hourly_rate +
+        split["overtime_hours"] * hourly_rate * split["overtime_rate"] +
+        split["doubletime_hours"] * hourly_rate * split["doubletime_rate"]
+    )
+    return gross_pay, split
+
+
+def salaried_gross_pay(annual_salary, pay_frequency):
+    """Gross pay per period for a salaried employee, or None for an unknown frequency."""
+    periods = SALARY_PERIODS_PER_YEAR.get(pay_frequency)
+    if annual_salary is None or periods is None:
+        return None
+    return annual_salary / periods
+
+
+def standard_time_logs(pay_date, pay_frequency):
+    """Eight-hour weekdays ending on pay_date covering a standard pay period, for salaried employees who log no time.
+
+    Returns (date, hours) pairs in date order; a monthly period ends with a part day.
+    """
+    days = STANDARD_PERIOD_DAYS[pay_frequency]
+    workdays = []
+    day = pay_date
+    while len(workdays) < math.ceil(days):
+        if day.weekday() < 5:
+            workdays.append(day)
+        day -= timedelta(days=1)
+    time_logs = [(workday.isoformat(), 8.0) for workday in reversed(workdays)]
+    if days > int(days):
+        time_logs[0] = (time_logs[0][0], 8.0 * (days - int(days)))
+    return time_logs
+
+
+def _factorize(values):
+    """Return (codes, uniques): an int array indexing each value into the list of distinct values."""
+    uniques = list(dict.fromkeys(values))
+    index = {value: code for code, value in enumerate(uniques)}
+    codes = np.fromiter(map(index.__getitem__, values), dtype=np.intp, count=len(values))
+    return codes, uniques
+
+
+def _lookup(codes, uniques, rate_for):
+    """Broadcast a per-key lookup over factorized codes, calling rate_for once per distinct key."""
+    return np.array([rate_for(key) for key in uniques], dtype=float)[codes] if uniques else np.zeros(0)
+
+
+def compute_net_pay_arrays(gross_pay, total_hours_worked, regular_hours, overtime_hours, doubletime_hours,
+                           home_states, work_states, country_codes, is_expatriate, voluntary_deductions, references,
+                           overtime_states=None):
+    """Vectorized compute_net_pay over whole columns of employees.
+
+    gross_pay, total_hours_worked, the three hour columns (from OvertimeRule.split) and voluntary_deductions
+    are float sequences, the state and country sequences hold codes (or None) and is_expatriate booleans.
+    overtime_states picks each row's overtime and doubletime rates and defaults to None (the default rules).
+    Returns a dict with the same keys as compute_net_pay, each an array with one entry per employee.
+    """
+    gross_pay = np.asarray(gross_pay, dtype=float)
+    total_hours_worked = np.asarray(total_hours_worked, dtype=float)
+    regular_hours = np.asarray(regular_hours, dtype=float)
+    overtime_hours = np.asarray(overtime_hours, dtype=float)
+    doubletime_hours = np.asarray(doubletime_hours, dtype=float)
+    voluntary_deductions = np.asarray(voluntary_deductions, dtype=float)
+    is_expatriate = np.asarray(is_expatriate, dtype=bool)
+    if overtime_states is None:
+        overtime_states = [None] * len(gross_pay)
+    if np.any(total_hours_worked == 0):
+        raise ValueError("total_hours_worked must be non-zero for every employee")
+
+    # Calculate base hourly rate
+    hourly_rate = gross_pay / total_hours_worked
+
+    # Minimum wage check (using home state as default)
+    home_codes, home_keys = _factorize(home_states)
+    minimum_wage = _lookup(home_codes, home_keys, lambda state: references.minimum_wage(state) or 0.0)
+    minimum_wage_applied = (minimum_wage != 0) & (hourly_rate < minimum_wage)
+    hourly_rate = np.where(minimum_wage_applied, minimum_wage, hourly_rate)
+
+    # Apply overtime adjustments at each row's state rates
+    rule_codes, rule_keys = _factorize(overtime_states)
+    overtime_rate = _lookup(rule_codes, rule_keys, lambda state: references.overtime_rule(state).overtime_rate)
+    doubletime_rate = _lookup(rule_codes, rule_keys, lambda state: references.overtime_rule(state).doubletime_rate)
+    overtime_pay = (
+        overtime_hours * hourly_rate * overtime_rate +
+        doubletime_hours * hourly_rate * doubletime_rate
+    )
+    adjusted_gross_pay = (regular_hours * hourly_rate) + overtime_pay
+
+    # Country-specific tax calculations
+    country_codes, country_keys = _factorize(country_codes)
+    country_rate = lambda name: _lookup(country_codes, country_keys,
+                                        lambda code: references.country_tax_rates(code).get(name, 0))
+    income_tax = adjusted_gross_pay * country_rate("income_tax_rate")
+    social_contribution = adjusted_gross_pay * country_rate("social_contribution_rate")
+    expatriate_tax = np.where(is_expatriate, adjusted_gross_pay * country_rate("expatriate_tax_rate"), 0.0)
+
+    # State tax with reciprocity
+    work_codes, work_keys = _factorize(work_states)
+    reciprocal_pairs = np.array([[references.is_reciprocal(home, work) for work in work_keys] for home in home_keys],
+                                dtype=bool).reshape(len(home_keys), len(work_keys))
+    reciprocal = reciprocal_pairs[home_codes, work_codes]
+
+    def state_rate(name):
+        home_rate = _lookup(home_codes, home_keys, lambda state: references.state_tax_rates(state).get(name, 0))
+        work_rate = _lookup(work_codes, work_keys, lambda state: references.state_tax_rates(state).get(name, 0))
+        return np.where(reciprocal, home_rate, home_rate + work_rate)
+
+    # Calculate state and local taxes
+    state_tax = adjusted_gross_pay * state_rate("income_tax_rate")
+    sui_tax = adjusted_gross_pay * state_rate("sui_rate")
+    local_tax = adjusted_gross_pay * state_rate("local_tax_rate")
+
+    # Federal and FICA taxes
+    federal_tax = adjusted_gross_pay * references.federal_tax_rate
+    fica_tax = adjusted_gross_pay * references.fica_tax_rate
+
+    # Calculate total deductions and net pay
+    total_deductions = (
+        federal_tax + fica_tax + state_tax + sui_tax + local_tax +
+        income_tax + social_contribution + expatriate_tax + voluntary_deductions
+    )
+    net_pay = adjusted_gross_pay - total_deductions
+
+    return {
+        "hourly_rate": hourly_rate,
+        "minimum_wage_applied": minimum_wage_applied,
+        "regular_hours": regular_hours,
+        "overtime_hours": overtime_hours,
+        "doubletime_hours": doubletime_hours,
+        "adjusted_gross_pay": adjusted_gross_pay,
+        "federal_tax": federal_tax,
+        "fica_tax": fica_tax,
+        "income_tax": income_tax,
+        "social_contribution": social_contribution,
+        "expatriate_tax": expatriate_tax,
+        "state_tax": state_tax,
+        "sui_tax": sui_tax,
+        "local_tax": local_tax,
+        "voluntary_deductions": voluntary_deductions,
+        "total_deductions": total_deductions,
+        "net_pay": net_pay,
+    }
+
+
+def compute_net_pay(gross_pay, total_hours_worked, time_logs, employee, references, voluntary_deductions):
+    """Compute the full net-pay breakdown for one employee from preloaded data.
+
+    time_logs is the pay period's date-ordered (date, hours_worked) stream, classified with the overtime
+    rules of the employee's work state. employee is anything with .get() (an EmployeeRecord or dict),
+    references a ReferenceData and voluntary_deductions the employee's total voluntary deductions.
+    Returns a dict of every component.
+    """
+    work_state = employee.get("work_state")
+    split = references.overtime_rule(work_state).split(time_logs)
+    breakdown = compute_net_pay_arrays(
+        [gross_pay], [total_hours_worked],
+        [split["regular_hours"]], [split["overtime_hours"]], [split["doubletime_hours"]],
+        [employee.get("home_state")], [work_state], [employee.get("country_code")],
+        [bool(employee.get("is_expatriate", False))], [voluntary_deductions], references,
+        overtime_states=[work_state],
+    )
+    return {
+        key: bool(values[0]) if key == "minimum_wage_applied" else float(values[0])
+        for key, values in breakdown.items()
+    }
+
+
+def prepare_payroll_entry(item, references):
+    """Work out gross pay and classified hours for one prepared work item from HR.run_payroll.
+
+    item is (employee, pay_frequency, time_logs, voluntary_deductions, pay_date). Returns
+    (gross_pay, total_hours, split, None) or (None, None, None, reason) when the employee cannot be paid.
+    """
+    employee, pay_frequency, time_logs, voluntary_deductions, pay_date = item
+    overtime_rule = references.overtime_rule(employee.get("work_state"))
+    total_hours = sum(hours for _, hours in time_logs)
+    employment_type = employee.get("employment_type")
+    if employment_type == "hourly":
+        hourly_rate = employee.get("hourly_rate")
+        if hourly_rate is None:
+            return None, None, None, "hourly rate is missing"
+        if total_hours == 0:
+            return None, None, None, "no hours worked in this pay period"
+        gross_pay, split = hourly_gross_pay(time_logs, hourly_rate, overtime_rule)
+        return gross_pay, total_hours, split, None
+    elif employment_type == "salaried":
+        gross_pay = salaried_gross_pay(employee.get("annual_salary"), pay_frequency)
+        if gross_pay is None:
+            return None, None, None, "annual salary or pay frequency is missing"
+        if not total_hours:
+            time_logs = standard_time_logs(pay_date, pay_frequency)
+            total_hours = sum(hours for _, hours in time_logs)
+        return gross_pay, total_hours, overtime_rule.split(time_logs), None
+    return None, None, None, f"unknown employment type {employment_type!r}"
+
+
+def prepare_payroll_items(items, references):
+    """Split work items into payable rows and unpaid results.
+
+    Returns (payable, unpaid): payable is a list of (index, employee, gross_pay, total_hours, split,
+    voluntary_deductions) and unpaid a list of (index, (employee_id, None, None, None, reason)).
+    """
+    payable = []
+    unpaid = []
+    for index, item in enumerate(items):
+        employee = item[0]
+        gross_pay, total_hours, split, reason = prepare_payroll_entry(item, references)
+        if reason:
+            unpaid.append((index, (employee.get("id"), None, None, None, reason)))
+        else:
+            payable.append((index, employee, gross_pay, total_hours, split, item[3]))
+    return payable, unpaid
+
+
+def payroll_columns(payable):
+    """Column arguments for compute_net_pay_arrays from the payable rows of prepare_payroll_items."""
+    _, employees, gross_pay, total_hours, splits, voluntary_deductions = zip(*payable) if payable else ((),) * 6
+    return {
+        "gross_pay": np.asarray(gross_pay, dtype=float),
+        "total_hours_worked": np.asarray(total_hours, dtype=float),
+        "regular_hours": np.asarray([split["regular_hours"] for split in splits], dtype=float),
+        "overtime_hours": np.asarray([split["overtime_hours"] for split in splits], dtype=float),
+        "doubletime_hours": np.asarray([split["doubletime_hours"] for split in splits], dtype=float),
+        "home_states": [employee.get("home_state") for employee in employees],
+        "work_states": [employee.get("work_state") for employee in employees],
+        "country_codes": [employee.get("country_code") for employee in employees],
+        "is_expatriate": [bool(employee.get("is_expatriate", False)) for employee in employees],
+        "voluntary_deductions": np.asarray(voluntary_deductions, dtype=float),
+        "overtime_states": [employee.get("work_state") for employee in employees],
+    }
+
+
+def compute_payroll_chunk(items, references):
+    """Compute a list of payroll work items; the unit of work sent to each worker process.
+
+    Returns one (employee_id, gross_pay, deductions, net_pay, reason) tuple per item, with reason None
+    for employees that were paid. Net pay for the whole chunk is computed in one vectorized call.
+    """
+    results = [None] * len(items)
+    payable, unpaid = prepare_payroll_items(items, references)
+    for index, result in unpaid:
+        results[index] = result
+    if not payable:
+        return results
+
+    net_pay = compute_net_pay_arrays(references=references, **payroll_columns(payable))["net_pay"]
+    for (index, employee, gross, _, _, _), net in zip(payable, net_pay.tolist()):
+        results[index] = (employee.get("id"), gross, gross - net, net, None)
+    return results
+
+
+def _group_totals(groups, values):
+    """Sum values per group label, returning {label: total}."""
+    codes, labels = _factorize(groups)
+    totals = np.bincount(codes, weights=values, minlength=len(labels))
+    return dict(zip(labels, totals.tolist()))
+
+
+class PayrollSimulator:
+    """What-if payroll runs over a workforce loaded once.
+
+    The workforce, its time logs and deductions are read a single time; every scenario only swaps the
+    reference data (tax rates, FICA, minimum wages, overtime rules) and reruns the vectorized calculator,
+    so dozens of scenarios cost little more than one. Nothing is written to the database.
+    """
+
+    def __init__(self, items, references):
+        self.items = items
+        self.references = references
+        payable, unpaid = prepare_payroll_items(items, references)
+        self.skipped = [(result[0], result[4]) for _, result in unpaid]
+        self.employee_ids = [employee.get("id") for _, employee, _, _, _, _ in payable]
+        self.departments = [employee.get("department") for _, employee, _, _, _, _ in payable]
+        self.columns = payroll_columns(payable)
+        self._baseline = None
+
+    @classmethod
+    def from_data_manager(cls, data_manager, pay_date):
+        """Load every employee and the time logs of the pay period ending on pay_date."""
+        employees = {employee.id: employee for employee in data_manager.get_all_employees()}
+        ids = list(employees)
+        due = [(employee_id, employees[employee_id].pay_frequency) for employee_id in ids]
+        hours = data_manager.get_hours_by_employee_ids(ids, earliest_period_start(pay_date), pay_date)
+        deductions = data_manager.get_voluntary_deductions_by_ids(ids)
+        items, unknown = build_payroll_items(due, employees, hours, deductions, pay_date)
+        simulator = cls(items, ReferenceData.from_data_manager(data_manager))
+        simulator.skipped = unknown + simulator.skipped
+        return simulator
+
+    def calculate(self, references):
+        """Net-pay breakdown arrays for the loaded workforce under the given reference data."""
+        if not self.employee_ids:
+            return {"adjusted_gross_pay": np.zeros(0), "total_deductions": np.zeros(0), "net_pay": np.zeros(0)}
+        columns = self.columns
+        if references.overtime_rules_by_state != self.references.overtime_rules_by_state:
+            # Overtime rules change hourly gross pay and the hour split, so those columns are rebuilt
+            payable, _ = prepare_payroll_items(self.items, references)
+            columns = payroll_columns(payable)
+        return compute_net_pay_arrays(references=references, **columns)
+
+    def baseline(self):
+        """Breakdown under the current reference data, computed once and reused by every scenario."""
+        if self._baseline is None:
+            self._baseline = self.calculate(self.references)
+        return self._baseline
+
+    def simulate(self, scenarios):
+        """Run each named scenario and report its cost against the current rules.
+
+        scenarios maps a name to ReferenceData.with_overrides keyword arguments, for example
+        {"CA +1%": {"state_tax": {"CA": {"income_tax_rate": 0.103}}}, "FICA 6.5%": {"fica_tax_rate": 0.065}}.
+        Each report has workforce totals, their deltas and net pay / deduction deltas by department and work state.
+        """
+        baseline = self.baseline()
+        reports = {}
+        for name, overrides in scenarios.items():
+            breakdown = self.calculate(self.references.with_overrides(**overrides))
+            net_delta = breakdown["net_pay"] - baseline["net_pay"]
+            deductions_delta = breakdown["total_deductions"] - baseline["total_deductions"]
+            gross_delta = breakdown["adjusted_gross_pay"] - baseline["adjusted_gross_pay"]
+            reports[name] = {
+                "employees": len(self.employee_ids),
+                "employees_affected": int(np.count_nonzero(net_delta)),
+                "total_gross": float(breakdown["adjusted_gross_pay"].sum()),
+                "total_deductions": float(breakdown["total_deductions"].sum()),
+                "total_net": float(breakdown["net_pay"].sum()),
+                "gross_delta": float(gross_delta.sum()),
+                "deductions_delta": float(deductions_delta.sum()),
+                "net_delta": float(net_delta.sum()),
+                "by_department": self._breakdown_by(self.departments, net_delta, deductions_delta),
+                "by_state": self._breakdown_by(self.columns["work_states"], net_delta, deductions_delta),
+            }
+        return reports
+
+    @staticmethod
+    def _breakdown_by(groups, net_delta, deductions_delta):
+        net = _group_totals(groups, net_delta)
+        deductions = _group_totals(groups, deductions_delta)
+        return {group: {"net_delta": net[group], "deductions_delta": deductions[group]} for group in net}
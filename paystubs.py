@@ -0,0 +1,134 @@
+import html
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+STUB_EXTENSIONS = {"text": "txt", "html": "html"}
+
+_HTML_STYLE = ("body{font-family:sans-serif;margin:2em}table{border-collapse:collapse}"
+               "td,th{padding:.2em 1em;text-align:right}td:first-child,th:first-child{text-align:left}")
+
+
+def _masked_ssn(ssn):
+    return f"***-**-{str(ssn)[-4:]}" if ssn else "N/A"
+
+
+def _stub_lines(stub):
+    """Amount lines shared by both formats: (label, current, year to date)."""
+    return [
+        ("Gross Pay", stub["gross_pay"], stub["ytd_gross_pay"]),
+        ("Taxes", stub["tax_deductions"], None),
+        ("Health Insurance", stub["health_insurance"], None),
+        ("Retirement Contribution", stub["retirement_contribution"], None),
+        ("Other Deductions", stub["other_deductions"], None),
+        ("Total Deductions", stub["deductions"], stub["ytd_deductions"]),
+        ("Net Pay", stub["net_pay"], stub["ytd_net_pay"]),
+    ]
+
+
+def render_text_stub(stub):
+    """Render one row from DataManager.iter_pay_stub_rows as a plain-text pay stub."""
+    lines = [
+        f"PAY STUB - {stub['pay_date']}",
+        f"Employee: {stub['full_name']} (ID {stub['employee_id']})  SSN: {_masked_ssn(stub['ssn'])}",
+        f"Position: {stub['job_title'] or 'N/A'}, {stub['department'] or 'N/A'}",
+        f"Pay Frequency: {(stub['pay_frequency'] or 'N/A').capitalize()}",
+        "",
+        f"{'':<26}{'Current':>14}{'Year to Date':>16}",
+    ]
+    for label, current, ytd in _stub_lines(stub):
+        ytd_text = f"${ytd:,.2f}" if ytd is not None else ""
+        lines.append(f"{label:<26}{f'${current:,.2f}':>14}{ytd_text:>16}")
+    return "\n".join(lines) + "\n"
+
+
+def render_html_stub(stub):
+    """Render one row from DataManager.iter_pay_stub_rows as a standalone HTML pay stub."""
+    escape = html.escape
+    rows = "".join(
+        f"<tr><td>{escape(label)}</td><td>${current:,.2f}</td><td>{f'${ytd:,.2f}' if ytd is not None else ''}</td></tr>"
+        for label, current, ytd in _stub_lines(stub)
+    )
+    return (
+        f"<!DOCTYPE html><html><head><meta charset=\"utf-8\"><title>Pay Stub {escape(stub['pay_date'])}</title>"
+        f"<style>{_HTML_STYLE}</style></head><body>"
+        f"<h1>Pay Stub - {escape(stub['pay_date'])}</h1>"
+        f"<p>Employee: {escape(str(stub['full_name']))} (ID {stub['employee_id']})<br>"
+        f"SSN: {_masked_ssn(stub['ssn'])}<br>"
+        f"Position: {escape(str(stub['job_title'] or 'N/A'))}, {escape(str(stub['department'] or 'N/A'))}<br>"
+        f"Pay Frequency: {escape((stub['pay_frequency'] or 'N/A').capitalize())}</p>"
+        f"<table><tr><th></th><th>Current</th><th>Year to Date</th></tr>{rows}</table>"
+        f"</body></html>\n"
+    )
+
+
+RENDERERS = {"text": render_text_stub, "html": render_html_stub}
+
+
+def iter_pay_stubs(data_manager, pay_date, fmt="text", batch_size=1000):
+    """Yield (stub_row, rendered_stub) for every payroll_history row on pay_date, one at a time."""
+    render = RENDERERS[fmt]
+    for stub in data_manager.iter_pay_stub_rows(pay_date, batch_size):
+        yield stub, render(stub)
+
+
+def stub_file_name(stub, fmt):
+    return f"{stub['employee_id']}-{stub['payroll_id']}.{STUB_EXTENSIONS[fmt]}"
+
+
+def write_stub_chunk(stubs, output_dir, fmt):
+    """Render and write a chunk of stub rows; runs in worker processes, so it returns only a count."""
+    render = RENDERERS[fmt]
+    for stub in stubs:
+        with open(os.path.join(output_dir, stub_file_name(stub, fmt)), "w", encoding="utf-8") as file:
+            file.write(render(stub))
+    return len(stubs)
+
+
+def _chunks(rows, chunk_size):
+    rows = iter(rows)
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def write_pay_stubs(data_manager, pay_date, output_dir, fmt="text", processes=None, chunk_size=1000):
+    """Write a pay stub file for every payroll_history row on pay_date into output_dir and return a summary.
+
+    Rows stream from the database chunk_size at a time. With processes > 1, chunks are rendered and written by
+    a process pool with at most two chunks per worker in flight, so memory stays bounded however many
+    employees are paid.
+    """
+    if fmt not in RENDERERS:
+        raise ValueError(f"Unknown pay stub format: {fmt}")
+    os.makedirs(output_dir, exist_ok=True)
+    start = time.perf_counter()
+    written = 0
+    chunks = _chunks(data_manager.iter_pay_stub_rows(pay_date, chunk_size), chunk_size)
+
+    if processes and processes > 1:
+        with ProcessPoolExecutor(max_workers=processes) as executor:
+            pending = deque()
+            for chunk in chunks:
+                if len(pending) >= processes * 2:
+                    written += pending.popleft().result()
+                pending.append(executor.submit(write_stub_chunk, chunk, output_dir, fmt))
+            while pending:
+                written += pending.popleft().result()
+    else:
+        for chunk in chunks:
+            written += write_stub_chunk(chunk, output_dir, fmt)
+
+    elapsed = time.perf_counter() - start
+    return {
+        "pay_date": str(pay_date),
+        "format": fmt,
+        "output_dir": output_dir,
+        "stubs_written": written,
+        "elapsed_seconds": elapsed,
+        "stubs_per_second": written / elapsed if elapsed else 0.0,
+    }
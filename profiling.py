@@ -0,0 +1,181 @@
+import json
+import threading
+import time
+from contextlib import nullcontext
+import numpy as np
+
+# Statements that count as queries; transaction control and PRAGMAs do not
+COUNTED_STATEMENTS = ("SELECT", "INSERT", "UPDATE", "DELETE", "WITH", "REPLACE")
+PERCENTILES = (50, 90, 95, 99)
+
+_DISABLED_STAGE = nullcontext()
+
+
+class _Stage:
+    """One open stage on a thread's stack; counts are inclusive of the stages nested inside it."""
+
+    __slots__ = ("profiler", "name", "employee_id", "parent", "start", "queries", "rows")
+
+    def __init__(self, profiler, name, employee_id):
+        self.profiler = profiler
+        self.name = name
+        self.employee_id = employee_id
+        self.queries = 0
+        self.rows = 0
+
+    def __enter__(self):
+        stack = self.profiler._stack()
+        self.parent = stack[-1] if stack else None
+        if self.employee_id is None and self.parent is not None:
+            self.employee_id = self.parent.employee_id
+        stack.append(self)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        seconds = time.perf_counter() - self.start
+        self.profiler._stack().pop()
+        parent = self.parent
+        if parent is not None:
+            parent.queries += self.queries
+            parent.rows += self.rows
+        # A stage is the employee's outermost one when its parent belongs to someone else (or nobody)
+        outermost = parent is None or parent.employee_id != self.employee_id
+        self.profiler._record(self.name, self.employee_id, seconds, self.queries, self.rows, outermost)
+        return False
+
+
+class PayrollProfiler:
+    """Opt-in per-stage profiler for the payroll pipeline.
+
+    Wrap work in ``with profiler.stage(name, employee_id):``. While enabled, each stage records its wall time
+    and the number of SQL statements and rows fetched through the DataManager's connection pool (nested stages
+    inherit the employee id and are included in their parent's counts). While disabled, stage() returns a
+    shared no-op context manager and the pool is left uninstrumented, so the cost is one method call.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.data_manager = None
+        self.records = []  # (stage, employee_id, seconds, queries, rows, outermost)
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    def enable(self, data_manager):
+        """Start recording and instrument data_manager's connections."""
+        self.data_manager = data_manager
+        data_manager.pool.set_instrumentation(self._on_statement, self._on_row)
+        self.enabled = True
+
+    def disable(self):
+        """Stop recording and remove the connection instrumentation; recorded stages are kept."""
+        self.enabled = False
+        if self.data_manager is not None:
+            self.data_manager.pool.set_instrumentation()
+            self.data_manager = None
+
+    def reset(self):
+        with self._lock:
+            self.records = []
+
+    def stage(self, name, employee_id=None):
+        """Context manager that times one stage, or a no-op when profiling is off."""
+        if not self.enabled:
+            return _DISABLED_STAGE
+        return _Stage(self, name, employee_id)
+
+    def _stack(self):
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def _on_statement(self, sql):
+        stack = getattr(self._local, "stack", None)
+        if stack and sql.lstrip()[:7].upper().startswith(COUNTED_STATEMENTS):
+            stack[-1].queries += 1
+
+    def _on_row(self, cursor, row):
+        stack = getattr(self._local, "stack", None)
+        if stack:
+            stack[-1].rows += 1
+        return row
+
+    def _record(self, name, employee_id, seconds, queries, rows, outermost):
+        with self._lock:
+            self.records.append((name, employee_id, seconds, queries, rows, outermost))
+
+    def summary(self, slowest=10):
+        """Per-stage totals and percentiles plus the slowest employees, as a JSON-serialisable dict."""
+        with self._lock:
+            records = list(self.records)
+
+        by_stage = {}
+        for name, _, seconds, queries, rows, _ in records:
+            stage = by_stage.setdefault(name, {"seconds": [], "queries": 0, "rows": 0})
+            stage["seconds"].append(seconds)
+            stage["queries"] += queries
+            stage["rows"] += rows
+
+        stages = {}
+        for name, stage in by_stage.items():
+            seconds = np.asarray(stage["seconds"])
+            calls = len(seconds)
+            stages[name] = {
+                "calls": calls,
+                "total_seconds": float(seconds.sum()),
+                "mean_seconds": float(seconds.mean()),
+                "max_seconds": float(seconds.max()),
+                **{f"p{p}_seconds": float(value)
+                   for p, value in zip(PERCENTILES, np.percentile(seconds, PERCENTILES))},
+                "queries": stage["queries"],
+                "rows": stage["rows"],
+                "queries_per_call": stage["queries"] / calls,
+                "rows_per_call": stage["rows"] / calls,
+            }
+
+        employees = {}
+        for name, employee_id, seconds, queries, rows, outermost in records:
+            if employee_id is None:
+                continue
+            employee = employees.setdefault(employee_id, {"employee_id": employee_id, "seconds": 0.0,
+                                                          "queries": 0, "rows": 0, "stages": {}})
+            employee["stages"][name] = employee["stages"].get(name, 0.0) + seconds
+            if outermost:
+                employee["seconds"] += seconds
+                employee["queries"] += queries
+                employee["rows"] += rows
+
+        return {
+            "stages": stages,
+            "employees_profiled": len(employees),
+            "slowest_employees": sorted(employees.values(), key=lambda e: e["seconds"], reverse=True)[:slowest],
+        }
+
+    def to_json(self, slowest=10, include_records=False, indent=2):
+        """Serialise the summary (and optionally every raw stage record) as JSON."""
+        report = self.summary(slowest)
+        if include_records:
+            with self._lock:
+                report["records"] = [
+                    {"stage": name, "employee_id": employee_id, "seconds": seconds, "queries": queries, "rows": rows}
+                    for name, employee_id, seconds, queries, rows, _ in self.records
+                ]
+        return json.dumps(report, indent=indent)
+
+    def export_json(self, file_path, slowest=10, include_records=False):
+        with open(file_path, "w", encoding="utf-8") as file:
+            file.write(self.to_json(slowest, include_records))
+
+    def print_summary(self, slowest=5):
+        """Print a per-stage table and the slowest employees."""
+        report = self.summary(slowest)
+        print(f"{'Stage':<28}{'Calls':>8}{'Total s':>10}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}"
+              f"{'Queries':>9}{'Rows':>9}")
+        for name, stage in sorted(report["stages"].items(), key=lambda item: item[1]["total_seconds"], reverse=True):
+            print(f"{name:<28}{stage['calls']:>8}{stage['total_seconds']:>10.3f}{stage['p50_seconds'] * 1000:>9.2f}"
+                  f"{stage['p95_seconds'] * 1000:>9.2f}{stage['p99_seconds'] * 1000:>9.2f}"
+                  f"{stage['queries']:>9}{stage['rows']:>9}")
+        for employee in report["slowest_employees"]:
+            print(f"Employee ID {employee['employee_id']}: {employee['seconds'] * 1000:.2f} ms, "
+                  f"{employee['queries']} queries, {employee['rows']} rows")
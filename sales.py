@@ -1,10 +1,10 @@
-from datetime import datetime
-from datamanager import DataManager
+import sqlite3
+from datamanager import get_data_manager, OrderResult, REVENUE_REPORT_KEYS
 import threading
 
 class Sales:
-    def __init__(self):
-        self.data_manager = DataManager()
+    def __init__(self, data_manager=None):
+        self.data_manager = data_manager or get_data_manager()
 
     def create_order(self):
         """Create a new order and update inventory accordingly."""
@@ -13,64 +13,39 @@ class Sales:
         quantity = int(input("Quantity: "))
         payment_type = input("Payment Type (credit/cash/invoice): ")
 
-        # Retrieve product price from inventory
-        price_per_item = self.data_manager.get_product_price(product)
-        if price_per_item is None:
-            print(f"Error: Product '{product}' does not exist in inventory.")
-            return
-
-        # Calculate total cost before discounts
-        total_amount = quantity * price_per_item
-
-        # Prepare order data for discount application
         order_data = {
             "customer": customer,
             "product": product,
             "quantity": quantity,
-            "payment_type": payment_type,
-            "product_price": price_per_item
+            "payment_type": payment_type
         }
 
-        # Apply discounts through DataManager
-        discounted_amount = self.data_manager.apply_discounts(order_data)
+        # Price, discount, stock check and stock decrement all happen in one transaction
+        try:
+            result = self.data_manager.place_order(order_data)
+        except sqlite3.Error as e:
+            print(f"Error recording order: {e}")
+            return
 
-        # Check inventory availability
-        stock = self.data_manager.check_stock(product)
-        if stock >= quantity:
-            # Update order with final discounted amount and save
-            order_data["discounted_amount"] = discounted_amount
-            self.data_manager.save_order(order_data)  # save_order should handle stock update
-            print("Order recorded successfully.")
+        if result.status == OrderResult.UNKNOWN_PRODUCT:
+            print(f"Error: Product '{product}' does not exist in inventory.")
+        elif result.status == OrderResult.INSUFFICIENT_STOCK:
+            print(f"Not enough stock available for {product} (requested: {quantity}, available: {result.remaining_stock}).")
         else:
-            print(f"Not enough stock available for {product} (requested: {quantity}, available: {stock}).")
-
-    def generate_report(self, timeframe='daily'):
-        """Generate a report of sales by specified timeframe."""
-        orders = self.data_manager.load_orders()
-        report_data = {}
-
-        for order in orders:
-            order_date = order[6]  # Assuming 'date' is the 7th column
-            discounted_amount = float(order[5])  # Access the correct index for discounted amount
-
-            # Determine the key based on the timeframe
-            if timeframe == 'daily':
-                key = order_date
-            elif timeframe == 'weekly':
-                key = datetime.strptime(order_date, '%Y-%m-%d').strftime("%Y-%U")  # Year-Week number
-            elif timeframe == 'monthly':
-                key = datetime.strptime(order_date, '%Y-%m-%d').strftime("%Y-%m")  # Year-Month
-            elif timeframe == 'yearly':
-                key = datetime.strptime(order_date, '%Y-%m-%d').strftime("%Y")  # Year
-            else:
-                print("Invalid timeframe. Please select daily, weekly, monthly, or yearly.")
-                return
+            print(f"Order recorded successfully. Total: ${result.discounted_amount:.2f}")
+        return result
 
-            report_data[key] = report_data.get(key, 0) + discounted_amount
+    def generate_report(self, timeframe='daily', start_date=None, end_date=None):
+        """Generate a report of sales by specified timeframe and return it as {period: total}."""
+        if timeframe not in REVENUE_REPORT_KEYS:
+            print("Invalid timeframe. Please select daily, weekly, monthly, or yearly.")
+            return None
+        report_data = self.data_manager.report_cache.report(timeframe, start_date, end_date)
 
         print(f"{timeframe.capitalize()} Sales Report:")
         for date, total in report_data.items():
             print(f"Date: {date}, Total Sales: ${total:.2f}")
+        return report_data
 
     def check_product_availability(self):
         """Check the availability of a specific product."""
@@ -94,7 +69,12 @@ class Sales:
                 self.create_order()
             elif choice == '2':
                 timeframe = input("Enter timeframe (daily/weekly/monthly/yearly): ").strip().lower()
-                self.generate_report(timeframe)
+                start_date = input("Start date (YYYY-MM-DD, blank for all): ").strip() or None
+                end_date = input("End date (YYYY-MM-DD, blank for all): ").strip() or None
+                try:
+                    self.generate_report(timeframe, start_date, end_date)
+                except ValueError:
+                    print("Invalid date. Please use the format YYYY-MM-DD.")
             elif choice == '3':
                 self.check_product_availability()
             elif choice == '4':
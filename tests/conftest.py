@@ -0,0 +1,16 @@
+import os
+import sys
+
+import pytest
+
+# The application modules live at the repository root rather than in a package
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from datamanager import DataManager  # noqa: E402
+
+
+@pytest.fixture
+def data_manager(tmp_path):
+    data_manager = DataManager(str(tmp_path / "test.db"))
+    yield data_manager
+    data_manager.close()
@@ -0,0 +1,476 @@
+import contextlib
+import csv
+import gzip
+import io
+import json
+import sqlite3
+import threading
+from datetime import date, datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from datamanager import SCHEMA_VERSION, DataManager
+
+
+def test_save_order_never_oversells(data_manager):
+    data_manager.add_inventory_item("Laptop", 2, 1, 10.0)
+    order = {"customer": "new", "product": "Laptop", "quantity": 2, "payment_type": "cash"}
+    assert data_manager.save_order(dict(order)).accepted
+    result = data_manager.save_order(dict(order))
+    assert result.status == "insufficient_stock" and result.remaining_stock == 0
+    assert data_manager.check_stock("Laptop") == 0
+
+
+def test_place_order_converts_quantity_and_never_leaves_a_transaction_open(data_manager):
+    data_manager.add_inventory_item("Laptop", 10, 1, 100.0)
+    result = data_manager.place_order({"customer": "new", "product": "Laptop", "quantity": "3",
+                                       "payment_type": "cash"})
+    assert result.accepted and result.remaining_stock == 7
+    assert result.discounted_amount == pytest.approx(300.0 * (1 - data_manager._seasonal_discount(date.today())))
+    with pytest.raises(KeyError):
+        data_manager.place_order({"product": "Laptop", "quantity": 1, "payment_type": "cash"})
+    assert not data_manager.pool.connection().in_transaction
+    assert data_manager.check_stock("Laptop") == 7
+
+
+def test_concurrent_place_order_sells_exactly_the_stock(data_manager):
+    data_manager.add_inventory_item("Laptop", 50, 1, 10.0)
+    results = []
+    lock = threading.Lock()
+
+    def buy():
+        for _ in range(20):
+            result = data_manager.place_order({"customer": "new", "product": "Laptop", "quantity": 1,
+                                               "payment_type": "cash"})
+            with lock:
+                results.append(result)
+
+    threads = [threading.Thread(target=buy) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert sum(result.accepted for result in results) == 50
+    assert all(result.status == "insufficient_stock" for result in results if not result.accepted)
+    assert data_manager.check_stock("Laptop") == 0
+    with data_manager.pool.connection() as conn:
+        assert conn.execute("SELECT COUNT(*), SUM(quantity) FROM orders").fetchone() == (50, 50)
+
+
+def test_reference_cache_counts_every_lookup_across_threads(data_manager):
+    cache = data_manager.reference_cache
+    cache.table("state_tax")
+    threads = [threading.Thread(target=lambda: [cache.table("state_tax") for _ in range(2000)]) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    stats = cache.stats()
+    assert stats["misses"] == 1
+    assert stats["hits"] == 8 * 2000
+
+
+def test_reference_cache_reloads_only_the_table_that_was_written(data_manager):
+    cache = data_manager.reference_cache
+    data_manager.set_state_tax("TX", 0.0, 0.027)
+    data_manager.set_overtime_rules("CA", weekly_overtime_threshold=40)
+    assert data_manager.get_state_tax_rates("TX")["sui_rate"] == 0.027
+    assert data_manager.get_overtime_rules("CA")["weekly_overtime_threshold"] == 40
+    loads = cache.stats()["loads"]
+
+    data_manager.set_state_tax("TX", 0.0, 0.031)
+    assert "state_tax" not in cache.stats()["cached_tables"]
+    assert "state_overtime_rules" in cache.stats()["cached_tables"]
+    assert data_manager.get_state_tax_rates("TX")["sui_rate"] == 0.031
+    assert data_manager.get_overtime_rules("CA")["weekly_overtime_threshold"] == 40
+    assert cache.stats()["loads"] == loads + 1
+
+    data_manager.set_overtime_rules("CA", weekly_overtime_threshold=None)
+    assert data_manager.get_overtime_rule("CA").weekly_threshold is None
+
+
+class _RatesHandler(BaseHTTPRequestHandler):
+    body = json.dumps({"rates": {"USD": 1, "EUR": "0.9", "GBP": None, "JPY": "n/a", "CHF": -1}}).encode()
+    etag = '"rates-v1"'
+
+    def do_GET(self):
+        if self.headers.get("If-None-Match") == self.etag:
+            self.send_response(304)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("ETag", self.etag)
+        self.send_header("Content-Length", str(len(self.body)))
+        self.end_headers()
+        self.wfile.write(self.body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def rates_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _RatesHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_port}/latest/{{base}}"
+    server.shutdown()
+    server.server_close()
+
+
+def test_exchange_rate_refresh_skips_bad_rates_and_honours_etag(data_manager, rates_server):
+    status = data_manager.fetch_and_update_exchange_rates(api_url=rates_server, retries=0)
+    assert status["status"] == "updated"
+    assert status["updated"] == 2
+    assert sorted(status["skipped"]) == ["CHF", "GBP", "JPY"]
+    assert data_manager.get_exchange_rates() == {"USD": 1.0, "EUR": 0.9}
+    assert data_manager.convert_currency(100, "USD", "EUR") == pytest.approx(90.0)
+
+    status = data_manager.fetch_and_update_exchange_rates(api_url=rates_server, retries=0)
+    assert status == {"status": "not_modified", "updated": 0, "unchanged": 2}
+
+
+def test_hot_queries_use_an_index(data_manager):
+    plans = data_manager.explain_query_plans()
+    assert {name: result["plan"] for name, result in plans.items() if not result["uses_index"]} == {}
+
+
+def _insert_orders(data_manager, rows):
+    with data_manager.pool.connection() as conn:
+        conn.executemany(
+            "INSERT INTO orders (customer, product, quantity, payment_type, discounted_amount, date) "
+            "VALUES ('new', ?, ?, 'cash', ?, ?)", rows)
+
+
+def _orders_fixture_rows(count=600, first_day=date(2023, 12, 20)):
+    products = ("Laptop", "Keyboard", "Monitor")
+    return [(products[i % 3], 1 + i % 4, round(10 + i * 1.37, 2), (first_day + timedelta(days=i * 7 % 90)).isoformat())
+            for i in range(count)]
+
+
+def _python_revenue_report(data_manager, timeframe, product=None):
+    """Revenue buckets computed straight from orders with strftime, the way the original reports did."""
+    formats = {"daily": "%Y-%m-%d", "weekly": "%Y-%U", "monthly": "%Y-%m", "yearly": "%Y"}
+    totals = {}
+    with data_manager.pool.connection() as conn:
+        for day, order_product, amount in conn.execute("SELECT date, product, discounted_amount FROM orders"):
+            if product is None or order_product == product:
+                key = datetime.strptime(day, "%Y-%m-%d").strftime(formats[timeframe])
+                totals[key] = totals.get(key, 0) + amount
+    return totals
+
+
+def _assert_same_totals(actual, expected):
+    assert actual.keys() == expected.keys()
+    for key in expected:
+        assert actual[key] == pytest.approx(expected[key], abs=0.005)
+
+
+def test_daily_revenue_triggers_match_a_full_rebuild(data_manager):
+    _insert_orders(data_manager, _orders_fixture_rows())
+    with data_manager.pool.connection() as conn:
+        conn.execute("UPDATE orders SET discounted_amount = discounted_amount * 2 WHERE id % 5 = 0")
+        conn.execute("UPDATE orders SET date = '2024-02-29', product = 'Mouse' WHERE id % 7 = 0")
+        conn.execute("DELETE FROM orders WHERE id % 11 = 0")
+    query = "SELECT date, product, order_count, units, ROUND(revenue, 6) FROM daily_revenue ORDER BY date, product"
+    with data_manager.pool.connection() as conn:
+        maintained = conn.execute(query).fetchall()
+    data_manager.rebuild_daily_revenue()
+    with data_manager.pool.connection() as conn:
+        rebuilt = conn.execute(query).fetchall()
+    assert maintained == rebuilt
+
+
+@pytest.mark.parametrize("timeframe", ["daily", "weekly", "monthly", "yearly"])
+def test_cached_report_matches_a_full_recompute(data_manager, timeframe):
+    rows = _orders_fixture_rows()
+    _insert_orders(data_manager, rows[:400])
+    cache = data_manager.report_cache
+    _assert_same_totals(cache.report(timeframe), _python_revenue_report(data_manager, timeframe))
+    _insert_orders(data_manager, rows[400:])
+    _assert_same_totals(cache.report(timeframe), _python_revenue_report(data_manager, timeframe))
+    _assert_same_totals(cache.report(timeframe, product="Laptop"),
+                        _python_revenue_report(data_manager, timeframe, "Laptop"))
+    assert cache.stats()["refreshes"] >= 1
+
+
+def _add_hourly_worker(data_manager):
+    data_manager.add_employee({
+        "full_name": "Worker", "address": "1 Main St", "ssn": "000-00-0001", "phone": "555-0100",
+        "email": "w@example.com", "employment_type": "hourly", "job_title": "Clerk", "department": "Ops",
+        "start_date": "2024-01-01",
+    })
+
+
+def test_hours_rollup_split_follows_the_work_state_overtime_rule(data_manager):
+    _add_hourly_worker(data_manager)
+    data_manager.set_work_state(1, "CA")
+    data_manager.set_overtime_rules("CA", seventh_day_overtime=True)
+    days = [(date(2024, 3, 4) + timedelta(days=i)).isoformat() for i in range(7)]  # Monday to Sunday
+    for day in days:
+        data_manager.add_time_log(1, day, hours_worked=9)
+
+    rollup = data_manager.get_hours_rollup(1, days[0], days[-1])
+    expected = data_manager.get_overtime_rule("CA").split([(day, 9) for day in days])
+    assert rollup["hours_worked"] == 63
+    assert rollup["days_worked"] == 7
+    for key in ("regular_hours", "overtime_hours", "doubletime_hours"):
+        assert rollup[key] == pytest.approx(expected[key])
+    assert rollup["regular_hours"] == 40  # Weekly cap, not the fixed 8 hours a day
+
+
+def test_hours_rollup_split_is_refreshed_when_rules_or_work_state_change(data_manager):
+    _add_hourly_worker(data_manager)
+    days = [(date(2024, 3, 4) + timedelta(days=i)).isoformat() for i in range(5)]
+    for day in days:
+        data_manager.add_time_log(1, day, hours_worked=10)
+    assert data_manager.get_hours_rollup(1, days[0], days[-1])["overtime_hours"] == 10  # Default 8h daily rule
+
+    data_manager.set_overtime_rules("TX", daily_overtime_threshold=None, doubletime_threshold=None)
+    data_manager.set_work_state(1, "TX")
+    assert data_manager.get_hours_rollup(1, days[0], days[-1])["overtime_hours"] == 10  # Weekly 40h cap only
+    assert data_manager.get_hours_rollup(1, days[0], days[1])["overtime_hours"] == 0
+
+    data_manager.set_overtime_rules("TX", daily_overtime_threshold=None, doubletime_threshold=None,
+                                    weekly_overtime_threshold=30)
+    rollup = data_manager.get_hours_rollup(1, days[0], days[-1])
+    assert (rollup["regular_hours"], rollup["overtime_hours"]) == (30, 20)
+    with data_manager.pool.connection() as conn:
+        weekly = conn.execute("SELECT regular_hours, overtime_hours FROM hours_rollup_weekly").fetchall()
+    assert weekly == [(30, 20)]
+
+
+def test_report_cache_recomputes_after_an_order_is_edited_in_place(data_manager):
+    _insert_orders(data_manager, [("Laptop", 1, 10.0, "2024-01-05")])
+    assert data_manager.report_cache.report("daily") == {"2024-01-05": 10.0}
+    with data_manager.pool.connection() as conn:
+        conn.execute("UPDATE orders SET discounted_amount = 999 WHERE id = 1")
+    assert data_manager.report_cache.report("daily") == {"2024-01-05": 999.0}
+    with data_manager.pool.connection() as conn:
+        conn.execute("UPDATE orders SET date = '2024-01-06' WHERE id = 1")
+    assert data_manager.report_cache.report("daily") == data_manager.get_revenue_report("daily")
+    assert data_manager.report_cache.report("daily") == {"2024-01-06": 999.0}
+
+
+def test_report_cache_hits_refreshes_and_invalidates_on_order_writes(data_manager):
+    cache = data_manager.report_cache
+    _insert_orders(data_manager, [("Laptop", 1, 10.0, "2024-01-05"), ("Laptop", 1, 20.0, "2024-02-05")])
+    assert cache.report("monthly") == {"2024-01": 10.0, "2024-02": 20.0}
+    assert cache.report("monthly") == {"2024-01": 10.0, "2024-02": 20.0}
+    assert (cache.stats()["misses"], cache.stats()["hits"]) == (1, 1)
+
+    _insert_orders(data_manager, [("Laptop", 1, 5.0, "2024-02-06")])
+    assert cache.report("monthly") == {"2024-01": 10.0, "2024-02": 25.0}
+    assert (cache.stats()["refreshes"], cache.stats()["buckets_recomputed"]) == (1, 1)
+
+    # Deleting the newest order and inserting another reuses its id, so only the revision shows the change
+    with data_manager.pool.connection() as conn:
+        conn.execute("DELETE FROM orders WHERE id = 3")
+    _insert_orders(data_manager, [("Laptop", 1, 1.0, "2024-01-06")])
+    assert cache.report("monthly") == {"2024-01": 11.0, "2024-02": 20.0}
+    assert cache.stats()["misses"] == 2
+
+    cache.invalidate()
+    assert cache.stats()["entries"] == 0
+    assert cache.report("monthly") == {"2024-01": 11.0, "2024-02": 20.0}
+
+
+def test_report_cache_survives_orders_with_unpadded_dates(data_manager):
+    _insert_orders(data_manager, [("Laptop", 1, 10.0, "2024-01-05")])
+    data_manager.report_cache.report("monthly")
+    _insert_orders(data_manager, [("Laptop", 1, 5.0, "2024-1-7"), ("Laptop", 1, 2.5, "2024-01-08")])
+    assert data_manager.report_cache.report("monthly") == {"2024-01": 12.5}
+
+
+def test_import_orders_rejects_dates_that_are_not_zero_padded(data_manager, tmp_path):
+    data_manager.add_inventory_item("Laptop", 100, 5, 10.0)
+    file_path = tmp_path / "orders.csv"
+    file_path.write_text("customer,product,quantity,payment_type,date\n"
+                         "new,Laptop,1,cash,2024-01-07\n"
+                         "new,Laptop,1,cash,2024-1-7\n")
+    report = data_manager.import_orders_csv(str(file_path))
+    assert report.rows_imported == 1
+    assert report.error_count == 1
+    assert "2024-1-7" in report.errors[0][1]
+
+
+def _write_csv(path, header, rows):
+    path.write_text("\n".join([header, *rows]) + "\n")
+    return str(path)
+
+
+def test_csv_imports_skip_blank_lines(data_manager, tmp_path):
+    inventory = tmp_path / "inventory.csv"
+    inventory.write_text("product,stock,min_threshold,price\n\nLaptop,10,1,100.0\n   \n\nMouse,5,1,20.0\n")
+    report = data_manager.import_inventory_csv(str(inventory), chunk_size=1)
+    assert (report.rows_read, report.rows_imported, report.error_count) == (2, 2, 0)
+
+    orders = tmp_path / "orders.csv"
+    orders.write_text("customer,product,quantity,payment_type,date\n\n\n\nnew,Laptop,1,cash,2024-01-07\n\n")
+    report = data_manager.import_orders_csv(str(orders), chunk_size=2)
+    assert (report.rows_read, report.rows_imported, report.error_count) == (1, 1, 0)
+
+
+def test_order_import_reports_bad_rows_by_line_across_chunks(data_manager, tmp_path):
+    data_manager.add_inventory_item("Laptop", 50, 1, 100.0)
+    orders = _write_csv(tmp_path / "orders.csv", "customer,product,quantity,payment_type,date", [
+        "new,Laptop,1,cash,2024-01-05",
+        "new,Tablet,1,cash,2024-01-05",      # Line 3: unknown product
+        "new,Laptop,two,cash,2024-01-05",    # Line 4: bad quantity
+        "new,Laptop,2,cash,2024-01-06",
+        "new,Laptop,3,cash,2024-01-32",      # Line 6: bad date
+        "new,Laptop,4,card,2024-01-07",
+    ])
+    report = data_manager.import_orders_csv(orders, chunk_size=2)
+    assert (report.rows_read, report.rows_imported, report.error_count) == (6, 3, 3)
+    assert [line for line, _ in report.errors] == [3, 4, 6]
+    assert data_manager.check_stock("Laptop") == 50 - 7
+    with data_manager.pool.connection() as conn:
+        assert conn.execute("SELECT COUNT(*), SUM(quantity) FROM orders").fetchone() == (3, 7)
+
+
+def test_csv_export_round_trips_through_import(data_manager, tmp_path):
+    data_manager.import_inventory_csv(_write_csv(tmp_path / "seed.csv", "product,stock,min_threshold,price",
+                                                 ["Laptop,100,5,999.5", "Mouse,40,2,19.99"]))
+    _insert_orders(data_manager, [("Laptop", 2, 1999.0, "2024-01-05"), ("Mouse", 3, 59.97, "2024-01-06"),
+                                  ("Mouse", 1, 19.99, "2024-02-01")])
+    inventory_csv, orders_csv = str(tmp_path / "inventory.csv"), str(tmp_path / "orders.csv.gz")
+    with contextlib.redirect_stdout(io.StringIO()):
+        assert data_manager.save_inventory_to_csv(inventory_csv) == 2
+        assert data_manager.save_orders_to_csv(orders_csv, "2024-01-01", "2024-01-31") == 2
+    with gzip.open(orders_csv, "rt", newline="") as file:
+        exported = list(csv.DictReader(file))
+    assert [(row["product"], row["quantity"], row["date"]) for row in exported] == [
+        ("Laptop", "2", "2024-01-05"), ("Mouse", "3", "2024-01-06")]
+
+    copy = DataManager(str(tmp_path / "copy.db"))
+    try:
+        assert copy.import_inventory_csv(inventory_csv, chunk_size=1).rows_imported == 2
+        with copy.pool.connection() as conn:
+            assert conn.execute("SELECT product, stock, min_threshold, price FROM inventory ORDER BY product").fetchall() \
+                == [("Laptop", 100, 5, 999.5), ("Mouse", 40, 2, 19.99)]
+        plain_orders = _write_csv(tmp_path / "orders.csv", ",".join(exported[0]),
+                                  [",".join(row.values()) for row in exported])
+        report = copy.import_orders_csv(plain_orders, chunk_size=1)
+        assert (report.rows_imported, report.error_count) == (2, 0)
+        with copy.pool.connection() as conn:
+            assert conn.execute("SELECT customer, product, quantity, payment_type, date FROM orders ORDER BY id").fetchall() \
+                == [(row["customer"], row["product"], int(row["quantity"]), row["payment_type"], row["date"])
+                    for row in exported]
+        assert (copy.check_stock("Laptop"), copy.check_stock("Mouse")) == (98, 37)
+    finally:
+        copy.close()
+
+
+def test_exchange_rate_refresh_rewrites_rates_quoted_against_another_base(data_manager, rates_server):
+    with data_manager.pool.connection() as conn:
+        conn.executemany("INSERT INTO currency_rates (currency_code, exchange_rate, base_currency) VALUES (?, ?, ?)",
+                         [("USD", 1.0, "GBP"), ("EUR", 0.9, "GBP")])
+    status = data_manager.fetch_and_update_exchange_rates(api_url=rates_server, retries=0)
+    assert (status["updated"], status["unchanged"]) == (2, 0)
+    with data_manager.pool.connection() as conn:
+        assert {base for (base,) in conn.execute("SELECT base_currency FROM currency_rates")} == {"USD"}
+
+
+def test_leave_accrual_period_close_updates_balances_once(data_manager):
+    _add_hourly_worker(data_manager)
+    data_manager.set_work_state(1, "WA")
+    with data_manager.pool.connection() as conn:
+        conn.execute("INSERT INTO state_leave_policies (state, sick_leave_rate, family_leave_rate) "
+                     "VALUES ('WA', 0.025, 0.01)")
+        conn.execute("INSERT INTO leave_balances (employee_id, sick_leave, family_leave) VALUES (1, 2, 1)")
+    for day in ("2024-03-04", "2024-03-05", "2024-03-12"):
+        data_manager.add_time_log(1, day, hours_worked=8)
+
+    data_manager.accrue_leave_for_period("2024-03-01", "2024-03-10")
+    data_manager.accrue_leave_for_period("2024-03-01", "2024-03-10")
+    balances = data_manager.get_leave_balances(1)
+    assert balances["sick_leave"] == pytest.approx(2 + 16 * 0.025)
+    assert balances["family_leave"] == pytest.approx(1 + 16 * 0.01)
+
+
+def test_payroll_history_keeps_its_row_shape_and_pages_newest_first(data_manager):
+    for day in range(1, 8):
+        data_manager.record_payroll(1, f"2024-01-0{day}", 100.0 * day, 10.0, 90.0 * day)
+
+    history = data_manager.get_payroll_history(1)
+    assert [row["pay_date"] for row in history] == [f"2024-01-0{day}" for day in range(7, 0, -1)]
+    assert set(history[0]) == {"pay_date", "gross_pay", "deductions", "net_pay"}
+
+    paged, cursor = [], None
+    while True:
+        page = data_manager.get_payroll_history_page(1, limit=3, cursor=cursor)
+        paged.extend(row["pay_date"] for row in page["rows"])
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+    assert paged == [row["pay_date"] for row in history]
+
+
+# Tables as the original create_tables left them, before any schema migration
+_BASELINE_SCHEMA = """
+    CREATE TABLE employees (
+        id INTEGER PRIMARY KEY, full_name TEXT, address TEXT, ssn TEXT, phone TEXT, email TEXT,
+        employment_type TEXT, job_title TEXT, department TEXT, start_date TEXT, end_date TEXT, federal_w4 TEXT,
+        state_tax_form TEXT, hourly_rate REAL, annual_salary REAL, overtime_rate REAL, commission REAL,
+        pay_frequency TEXT
+    );
+    CREATE TABLE orders (
+        id INTEGER PRIMARY KEY, customer TEXT, product TEXT, quantity INTEGER, payment_type TEXT,
+        discounted_amount REAL, date TEXT
+    );
+    CREATE TABLE time_logs (
+        id INTEGER PRIMARY KEY, employee_id INTEGER, date TEXT, clock_in TEXT, clock_out TEXT, hours_worked REAL,
+        overtime_hours REAL, time_off_requested REAL, time_off_approved REAL, status TEXT
+    );
+    CREATE TABLE payroll_history (
+        id INTEGER PRIMARY KEY, employee_id INTEGER, pay_date TEXT, gross_pay REAL, deductions REAL, net_pay REAL
+    );
+    CREATE TABLE state_overtime_rules (
+        state TEXT PRIMARY KEY, daily_overtime_threshold INTEGER DEFAULT 8, doubletime_threshold INTEGER DEFAULT 12,
+        weekly_overtime_threshold INTEGER DEFAULT 40, overtime_rate REAL DEFAULT 1.5, doubletime_rate REAL DEFAULT 2.0
+    );
+"""
+
+
+def test_migrations_upgrade_a_baseline_database(tmp_path):
+    path = str(tmp_path / "baseline.db")
+    conn = sqlite3.connect(path)
+    conn.executescript(_BASELINE_SCHEMA)
+    conn.execute("INSERT INTO employees (id, full_name, employment_type) VALUES (1, 'Worker', 'hourly')")
+    conn.executemany("INSERT INTO time_logs (employee_id, date, hours_worked) VALUES (1, ?, 10)",
+                     [(f"2024-03-0{day}",) for day in range(4, 9)])
+    conn.executemany("INSERT INTO orders (product, quantity, discounted_amount, date) VALUES ('Laptop', 1, ?, ?)",
+                     [(100.0, "2024-03-04"), (50.0, "2024-03-04"), (70.0, "2024-03-05")])
+    conn.execute("INSERT INTO payroll_history (employee_id, pay_date, gross_pay, deductions, net_pay) "
+                 "VALUES (1, '2024-03-08', 1000, 200, 800)")
+    conn.commit()
+    conn.close()
+
+    with contextlib.redirect_stdout(io.StringIO()) as output:
+        data_manager = DataManager(path)
+    try:
+        assert data_manager.get_schema_version() == SCHEMA_VERSION
+        assert output.getvalue().count("Applied schema migration") == SCHEMA_VERSION
+        with data_manager.pool.connection() as conn:
+            columns = {table: {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+                       for table in ("employees", "payroll_history", "state_overtime_rules", "hours_rollup_daily")}
+        assert "work_state" in columns["employees"]
+        assert "tax_deductions" in columns["payroll_history"]
+        assert "seventh_day_overtime" in columns["state_overtime_rules"]
+        assert "overtime_hours" in columns["hours_rollup_daily"]
+
+        # Existing rows are backfilled into the rollups and stay readable through the new APIs
+        rollup = data_manager.get_hours_rollup(1, "2024-03-04", "2024-03-08")
+        assert (rollup["hours_worked"], rollup["regular_hours"], rollup["overtime_hours"]) == (50, 40, 10)
+        assert data_manager.report_cache.report("daily") == {"2024-03-04": 150.0, "2024-03-05": 70.0}
+        assert data_manager.get_payroll_history(1) == [
+            {"pay_date": "2024-03-08", "gross_pay": 1000.0, "deductions": 200.0, "net_pay": 800.0}]
+    finally:
+        data_manager.close()
+
+    with contextlib.redirect_stdout(io.StringIO()) as output:
+        DataManager(path).close()
+    assert "Applied schema migration" not in output.getvalue()
@@ -0,0 +1,80 @@
+import contextlib
+import io
+from datetime import date, timedelta
+
+import numpy as np
+import pytest
+
+import finance
+from finance import Finance
+from forecasting import daily_series, forecast_revenue
+
+
+def _history(days=120, first_day=date(2024, 1, 1)):
+    return {(first_day + timedelta(days=i)).isoformat(): 1000.0 + 200 * (i % 7) + i for i in range(days)}
+
+
+def test_daily_series_skips_and_counts_unparseable_dates():
+    first_day, values, skipped = daily_series({"2024-01-02": 5.0, "2024-1-7": 9.0, "n/a": 1.0, "2024-01-04": 2.0})
+    assert first_day == date(2024, 1, 2)
+    assert values.tolist() == [5.0, 0.0, 2.0]
+    assert skipped == 2
+
+
+def test_forecast_ignores_malformed_history_dates():
+    history = _history()
+    history["2024-13-40"] = 50.0
+    result = forecast_revenue(history, horizon=10)
+    assert result.skipped_dates == 1
+    assert result.history_days == 120
+    assert np.all(result.lower <= result.point) and np.all(result.point <= result.upper)
+
+
+@pytest.mark.parametrize("horizon", [0, -3])
+def test_forecast_rejects_a_horizon_below_one_day(horizon):
+    with pytest.raises(ValueError):
+        forecast_revenue(_history(), horizon=horizon)
+
+
+def test_forecast_menu_prompts_again_until_the_horizon_is_positive(data_manager, monkeypatch):
+    answers = iter(["", "0", "abc", "5", "n"])
+    monkeypatch.setattr("builtins.input", lambda prompt="": next(answers))
+    finance_department = Finance(data_manager)
+    monkeypatch.setattr(finance_department, "revenue_history", lambda file_path=None: _history())
+    with contextlib.redirect_stdout(io.StringIO()) as output:
+        finance_department.forecast_menu()
+    assert "Enter at least 1 day." in output.getvalue()
+    assert "Total forecast for the next 5 days" in output.getvalue()
+
+
+def test_finance_forecast_reads_a_csv_with_a_bad_date(data_manager, tmp_path):
+    file_path = tmp_path / "history.csv"
+    rows = [f"{i},Customer,Laptop,1,cash,{amount:.2f},{day}" for i, (day, amount) in enumerate(_history().items())]
+    rows.append("999,Customer,Laptop,1,cash,10.00,01/02/2024")
+    file_path.write_text("id,customer,product,quantity,payment_type,discounted_amount,date\n" + "\n".join(rows) + "\n")
+    with contextlib.redirect_stdout(io.StringIO()) as output:
+        result = Finance(data_manager).forecast_revenue(str(file_path), horizon=14)
+    assert result is not None and result.skipped_dates == 1
+    assert "Skipped 1 history entries" in output.getvalue()
+
+
+def test_ai_prompt_labels_the_partial_final_week(data_manager, monkeypatch):
+    prompts = []
+
+    class RecordingClient:
+        def complete(self, prompt):
+            prompts.append(prompt)
+            return "Looks steady."
+
+    monkeypatch.setattr(finance, "OpenAIChatClient", RecordingClient)
+    monkeypatch.setattr(finance.openai, "api_key", "test-key")
+    finance_department = Finance(data_manager)
+    finance_department.api_key_loaded = True
+    monkeypatch.setattr(finance_department, "revenue_history", lambda file_path=None: _history())
+    with contextlib.redirect_stdout(io.StringIO()):
+        result, commentary = finance_department.ai_financial_forecast(horizon=10)
+    assert commentary == "Looks steady."
+    forecast_line = prompts[0].splitlines()[1]
+    assert forecast_line.count("$") == 3  # Two chunks plus the total
+    assert "(final 3 days)" in forecast_line
+    assert f"${result.point[7:].sum():.2f} (final 3 days)" in forecast_line
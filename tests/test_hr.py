@@ -0,0 +1,58 @@
+import contextlib
+import io
+
+import pytest
+
+from hr import HR
+from paystubs import render_text_stub
+
+
+def _add_hourly_employee(data_manager, employee_id, pay_frequency, hourly_rate=20.0):
+    data_manager.add_employee({
+        "full_name": f"Employee {employee_id}", "address": "1 Main St", "ssn": f"000-00-{employee_id:04d}",
+        "phone": "555-0100", "email": f"e{employee_id}@example.com", "employment_type": "hourly",
+        "job_title": "Clerk", "department": "Sales", "start_date": "2024-01-01",
+    })
+    data_manager.update_compensation(employee_id, hourly_rate=hourly_rate, pay_frequency=pay_frequency)
+    data_manager.set_deductions(employee_id, 0.1, 0.0765, 0.05, 0.0, 0.0, 0.0)
+
+
+@pytest.fixture
+def hr(data_manager):
+    with contextlib.redirect_stdout(io.StringIO()):
+        data_manager.set_state_tax("TX", 0.0, 0.027)
+        data_manager.set_country_tax("US", 0.0, 0.0)
+        _add_hourly_employee(data_manager, 1, "fortnightly")
+        _add_hourly_employee(data_manager, 2, "weekly")
+        for day in ("2024-03-11", "2024-03-12", "2024-03-13"):
+            data_manager.add_time_log(2, day, hours_worked=8)
+    return HR(data_manager)
+
+
+def test_unknown_pay_frequency_skips_the_employee_instead_of_raising(hr):
+    with contextlib.redirect_stdout(io.StringIO()) as output:
+        assert hr.process_payroll(1, "2024-03-15", record=False) is None
+    assert "unknown pay frequency 'fortnightly'" in output.getvalue()
+
+
+def test_profiled_batch_continues_past_unknown_frequency_and_reads_time_logs_once(hr):
+    summary = hr.profile_payroll("2024-03-15", employee_ids=[1, 2])
+    assert summary["employees_profiled"] == 2
+    assert summary["stages"]["period_time_logs"]["calls"] == 1
+    assert summary["stages"]["overtime_split"]["calls"] == 1
+    assert "apply_overtime" not in summary["stages"]  # Only HR.apply_overtime reports under that name
+    with contextlib.redirect_stdout(io.StringIO()):
+        result = hr.process_payroll(2, "2024-03-15", record=False)
+    assert result["gross_pay"] == pytest.approx(24 * 20.0)
+
+
+def test_pay_stub_shows_the_deductions_stored_with_the_payment(hr, data_manager):
+    data_manager.set_deductions(2, 0.1, 0.0765, 0.05, 25.0, 10.0, 0.0)
+    with contextlib.redirect_stdout(io.StringIO()):
+        result = hr.process_payroll(2, "2024-03-15")
+    data_manager.set_deductions(2, 0.1, 0.0765, 0.05, 0.0, 0.0, 0.0)  # Later edit must not rewrite the stub
+
+    (stub,) = data_manager.iter_pay_stub_rows("2024-03-15")
+    assert (stub["health_insurance"], stub["retirement_contribution"]) == (25.0, 10.0)
+    assert stub["tax_deductions"] == pytest.approx(result["deductions"] - 35.0)
+    assert f"${stub['tax_deductions']:,.2f}" in render_text_stub(stub)
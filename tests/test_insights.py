@@ -0,0 +1,23 @@
+import os
+
+import pytest
+
+from insights import ResponseCache
+
+
+def test_response_cache_round_trip(tmp_path):
+    cache = ResponseCache(str(tmp_path))
+    key = ResponseCache.key("model", "prompt")
+    assert cache.get(key) is None
+    cache.put(key, "prompt", "answer")
+    assert cache.get(key) == "answer"
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_failed_put_removes_its_temporary_file(tmp_path):
+    cache = ResponseCache(str(tmp_path))
+    key = ResponseCache.key("model", "prompt")
+    with pytest.raises(TypeError):
+        cache.put(key, "prompt", object())  # Not JSON serialisable
+    assert os.listdir(os.path.dirname(cache._path(key))) == []
+    assert cache.get(key) is None
@@ -0,0 +1,84 @@
+import numpy as np
+import pytest
+
+from payroll import ReferenceData, compute_net_pay, compute_net_pay_arrays
+
+
+def _scalar_net_pay(gross_pay, total_hours, split, home_state, work_state, country_code, is_expatriate,
+                    voluntary, references):
+    """The original per-employee HR.calculate_net_pay formula, kept here as the reference."""
+    hourly_rate = gross_pay / total_hours
+    minimum_wage = references.minimum_wage(home_state)
+    if minimum_wage and hourly_rate < minimum_wage:
+        hourly_rate = minimum_wage
+    overtime_pay = (split["overtime_hours"] * hourly_rate * split["overtime_rate"] +
+                    split["doubletime_hours"] * hourly_rate * split["doubletime_rate"])
+    adjusted_gross_pay = split["regular_hours"] * hourly_rate + overtime_pay
+
+    country = references.country_tax_rates(country_code)
+    income_tax = adjusted_gross_pay * country.get("income_tax_rate", 0)
+    social_contribution = adjusted_gross_pay * country.get("social_contribution_rate", 0)
+    expatriate_tax = adjusted_gross_pay * country.get("expatriate_tax_rate", 0) if is_expatriate else 0
+
+    if references.is_reciprocal(home_state, work_state):
+        state_rates = references.state_tax_rates(home_state)
+    else:
+        home, work = references.state_tax_rates(home_state), references.state_tax_rates(work_state)
+        state_rates = {name: home.get(name, 0) + work.get(name, 0)
+                       for name in ("income_tax_rate", "sui_rate", "local_tax_rate")}
+    state_tax = adjusted_gross_pay * state_rates.get("income_tax_rate", 0)
+    sui_tax = adjusted_gross_pay * state_rates.get("sui_rate", 0)
+    local_tax = adjusted_gross_pay * state_rates.get("local_tax_rate", 0)
+    federal_tax = adjusted_gross_pay * references.federal_tax_rate
+    fica_tax = adjusted_gross_pay * references.fica_tax_rate
+
+    total_deductions = (federal_tax + fica_tax + state_tax + sui_tax + local_tax +
+                        income_tax + social_contribution + expatriate_tax + voluntary)
+    return adjusted_gross_pay - total_deductions
+
+
+@pytest.fixture
+def references():
+    return ReferenceData(
+        state_tax={"TX": {"income_tax_rate": 0.0, "sui_rate": 0.027, "local_tax_rate": 0.0},
+                   "CA": {"income_tax_rate": 0.093, "sui_rate": 0.034, "local_tax_rate": 0.01},
+                   "NJ": {"income_tax_rate": 0.0637, "sui_rate": 0.028, "local_tax_rate": 0.0},
+                   "PA": {"income_tax_rate": 0.0307, "sui_rate": 0.0367, "local_tax_rate": 0.01}},
+        country_tax={"US": {"income_tax_rate": 0.0, "social_contribution_rate": 0.0, "expatriate_tax_rate": 0.0},
+                     "DE": {"income_tax_rate": 0.14, "social_contribution_rate": 0.2, "expatriate_tax_rate": 0.05}},
+        overtime_rules={"CA": {"daily_overtime_threshold": 8, "doubletime_threshold": 12,
+                               "weekly_overtime_threshold": 40, "overtime_rate": 1.5, "doubletime_rate": 2.0,
+                               "seventh_day_overtime": True}},
+        minimum_wages={"TX": 7.25, "CA": 16.0, "NJ": 15.13},
+        reciprocity={("NJ", "PA"), ("PA", "NJ")},
+    )
+
+
+def test_vectorized_net_pay_matches_the_scalar_formula_to_the_cent(references):
+    rng = np.random.default_rng(12)
+    rows = 5000
+    states = ["TX", "CA", "NJ", "PA", None]
+    home_states = [states[i] for i in rng.integers(0, len(states), rows)]
+    work_states = [states[i] for i in rng.integers(0, len(states), rows)]
+    country_codes = [("US", "DE", None)[i] for i in rng.integers(0, 3, rows)]
+    is_expatriate = rng.random(rows) < 0.2
+    voluntary = rng.uniform(0, 200, rows).round(2)
+    time_logs = [[(f"2024-06-{day + 3:02d}", float(hours)) for day, hours in enumerate(rng.uniform(0, 14, days))]
+                 for days in rng.integers(1, 12, rows)]
+    total_hours = np.array([sum(hours for _, hours in logs) for logs in time_logs])
+    gross_pay = total_hours * rng.uniform(5, 60, rows)
+    splits = [references.overtime_rule(state).split(logs) for state, logs in zip(work_states, time_logs)]
+
+    vectorized = compute_net_pay_arrays(
+        gross_pay, total_hours, [s["regular_hours"] for s in splits], [s["overtime_hours"] for s in splits],
+        [s["doubletime_hours"] for s in splits], home_states, work_states, country_codes, is_expatriate,
+        voluntary, references, overtime_states=work_states)["net_pay"]
+    scalar = [_scalar_net_pay(gross_pay[i], total_hours[i], splits[i], home_states[i], work_states[i],
+                              country_codes[i], is_expatriate[i], voluntary[i], references) for i in range(rows)]
+
+    assert np.array_equal(np.round(vectorized, 2), np.round(scalar, 2))
+
+    employee = {"home_state": home_states[0], "work_state": work_states[0], "country_code": country_codes[0],
+                "is_expatriate": bool(is_expatriate[0])}
+    wrapped = compute_net_pay(gross_pay[0], total_hours[0], time_logs[0], employee, references, voluntary[0])
+    assert round(wrapped["net_pay"], 2) == round(scalar[0], 2)